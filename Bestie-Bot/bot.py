@@ -9,6 +9,8 @@ import pytz
 from datetime import datetime
 from dotenv import load_dotenv
 
+from user_resolver import UserResolver
+
 load_dotenv()
 
 ADMIN_ID =                      int(os.getenv('ISAAC_ID'))
@@ -51,6 +53,8 @@ intents.presences = True
 # May need to enable in the future (Aug 31, 2022)
 # intents.message_content = True
 client = discord.Client(intents = intents)
+# Looks up display names with as few requests to Discord as possible
+userResolver = UserResolver(client)
 
 with open("publicFeatures.txt", "r") as file:
     features = file.read()
@@ -112,8 +116,9 @@ async def displayLeaderboard(tableName):
     retString = ""
     if retVal:
         counter = 1
-        for userid, count in retVal:
-            retString += "\n" + str(counter) + ".\t" + (await client.fetch_user(userid)).display_name + ": " + str(count) + " numbers counted"
+        displayNames = await userResolver.displayNames([userid for userid, _ in retVal])
+        for (userid, count), displayName in zip(retVal, displayNames):
+            retString += "\n" + str(counter) + ".\t" + displayName + ": " + str(count) + " numbers counted"
             counter += 1
     else:
         retString = f"\n<{YOUTUBE_LINK}>"
@@ -129,6 +134,7 @@ async def on_ready():
     PETS_CHANNEL = client.get_channel(PETS_CHANNEL_ID)
     WELCOME_CHANNEL = client.get_channel(WELCOME_CHANNEL_ID)
     COURSE_CHANNEL = client.get_channel(COURSE_CHANNEL_ID)
+    userResolver.guild = COUNTING_CHANNEL.guild
     print('We have logged in as {0.user}'.format(client))
 
     global COMP_START_TIME
@@ -204,8 +210,9 @@ async def on_message(message):
                 retVal = mycursor.fetchall()
                 if retVal:
                     retString = "__**CURRENT DIBS**__"
-                    for userid, number in retVal:
-                        retString += "\n**" + str(number) + "** has been dibbed by " + (await client.fetch_user(userid)).display_name
+                    displayNames = await userResolver.displayNames([userid for userid, _ in retVal])
+                    for (userid, number), displayName in zip(retVal, displayNames):
+                        retString += "\n**" + str(number) + "** has been dibbed by " + displayName
                     await COUNTING_CHANNEL.send(retString)
                 else:
                     await COUNTING_CHANNEL.send("No one has dibbed any numbers yet!")
@@ -313,7 +320,7 @@ async def on_message(message):
                 mycursor.execute(sql)
                 retVal = mycursor.fetchall()
                 if retVal:
-                    await COURSE_CHANNEL.send(f"The following people have indicated they are taking {course} in {COURSE_TERM}: " + ", ".join([(await client.fetch_user(int(tup[0]))).display_name for tup in retVal]))
+                    await COURSE_CHANNEL.send(f"The following people have indicated they are taking {course} in {COURSE_TERM}: " + ", ".join(await userResolver.displayNames([int(tup[0]) for tup in retVal])))
                 else:
                     await COURSE_CHANNEL.send(f"No one has indicated that they are taking {course} in {COURSE_TERM} yet.")
             except (IndexError):
@@ -332,8 +339,9 @@ async def on_message(message):
                     else:
                         courseDict[userid] = [courseName]
                 retString = f"**People have indicated that they are taking the following courses in {COURSE_TERM}**"
-                for user, courses in courseDict.items():
-                    retString += f"\n{(await client.fetch_user(user)).display_name} is taking " + ", ".join(courses)
+                displayNames = await userResolver.displayNames(list(courseDict))
+                for (user, courses), displayName in zip(courseDict.items(), displayNames):
+                    retString += f"\n{displayName} is taking " + ", ".join(courses)
                 await COURSE_CHANNEL.send(retString)
             else:
                 await COURSE_CHANNEL.send(f"No one has indicated they are taking any courses in {COURSE_TERM} yet.")
@@ -349,8 +357,9 @@ async def on_message(message):
                     else:
                         sharedDict[userid] = courseName
                 retString = f"In {COURSE_TERM}, you share the following courses with"
-                for user, courses in sharedDict.items():
-                    retString += f"\n**{(await client.fetch_user(user)).display_name}**: {courses}"
+                displayNames = await userResolver.displayNames(list(sharedDict))
+                for (user, courses), displayName in zip(sharedDict.items(), displayNames):
+                    retString += f"\n**{displayName}**: {courses}"
                 await COURSE_CHANNEL.send(retString)
             else:
                 await COURSE_CHANNEL.send(f"You are not currently sharing courses in {COURSE_TERM} with anyone in this server.")
@@ -0,0 +1,143 @@
+from asyncio import Future, gather, get_running_loop
+from collections import OrderedDict
+import time
+
+import discord
+
+CACHE_TTL: float = 600
+"""Seconds that a fetched display name is reused for."""
+CACHE_SIZE: int = 1024
+"""Maximum number of fetched display names that are kept."""
+QUERY_MEMBERS_LIMIT: int = 100
+"""Maximum number of users that Discord allows in one member query."""
+
+
+class UserResolver:
+    """Resolves Discord user ids to display names, using the same names as
+    client.fetch_user(userId).display_name while making as few REST calls as
+    possible. Users are looked up in order from:
+        - fixedNames, for ids that are not Discord users
+        - the guild's member cache and the client's user cache, which need
+          no request
+        - names fetched in the last CACHE_TTL seconds, kept in an LRU cache
+        - a lookup of the same user that is already in flight
+        - one member query over the gateway for all remaining users of a
+          batch, if a guild is given
+        - client.fetch_user, for users that the member query did not find."""
+
+    def __init__(self, client: discord.Client, guild: discord.Guild = None,
+                 ttl: float = CACHE_TTL, maxSize: int = CACHE_SIZE, fixedNames: dict[int, str] = None):
+        """
+        :param guild: Guild whose members are queried in batches. Can also be
+            set later, once the client is ready.
+        :param fixedNames: Display names of ids that are not Discord users,
+            such as computer players, which are never fetched."""
+        self.client: discord.Client = client
+        self.fixedNames: dict[int, str] = fixedNames or {}
+        self.guild: discord.Guild = guild
+        self.ttl: float = ttl
+        self.maxSize: int = maxSize
+        self.cache: OrderedDict[int, tuple[float, str]] = OrderedDict()
+        """Expiry time and display name for fetched users, least recently used
+        first."""
+        self.inFlight: dict[int, Future] = {}
+        """Lookups that have been started but not finished, keyed by user
+        id."""
+
+    def cachedDisplayName(self, userId: int) -> str:
+        """
+        :returns: Display name of the user if it is available without a
+            request, otherwise None."""
+        if userId in self.fixedNames:
+            return self.fixedNames[userId]
+        member = self.guild.get_member(userId) if self.guild else None
+        if member:
+            # Same as User.display_name, which ignores server nicknames
+            return member.global_name or member.name
+        user = self.client.get_user(userId)
+        if user:
+            return user.display_name
+        entry = self.cache.get(userId)
+        if entry is None:
+            return None
+        expiresAt, displayName = entry
+        if expiresAt < time.monotonic():
+            del self.cache[userId]
+            return None
+        self.cache.move_to_end(userId)
+        return displayName
+
+    def store(self, userId: int, displayName: str):
+        self.cache[userId] = (time.monotonic() + self.ttl, displayName)
+        self.cache.move_to_end(userId)
+        while len(self.cache) > self.maxSize:
+            self.cache.popitem(last = False)
+
+    async def displayName(self, userId: int) -> str:
+        """
+        :raises discord.NotFound: If the user does not exist."""
+        return (await self.displayNames([userId]))[0]
+
+    async def displayNames(self, userIds: list[int]) -> list[str]:
+        """Resolves several users at once, with one member query for all of
+        the users that are not cached.
+
+        :returns: Display name of each user, in the same order as userIds.
+        :raises discord.NotFound: If one of the users does not exist."""
+        names: dict[int, str] = {}
+        waitingOn: dict[int, Future] = {}
+        toFetch: list[int] = []
+        for userId in userIds:
+            if userId in names or userId in waitingOn:
+                continue
+            displayName = self.cachedDisplayName(userId)
+            if displayName is not None:
+                names[userId] = displayName
+            elif userId in self.inFlight:
+                waitingOn[userId] = self.inFlight[userId]
+            else:
+                waitingOn[userId] = self.inFlight[userId] = get_running_loop().create_future()
+                toFetch.append(userId)
+
+        if toFetch:
+            try:
+                fetched = await self.fetchDisplayNames(toFetch)
+            except BaseException as e:
+                # Other lookups waiting on these users fail the same way
+                for userId in toFetch:
+                    future = self.inFlight.pop(userId)
+                    if isinstance(e, Exception):
+                        future.set_exception(e)
+                        # Marks the exception as retrieved, since there may be
+                        # no other lookups waiting on the future.
+                        future.exception()
+                    else:
+                        future.cancel()
+                raise
+            for userId in toFetch:
+                self.store(userId, fetched[userId])
+                self.inFlight.pop(userId).set_result(fetched[userId])
+
+        for userId, future in waitingOn.items():
+            names[userId] = await future
+        return [names[userId] for userId in userIds]
+
+    async def fetchDisplayNames(self, userIds: list[int]) -> dict[int, str]:
+        """
+        :returns: Display names of the given users, fetched from Discord,
+            keyed by user id."""
+        names: dict[int, str] = {}
+        if self.guild:
+            for i in range(0, len(userIds), QUERY_MEMBERS_LIMIT):
+                try:
+                    members = await self.guild.query_members(user_ids = userIds[i:i + QUERY_MEMBERS_LIMIT])
+                except TimeoutError:
+                    continue
+                for member in members:
+                    # Same as User.display_name, which ignores server nicknames
+                    names[member.id] = member.global_name or member.name
+        missing = [userId for userId in userIds if userId not in names]
+        users = await gather(*(self.client.fetch_user(userId) for userId in missing))
+        for user in users:
+            names[user.id] = user.display_name
+        return names
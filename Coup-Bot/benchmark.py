@@ -0,0 +1,141 @@
+from asyncio import run, gather, sleep
+from concurrent.futures import ProcessPoolExecutor
+import os
+import random
+import time
+
+from game import CoupGame, Character, MAX_PLAYERS
+from game_rules import MIN_PLAYERS
+from computer_player import searchMove
+from simulate import simulate
+from hand_renderer import HandRenderer
+from state import CoupState
+from tracing import percentile, formatSeconds
+
+HEARTBEAT_INTERVAL: float = 0.001
+"""Seconds between ticks of the coroutine that measures event loop lag."""
+
+
+async def measureLoopLag(requests, *args) -> list[float]:
+    """Runs requests(*args) while a coroutine ticks every HEARTBEAT_INTERVAL
+    seconds, like the gateway heartbeat.
+
+    :returns: Sorted delays in seconds between when each tick was due and
+        when it ran."""
+    lags: list[float] = []
+    done = False
+
+    async def heartbeat():
+        while not done:
+            due = time.perf_counter() + HEARTBEAT_INTERVAL
+            await sleep(HEARTBEAT_INTERVAL)
+            lags.append(max(0.0, time.perf_counter() - due))
+
+    async def runRequests():
+        nonlocal done
+        await sleep(HEARTBEAT_INTERVAL)
+        await requests(*args)
+        done = True
+
+    await gather(heartbeat(), runRequests())
+    return sorted(lags)
+
+
+async def inlineRequests(renderer: HandRenderer, hands: list[list[str]]):
+    """Renders every hand on the event loop without caching, as /hand did
+    before rendering was moved to worker threads. Only used as a baseline for
+    benchmarking."""
+    async def handRequest(hand: list[str]):
+        await sleep(0)
+        renderer.renderHandSync(sorted(hand))
+    await gather(*(handRequest(hand) for hand in hands))
+
+
+async def pooledRequests(renderer: HandRenderer, hands: list[list[str]]):
+    await gather(*(renderer.renderHand(hand) for hand in hands))
+
+
+def randomHands(numHands: int) -> list[list[str]]:
+    names = [character.name for character in Character]
+    return [random.choices(names, k = random.randint(1, 2)) for _ in range(numHands)]
+
+
+def benchmarkHandRequests(numRequests: int = 50):
+    hands = randomHands(numRequests)
+    warmRenderer = HandRenderer()
+    run(warmRenderer.prerender())
+    cases = (
+        ("inline, no cache (before)", inlineRequests, HandRenderer()),
+        ("worker threads, cold cache", pooledRequests, HandRenderer()),
+        ("worker threads, warm cache", pooledRequests, warmRenderer),
+    )
+    print(f"Event loop lag while serving {numRequests} concurrent /hand requests:")
+    for name, requests, renderer in cases:
+        # Loads the card images so that only rendering is measured
+        renderer.cardImages = renderer.loadCardImages()
+        start = time.perf_counter()
+        lags = run(measureLoopLag(requests, renderer, hands))
+        elapsed = time.perf_counter() - start
+        print(f"{name}: p50 {formatSeconds(percentile(lags, 0.5))}, p99 {formatSeconds(percentile(lags, 0.99))}, "
+              f"max {formatSeconds(lags[-1])} ({elapsed * 1000:.1f} ms total)")
+        renderer.shutdown()
+
+
+def benchmarkStateRollouts(seconds: float = 2.0, numPlayers: int = 4, seed: int = 0):
+    """Plays rollouts of uniformly random legal moves on clones of the
+    CoupState at the start of a game until seconds have passed."""
+    names = list(range(numPlayers))
+    root = CoupState.fromGame(CoupGame(names, [str(name) for name in names], None, seed))
+    rng = random.Random(seed)
+    numMoves: int = 0
+    numRollouts: int = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        state = root.clone(rng)
+        while not state.isOver():
+            state.apply(rng.choice(state.legalMoves()))
+            numMoves += 1
+        numRollouts += 1
+    elapsed = time.perf_counter() - start
+    print(f"CoupState: {numMoves / elapsed:,.0f} moves/sec (legalMoves and apply), "
+          f"{numRollouts / elapsed:,.0f} rollouts/sec")
+
+
+def benchmarkSimulation(numGames: int = 2000, seed: int = 0):
+    """Plays games between a mix of scripted policies, which takes every
+    challenge and block path of resolveChallenges and playerBlock, and checks
+    each game against CoupState."""
+    stats = simulate(numGames, ["random", "honest", "bluff", "random"], seed, check = True)
+    print(f"CoupGame: {stats.totalTurns / stats.elapsed:,.0f} turns/sec, "
+          f"{stats.numGames / stats.elapsed:,.0f} games/sec, "
+          f"{len(stats.paths)} challenge resolution paths exercised, "
+          f"{stats.mismatches} games played out differently by CoupState")
+
+
+def benchmarkSearch(moveTime: float = 1.0, seed: int = 0):
+    """Searches the first move of a game for each number of players, then runs
+    one search per CPU at once in a process pool, as games with computer
+    players do in the bot."""
+    for numPlayers in range(MIN_PLAYERS, MAX_PLAYERS + 1):
+        names = list(range(1, numPlayers + 1))
+        state = CoupState.fromGame(CoupGame(names, [str(name) for name in names], None, seed))
+        _, numSimulations = searchMove(state, names[0], moveTime, seed)
+        print(f"Search with {numPlayers} players: {numSimulations / moveTime:,.0f} simulations/sec")
+
+    names = list(range(1, MAX_PLAYERS + 1))
+    state = CoupState.fromGame(CoupGame(names, [str(name) for name in names], None, seed))
+    numWorkers: int = os.cpu_count()
+    with ProcessPoolExecutor(numWorkers) as executor:
+        results = list(executor.map(
+            searchMove, [state] * numWorkers, names[:1] * numWorkers, [moveTime] * numWorkers, range(numWorkers)
+        ))
+    numSimulations = sum(result[1] for result in results)
+    print(f"Search in a pool of {numWorkers} processes with {MAX_PLAYERS} players: "
+          f"{numSimulations / moveTime:,.0f} simulations/sec")
+
+
+if __name__ == "__main__":
+    benchmarkHandRequests()
+    benchmarkStateRollouts()
+    benchmarkSimulation()
+    benchmarkSearch()
@@ -1,17 +1,31 @@
 from dotenv import load_dotenv
+from asyncio import Task, create_task
+from discord.webhook.async_ import AsyncWebhookAdapter
 from discord.ui import Button, Select, View
-from asyncio import Lock
 from discord import SelectOption
-from PIL import Image
+from typing import Coroutine
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
 import discord
 import os
 import logging
+import time
 
-from io_abc import IO
-from game import CoupGame, Player, PlayerMove, Character, MAX_PLAYERS, MIN_PLAYERS
-
+# Loaded before the project modules, some of which read their settings,
+# such as LOCK_TRACING, from the environment when they are imported
 load_dotenv()
 
+from io_abc import IO
+from computer_player import ComputerPlayerIO, COMPUTER_PLAYER_NAMES, isComputerPlayer, computerDisplayName
+from matchmaking import Matchmaker, partitionPlayers
+from game_store import GameStore
+from player_queue import PlayerQueue
+from tracing import tracer, TracedLock
+from hand_renderer import HandRenderer
+from game import CoupGame, Player, PlayerMove, Character, MAX_PLAYERS
+from game_rules import MIN_PLAYERS
+from events import describe, summarize
+
 TOKEN =                     os.getenv('TOKEN')
 COUP_SERVER_ID =            int(os.getenv('COUP_SERVER_ID'))
 COUP_CHANNEL_ID =           int(os.getenv('COUP_CHANNEL_ID'))
@@ -19,6 +33,10 @@ COUP_CHANNEL_NAME =         os.getenv('COUP_CHANNEL_NAME')
 LOBBY_CHANNEL_ID =          int(os.getenv('LOBBY_CHANNEL_ID'))
 LOBBY_CHANNEL_NAME =        os.getenv('LOBBY_CHANNEL_NAME')
 ADMIN_ID =                  int(os.getenv('ADMIN_ID'))
+GAME_LOG_DIR =              os.getenv('GAME_LOG_DIR') or "gameLogs"
+MATCHMAKING_DELAY =         float(os.getenv('MATCHMAKING_DELAY') or 30)
+GAME_DB_PATH =              os.getenv('GAME_DB_PATH') or "games.db"
+COMPUTER_MOVE_TIME =        float(os.getenv('COMPUTER_MOVE_TIME') or 2)
 
 intents = discord.Intents.default()
 intents.members = True
@@ -34,15 +52,65 @@ class dClient(discord.Client):
 
 client = dClient()
 tree = discord.app_commands.CommandTree(client)
+
+
+def traceNetworkCalls():
+    """Makes every Discord API request, including interaction responses, tell
+    the tracer about itself first, so that requests made while holding a
+    TracedLock are flagged."""
+    httpRequest = client.http.request
+
+    async def tracedHttpRequest(route, *args, **kwargs):
+        tracer.networkCall(route.key)
+        return await httpRequest(route, *args, **kwargs)
+
+    webhookRequest = AsyncWebhookAdapter.request
+
+    async def tracedWebhookRequest(adapter, route, *args, **kwargs):
+        tracer.networkCall(route.key)
+        return await webhookRequest(adapter, route, *args, **kwargs)
+
+    client.http.request = tracedHttpRequest
+    AsyncWebhookAdapter.request = tracedWebhookRequest
+
+
+if tracer.enabled:
+    traceNetworkCalls()
+
 EMBED_GAME_COLOR = 0x0000FF
 EMBED_MISC_COLOR = 0x00FF00
 EMBED_ERROR_COLOR = 0xFF0000
 
-playerQueue = []
-playerQueueDisplayNames = []
-playerQueueLock: Lock = Lock()
-"""To prevent race conditions, this should be used whenever playerQueue or 
-playerQueueDisplayNames is changed/used."""
+playerQueue: PlayerQueue = PlayerQueue()
+playerQueueLock: TracedLock = TracedLock("playerQueueLock")
+"""To prevent race conditions, this should be used whenever playerQueue is 
+changed/used."""
+
+games: dict[int, CoupGame] = {}
+"""Games in progress, keyed by the id of the thread that each game is played
+in. Each game's ioManager is the CoupBotIO for its thread."""
+numGamesStarted: int = 0
+"""Number of games started since the bot logged in, used to name game
+threads."""
+GAME_THREAD_DURATION: int = 1440
+"""Minutes of inactivity after which Discord archives a game thread."""
+HISTORY_LENGTH: int = 15
+"""Number of the most recent events that /history shows."""
+startingPlayers: set[int] = set()
+"""Players who have been taken from the queue for a game that is not in games
+yet. Should only be changed while holding playerQueueLock."""
+gameTasks: set[Task] = set()
+"""Tasks running the games in games, kept so that they are not garbage
+collected."""
+gameStore: GameStore = GameStore(GAME_DB_PATH)
+"""Snapshots of the games in games, saved after every turn."""
+computerPlayerExecutor: ProcessPoolExecutor = None
+"""Worker processes that computer players search for their moves in, one per
+CPU. Created when the bot is run, since worker processes import this module
+too under the spawn and forkserver start methods."""
+
+handRenderer: HandRenderer = HandRenderer()
+"""Renders images of hands for /hand off the event loop."""
 
 cardPicNames = {
     "Ambassador": "o6HpGwo",
@@ -67,14 +135,6 @@ cardPicNames = {
     "DukeDuke": "AXREh1r"
 }
 
-cardPicImages = {
-    "Ambassador": Image.open("card-images/Ambassador.png"),
-    "Assassin": Image.open("card-images/Assassin.png"),
-    "Captain": Image.open("card-images/Captain.png"),
-    "Contessa": Image.open("card-images/Contessa.png"),
-    "Duke": Image.open("card-images/Duke.png")
-}
-
 coupCommands = {
     "commands": [LOBBY_CHANNEL_NAME, "View all commands"],
     "rules": [LOBBY_CHANNEL_NAME, "View rules"],
@@ -82,8 +142,9 @@ coupCommands = {
     "joinqueue": [LOBBY_CHANNEL_NAME, "Join the queue"],
     "leavequeue": [LOBBY_CHANNEL_NAME, "Leave the queue"],
     "startgame": [LOBBY_CHANNEL_NAME, "Start a game"],
-    "hand": [COUP_CHANNEL_NAME, "View current hand"],
-    "gamestate": [COUP_CHANNEL_NAME, "View current game state"]
+    "hand": [f"game thread in {COUP_CHANNEL_NAME}", "View current hand"],
+    "gamestate": [f"game thread in {COUP_CHANNEL_NAME}", "View current game state"],
+    "history": [f"game thread in {COUP_CHANNEL_NAME}", "View what has happened recently in the game"]
 }
 """All commands currently available for public use. Each is associated with the
 channel that it must be used in and a brief description."""
@@ -105,24 +166,13 @@ def getCardImageURL(cardCombination: str) -> str:
     return f"https://i.imgur.com/{cardPicNames[cardCombination]}.png"
 
 
-def generateHandCards(hand: list[str]) -> str:
-    """ Uses PIL to generate PNG locally corresponding to the cards in hand.
-    User is responsible for deleting temporary PNG afterwards.
-
-    :param hand: List of characters in hand.
-    :returns: Path to local PNG.
+def newGameLogPath(gameThreadId: int) -> str:
     """
-    global cardPicImages
-    baseDirectory = ""
-    tempImageName: str = "tmp.png"
-
-    imageSize = cardPicImages["Ambassador"].size
-    handSize = len(hand)
-    mergedImage = Image.new("RGB", (handSize * imageSize[0], imageSize[1]), (250, 250, 250))
-    for i in range(handSize):
-        mergedImage.paste(cardPicImages[hand[i]], (i * imageSize[0], 0))
-    mergedImage.save(f"{tempImageName}", "PNG")
-    return f"{baseDirectory}{tempImageName}"
+    :returns: Path of a new file in GAME_LOG_DIR for the game played in the
+        given thread to write its log to. Logs can be replayed with
+        replay.py."""
+    os.makedirs(GAME_LOG_DIR, exist_ok = True)
+    return os.path.join(GAME_LOG_DIR, f"coup-{time.strftime('%Y%m%d-%H%M%S')}-{gameThreadId}.jsonl")
 
 
 def getDefaultGameEmbed(title: str, description: str = None) -> discord.Embed:
@@ -157,34 +207,39 @@ def getDefaultErrorEmbed(title: str, description: str = None) -> discord.Embed:
 
 class CoupBotIO(IO):
     """Defines I/O methods for Coup that is played in Discord."""
-
-    validInputLock: Lock = Lock()
-    """Acquired whenever the normal game flow is waiting for a user response,
-    and released whenever a valid user response has been received."""
-    rootLogger = logging.getLogger()
-
-    async def acquireValidInputLock(self, logMessage: str):
-        await self.validInputLock.acquire()
-        self.rootLogger.info(f"validInputLock acquired: {logMessage}")
-
-    def releaseValidInputLock(self, logMessage: str):
-        self.validInputLock.release()
-        self.rootLogger.info(f"validInputLock released: {logMessage}")
+    def __init__(self, channel: discord.abc.Messageable):
+        """
+        :param channel: Channel or thread that the game is played in."""
+        self.channel: discord.abc.Messageable = channel
+        self.validInputLock: TracedLock = TracedLock("validInputLock")
+        """Acquired whenever the normal game flow is waiting for a user
+        response, and released whenever a valid user response has been
+        received. Each game has its own, so games do not wait on each other's
+        prompts."""
+
+    async def acquireValidInputLock(self, logMessage: str, *args):
+        """
+        :param logMessage: %-style template for the message that is traced
+            with the lock event, formatted with args only if it is dumped."""
+        await self.validInputLock.acquire(logMessage, *args)
+
+    def releaseValidInputLock(self, logMessage: str, *args):
+        self.validInputLock.release(logMessage, *args)
 
     async def displayMessage(self, message: str):
-        await COUP_CHANNEL.send(embed = getDefaultGameEmbed(message))
+        await self.channel.send(embed = getDefaultGameEmbed(message))
 
     async def displayError(self, message: str):
-        await COUP_CHANNEL.send(embed = getDefaultErrorEmbed(message))
+        await self.channel.send(embed = getDefaultErrorEmbed(message))
 
     async def displayStatus(self, message: str):
-        await COUP_CHANNEL.send(embed = getDefaultMiscEmbed(message))
+        await self.channel.send(embed = getDefaultMiscEmbed(message))
 
     async def displayEmbed(self, embed: discord.Embed, view: View = None):
         if view:
-            await COUP_CHANNEL.send(embed = embed, view = view)
+            await self.channel.send(embed = embed, view = view)
         else:
-            await COUP_CHANNEL.send(embed = embed)
+            await self.channel.send(embed = embed)
 
     async def getInput(self, player = None) -> str:
         """Will be using Select and Button components to restrict user input, so
@@ -233,15 +288,15 @@ class CoupBotIO(IO):
 
         async def moveSelectCallback(interaction):
             if await playerInputSelectResponse(interaction):
-                self.releaseValidInputLock(f"Player {player.name} has selected a valid move.")
+                self.releaseValidInputLock("Player %s has selected a valid move.", player.name)
 
         moveSelect.callback = moveSelectCallback
 
-        await self.acquireValidInputLock(f"Waiting for Player {player.name} to select a valid move.")
+        await self.acquireValidInputLock("Waiting for Player %s to select a valid move.", player.name)
         await self.displayEmbed(embed = embedPlayerInput, view = moveSelectView)
 
-        await self.acquireValidInputLock(f"Confirmed that Player {player.name} has made a valid move.")
-        self.releaseValidInputLock(f"Confirmed that Player {player.name} has made a valid move.")
+        await self.acquireValidInputLock("Confirmed that Player %s has made a valid move.", player.name)
+        self.releaseValidInputLock("Confirmed that Player %s has made a valid move.", player.name)
 
         return PlayerMove[moveSelect.values[0]]
 
@@ -283,22 +338,22 @@ class CoupBotIO(IO):
             if await challengesButtonResponse(noButton, interaction):
                 nonlocal challenger
                 challenger = -1
-                self.releaseValidInputLock(f"No player is challenging Player {curPlayer.name}.")
+                self.releaseValidInputLock("No player is challenging Player %s.", curPlayer.name)
 
         async def yesButtonCallback(interaction):
             if await challengesButtonResponse(yesButton, interaction):
                 nonlocal challenger
                 challenger = interaction.user.id
-                self.releaseValidInputLock(f"Player {challenger} is challenging Player {curPlayer.name}.")
+                self.releaseValidInputLock("Player %s is challenging Player %s.", challenger, curPlayer.name)
 
         noButton.callback = noButtonCallback
         yesButton.callback = yesButtonCallback
 
-        await self.acquireValidInputLock(f"Waiting for any challengers.")
+        await self.acquireValidInputLock("Waiting for any challengers.")
         await self.displayEmbed(embed = embedChallenges, view = challengesView)
 
-        await self.acquireValidInputLock(f"Confirmed the following challenger: -1")
-        self.releaseValidInputLock(f"Confirmed the following challenger: -1")
+        await self.acquireValidInputLock("Confirmed the following challenger: -1")
+        self.releaseValidInputLock("Confirmed the following challenger: -1")
 
         return challenger
 
@@ -336,20 +391,20 @@ class CoupBotIO(IO):
 
         async def playerTargetCallback(interaction):
             if await playerTargetSelectResponse(interaction):
-                self.releaseValidInputLock(f"Player {player.name} has chosen a target.")
+                self.releaseValidInputLock("Player %s has chosen a target.", player.name)
 
         playerTargetSelect.callback = playerTargetCallback
 
-        await self.acquireValidInputLock(f"Waiting for Player {player.name} to choose a target.")
+        await self.acquireValidInputLock("Waiting for Player %s to choose a target.", player.name)
         await self.displayEmbed(embed = embedPlayerTarget, view = playerTargetView)
 
-        await self.acquireValidInputLock(f"Confirmed Player {player.name} has chosen a target.")
-        self.releaseValidInputLock(f"Confirmed Player {player.name} has chosen a target.")
+        await self.acquireValidInputLock("Confirmed Player %s has chosen a target.", player.name)
+        self.releaseValidInputLock("Confirmed Player %s has chosen a target.", player.name)
 
         return playerList[int(playerTargetSelect.values[0])].name
 
     async def getPlayerCardChoice(self, player: Player, isReveal: bool = True) -> int:
-        playerCharacters: list[str] = [card.character.name for card in player.hand.cardList]
+        playerCharacters: list[str] = [character.name for character in player.hand]
         revealedCardIndex: int
 
         revealDiscardString: str = "reveal" if isReveal else "discard"
@@ -399,19 +454,19 @@ class CoupBotIO(IO):
             async def playerCardChoiceSelectCallback(interaction: discord.Interaction):
                 playerCardChoiceSelect.disabled = True
                 playerCardChoiceSelect.placeholder = playerCardChoiceSelect.values[0]
-                self.releaseValidInputLock(f"Player {player.name} chose card to {revealDiscardString}")
+                self.releaseValidInputLock("Player %s chose card to %s", player.name, revealDiscardString)
                 await interaction.response.edit_message(view = playerCardChoiceView)
 
             continueButton.callback = continueButtonCallback
             playerCardChoiceSelect.callback = playerCardChoiceSelectCallback
 
             await self.acquireValidInputLock(
-                f"Waiting for Player {player.name} to choose card to {revealDiscardString}."
+                "Waiting for Player %s to choose card to %s.", player.name, revealDiscardString
             )
             await self.displayEmbed(embed = continueEmbed, view = continueView)
 
-            await self.acquireValidInputLock(f"Confirmed that Player {player.name} chose card to {revealDiscardString}")
-            self.releaseValidInputLock(f"Confirmed that Player {player.name} chose card to {revealDiscardString}")
+            await self.acquireValidInputLock("Confirmed that Player %s chose card to %s", player.name, revealDiscardString)
+            self.releaseValidInputLock("Confirmed that Player %s chose card to %s", player.name, revealDiscardString)
 
             for i in range(0, len(playerCharacters)):
                 if playerCharacters[i] == playerCardChoiceSelect.values[0]:
@@ -466,27 +521,27 @@ class CoupBotIO(IO):
             if await askContessaButtonResponse(noButton, interaction):
                 nonlocal claimContessa
                 claimContessa = False
-                self.releaseValidInputLock(f"Player {player.displayName} has chosen to not claim Contessa.")
+                self.releaseValidInputLock("Player %s has chosen to not claim Contessa.", player.displayName)
 
         async def yesButtonCallback(interaction):
             if await askContessaButtonResponse(yesButton, interaction):
                 nonlocal claimContessa
                 claimContessa = True
-                self.releaseValidInputLock(f"Player {player.displayName} has chosen to claim Contessa.")
+                self.releaseValidInputLock("Player %s has chosen to claim Contessa.", player.displayName)
 
         noButton.callback = noButtonCallback
         yesButton.callback = yesButtonCallback
 
         await self.acquireValidInputLock(
-            f"Waiting for Player {player.displayName} to decide whether they want to claim Contessa."
+            "Waiting for Player %s to decide whether they want to claim Contessa.", player.displayName
         )
         await self.displayEmbed(embed = askContessaEmbed, view = askContessaView)
 
         await self.acquireValidInputLock(
-            f"Confirmed {player.displayName} has chosen whether they want to claim Contessa."
+            "Confirmed %s has chosen whether they want to claim Contessa.", player.displayName
         )
         self.releaseValidInputLock(
-            f"Confirmed {player.displayName} has chosen whether they want to claim Contessa."
+            "Confirmed %s has chosen whether they want to claim Contessa.", player.displayName
         )
         return claimContessa
 
@@ -533,13 +588,13 @@ class CoupBotIO(IO):
             if await askRolesComponentResponse(interaction):
                 nonlocal retVal
                 retVal = (interaction.user.id, Character[askRolesSelect.values[0]])
-                self.releaseValidInputLock(f"Player {interaction.user.id} is claiming a role.")
+                self.releaseValidInputLock("Player %s is claiming a role.", interaction.user.id)
 
         async def noClaimsButtonCallback(interaction):
             if await askRolesComponentResponse(interaction, noClaimsButton):
                 nonlocal retVal
                 retVal = (-1, None)
-                self.releaseValidInputLock(f"No players claiming any roles.")
+                self.releaseValidInputLock("No players claiming any roles.")
 
         askRolesSelect.callback = askRolesSelectCallback
         noClaimsButton.callback = noClaimsButtonCallback
@@ -583,8 +638,9 @@ async def on_ready():
         await tree.sync(guild = discord.Object(id = COUP_SERVER_ID))
         client.synced = True
 
-    global currentGame
-    currentGame = None
+    await handRenderer.prerender()
+    await resumeGames()
+    matchmaker.start()
 
     print("Coup bot has logged in.")
 
@@ -624,139 +680,262 @@ async def usedInAcceptedChannel(interaction: discord.Interaction,
     return True
 
 
+async def getChannelGame(interaction: discord.Interaction) -> CoupGame:
+    """Call within a slash command. Responds to interaction if there is no
+    game in progress in the channel or thread that it is called from.
+
+    :returns: The game played where the interaction was called from, or None
+        if there is not one."""
+    game = games.get(interaction.channel_id)
+    if game is None:
+        await interaction.response.send_message(
+            embed = getDefaultErrorEmbed(
+                f"This command can only be used in the thread of an active game in the `{COUP_CHANNEL_NAME}` channel."
+            ),
+            ephemeral = True
+        )
+    return game
+
+
+async def isInGame(player: int) -> bool:
+    """
+    :returns: Whether player is in any game in progress or about to start."""
+    if player in startingPlayers:
+        return True
+    for game in list(games.values()):
+        await game.acquirePlayerLock("Checking if player %s is in the game.", player)
+        inGame = player in game.playerRegistry
+        game.releasePlayerLock("Finished checking if player %s is in the game.", player)
+        if inGame:
+            return True
+    return False
+
+
 @tree.command(name = "hand", description = "Shows current hand.", guild = discord.Object(id = COUP_SERVER_ID))
 async def self(interaction: discord.Interaction):
-    global currentGame
-    if await usedInAcceptedChannel(interaction, COUP_CHANNEL_ID, COUP_CHANNEL_NAME):
+    game = await getChannelGame(interaction)
+    if game:
         playerName: int = interaction.user.id
-        if currentGame:
-            await currentGame.acquirePlayerLock(f"Viewing Player {playerName}'s hand.")
-            handPNGPath: str = None
-            try:
-                player: Player = currentGame.getPlayerByName(playerName)
-                playerCharacters: list[str] = [card.character.name for card in player.hand.cardList]
-                playerCharacters.sort()
-                handPNGPath = generateHandCards(playerCharacters)
-                handPNGFile = discord.File(handPNGPath)
-                handEmbed = getDefaultMiscEmbed(f"Coins: {str(player.numCoins())}")
-                handEmbed.set_image(url = f"attachment://{handPNGPath}")
-                await interaction.response.send_message(file = handPNGFile, embed = handEmbed, ephemeral = True)
-            except Exception:
-                await interaction.response.send_message(
-                    embed = getDefaultErrorEmbed("There is not an active game/you aren't in the active game."),
-                    ephemeral = True
-                )
-            finally:
-                if handPNGPath and os.path.exists(handPNGPath):
-                    os.remove(handPNGPath)
-                currentGame.releasePlayerLock(f"Finished viewing player {playerName}'s hand")
+        await game.acquirePlayerLock("Viewing Player %s's hand.", playerName)
+        player: Player = None
+        try:
+            player = game.getPlayerByName(playerName)
+            playerCharacters: list[str] = [character.name for character in player.hand]
+            playerCharacters.sort()
+            numCoins: int = player.numCoins()
+        except Exception:
+            pass
+        finally:
+            game.releasePlayerLock("Finished viewing player %s's hand", playerName)
+        if player:
+            handPNGFile = discord.File(BytesIO(await handRenderer.renderHand(playerCharacters)), filename = "hand.png")
+            handEmbed = getDefaultMiscEmbed(f"Coins: {str(numCoins)}")
+            handEmbed.set_image(url = "attachment://hand.png")
+            await interaction.response.send_message(file = handPNGFile, embed = handEmbed, ephemeral = True)
         else:
             await interaction.response.send_message(
-                embed = getDefaultErrorEmbed("There is not an active game/you aren't in the active game."),
+                embed = getDefaultErrorEmbed("You aren't in this game."),
                 ephemeral = True
             )
 
 
 @tree.command(name = "gamestate", description = "Shows the number of cards in each player's hand.", guild = discord.Object(id = COUP_SERVER_ID))
 async def self(interaction: discord.Interaction):
-    global currentGame
-    if await usedInAcceptedChannel(interaction, COUP_CHANNEL_ID, COUP_CHANNEL_NAME):
-        if currentGame:
-            await currentGame.acquirePlayerLock("Viewing cards in each player's hands.")
-            players: str = ""
-            numCards: str = ""
-            numCoins: str = ""
-            for player in currentGame.players:
-                players += player.displayName + "\n"
-                numCards += str(player.handSize()) + "\n"
-                numCoins += str(player.numCoins()) + "\n"
-            currentGame.releasePlayerLock("Finished viewing cards in each player's hands.")
-
-            embedGameState = discord.Embed(
-                title = "Current Game State",
-                color = EMBED_MISC_COLOR
-            )
-            embedGameState.add_field(name = "Player Name", value = players, inline = True)
-            embedGameState.add_field(name = "# Cards", value = numCards, inline = True)
-            embedGameState.add_field(name = "# Coins", value = numCoins, inline = True)
-            embedGameState.add_field(name = "Turn Order", value = ":arrow_down:", inline = True)
-            await interaction.response.send_message(embed = embedGameState)
-        else:
-            await interaction.response.send_message(
-                embed = getDefaultErrorEmbed("There is not an active game.")
-            )
+    game = await getChannelGame(interaction)
+    if game:
+        await game.acquirePlayerLock("Viewing cards in each player's hands.")
+        players: str = ""
+        numCards: str = ""
+        numCoins: str = ""
+        for player in game.players:
+            players += player.displayName + "\n"
+            numCards += str(player.handSize()) + "\n"
+            numCoins += str(player.numCoins()) + "\n"
+        game.releasePlayerLock("Finished viewing cards in each player's hands.")
+
+        embedGameState = discord.Embed(
+            title = "Current Game State",
+            color = EMBED_MISC_COLOR
+        )
+        embedGameState.add_field(name = "Player Name", value = players, inline = True)
+        embedGameState.add_field(name = "# Cards", value = numCards, inline = True)
+        embedGameState.add_field(name = "# Coins", value = numCoins, inline = True)
+        embedGameState.add_field(name = "Turn Order", value = ":arrow_down:", inline = True)
+        await interaction.response.send_message(embed = embedGameState)
 
 
-@tree.command(name = "startgame", description = "Starts the Coup game.", guild = discord.Object(id = COUP_SERVER_ID))
+@tree.command(name = "history", description = "Shows what has happened recently in the game.", guild = discord.Object(id = COUP_SERVER_ID))
+async def self(interaction: discord.Interaction):
+    game = await getChannelGame(interaction)
+    if game:
+        events = game.eventLog.since(max(len(game.eventLog) - HISTORY_LENGTH, 0))
+        lostCards: str = ""
+        for playerName, characters in game.eventLog.state.lostCards.items():
+            if characters:
+                lostCards += f"{game.displayName(playerName)}: {', '.join(character.name for character in characters)}\n"
+        embedHistory = getDefaultMiscEmbed(
+            f"Last {len(events)} events (turn {game.eventLog.state.numTurns})",
+            "\n".join(describe(event, game.displayName) for event in events)
+        )
+        embedHistory.add_field(name = "Lost Cards", value = lostCards or "None", inline = False)
+        await interaction.response.send_message(embed = embedHistory, ephemeral = True)
+
+
+def newGameIO(gameThread: discord.Thread) -> ComputerPlayerIO:
+    """
+    :returns: IO for a game in gameThread, which makes the moves of any
+        computer players in the game. Its game has to be set once the game
+        has been created."""
+    return ComputerPlayerIO(CoupBotIO(gameThread), COMPUTER_MOVE_TIME, computerPlayerExecutor)
+
+
+async def runGame(players: list[int], displayNames: list[str]):
+    """Plays a game with the given players, which have been added to
+    startingPlayers, in a new thread of the game channel."""
+    global numGamesStarted
+    numGamesStarted += 1
+    try:
+        gameThread: discord.Thread = await COUP_CHANNEL.create_thread(
+            name = f"Coup game {numGamesStarted}",
+            type = discord.ChannelType.public_thread,
+            auto_archive_duration = GAME_THREAD_DURATION
+        )
+        await LOBBY_CHANNEL.send(embed = getDefaultMiscEmbed(
+            f"Starting Coup game with {len(players)} players in {gameThread.mention}."
+        ))
+        # Mentioning the players adds them to the thread
+        await gameThread.send(" ".join(f"<@{player}>" for player in players if not isComputerPlayer(player)))
+        ioManager = newGameIO(gameThread)
+        game = CoupGame(players, displayNames, ioManager, logFile = newGameLogPath(gameThread.id))
+        ioManager.game = game
+        games[gameThread.id] = game
+    finally:
+        async with playerQueueLock:
+            startingPlayers.difference_update(players)
+    await playGame(gameThread.id, game)
+
+
+async def playGame(gameThreadId: int, game: CoupGame):
+    """Plays game, which has been added to games, to the end, saving it to
+    gameStore after every turn. If the bot shuts down and cancels the game,
+    the game stays saved so that it is resumed when the bot restarts."""
+    try:
+        await gameStore.save(gameThreadId, game)
+        await game.startGame(lambda: gameStore.save(gameThreadId, game))
+        await gameStore.delete(gameThreadId)
+        await client.get_channel(gameThreadId).send(embed = getDefaultGameEmbed(
+            "Game Summary", summarize(game.eventLog.events, game.displayName)
+        ))
+    except Exception:
+        await gameStore.delete(gameThreadId)
+        raise
+    finally:
+        del games[gameThreadId]
+
+
+def startGameTask(gameCoroutine: Coroutine):
+    """Runs a game in the background, keeping a reference to it in
+    gameTasks."""
+    task = create_task(gameCoroutine)
+    gameTasks.add(task)
+    task.add_done_callback(gameTasks.discard)
+
+
+async def resumeGames():
+    """Resumes the games in gameStore, which were in progress when the bot
+    last stopped, from the start of the turn that was interrupted."""
+    for gameThreadId, state in await gameStore.loadAll():
+        if gameThreadId in games:
+            continue
+        try:
+            gameThread = client.get_channel(gameThreadId) or await client.fetch_channel(gameThreadId)
+            await gameThread.send(embed = getDefaultMiscEmbed(
+                "The bot has restarted, so this game has been resumed from the start of the current turn."
+            ))
+        except discord.DiscordException:
+            logging.exception("Unable to resume the game in thread %s.", gameThreadId)
+            await gameStore.delete(gameThreadId)
+            continue
+        ioManager = newGameIO(gameThread)
+        game = CoupGame.fromState(state, ioManager)
+        ioManager.game = game
+        games[gameThreadId] = game
+        startGameTask(playGame(gameThreadId, game))
+
+
+async def startQueuedGames(fillWithComputers: bool = False) -> list[int]:
+    """Takes as many players as possible from the front of the queue and
+    starts games for them, split by partitionPlayers.
+
+    :param fillWithComputers: If there are too few players in the queue for a
+        game, start one anyway with computer players in the empty seats.
+    :returns: Number of players in each game that was started, including
+        computer players."""
+    async with playerQueueLock:
+        gameSizes: list[int] = partitionPlayers(len(playerQueue), MIN_PLAYERS, MAX_PLAYERS)
+        if not gameSizes and fillWithComputers and len(playerQueue):
+            gameSizes = [len(playerQueue)]
+        gamePlayers: list[tuple[list[int], list[str]]] = []
+        for gameSize in gameSizes:
+            front = playerQueue.popFront(gameSize)
+            gamePlayers.append((list(front), list(front.values())))
+            startingPlayers.update(front)
+    for players, displayNames in gamePlayers:
+        computerPlayers: list[int] = (
+            COMPUTER_PLAYER_NAMES[:max(0, MIN_PLAYERS - len(players))] if fillWithComputers else []
+        )
+        players += computerPlayers
+        displayNames += map(computerDisplayName, computerPlayers)
+        startGameTask(runGame(players, displayNames))
+    return [len(players) for players, _ in gamePlayers]
+
+
+matchmaker: Matchmaker = Matchmaker(startQueuedGames, MATCHMAKING_DELAY)
+"""Starts games MATCHMAKING_DELAY seconds after players join the queue."""
+
+
+@tree.command(name = "startgame", description = "Starts Coup games for the players in queue.", guild = discord.Object(id = COUP_SERVER_ID))
 async def self(interaction: discord.Interaction):
-    global currentGame
-    global playerQueue
-    global playerQueueDisplayNames
     if await usedInAcceptedChannel(interaction, LOBBY_CHANNEL_ID, LOBBY_CHANNEL_NAME):
-        if not currentGame:
-            await playerQueueLock.acquire()
-            if len(playerQueue) < MIN_PLAYERS:
-                errorMessage = f"Unable to start game. {len(playerQueue)} out of a "
-                errorMessage += f"minimum of {MIN_PLAYERS} players are in queue."
-                await interaction.response.send_message(
-                    embed = getDefaultErrorEmbed(errorMessage)
-                )
-                playerQueueLock.release()
-                return
-            frontQueue: list[int] = playerQueue[:MAX_PLAYERS]
+        gameSizes = await startQueuedGames(fillWithComputers = True)
+        if not gameSizes:
+            errorMessage = "Unable to start game. There are no players in queue."
             await interaction.response.send_message(
-                embed = getDefaultMiscEmbed(
-                    f"Starting Coup game with {len(frontQueue)} players.",
-                    f"The maximum number of players in a game is {MAX_PLAYERS}."
-                )
+                embed = getDefaultErrorEmbed(errorMessage)
             )
-            currentGame = CoupGame(
-                playerQueue[:MAX_PLAYERS],
-                playerQueueDisplayNames[:MAX_PLAYERS],
-                CoupBotIO()
-            )
-            playerQueue = playerQueue[MAX_PLAYERS:]
-            playerQueueDisplayNames = playerQueueDisplayNames[MAX_PLAYERS:]
-            playerQueueLock.release()
-            await currentGame.startGame()
-            currentGame = None
-        else:
-            await interaction.response.send_message(
-                embed = getDefaultErrorEmbed("There is already a game in progress.")
+            return
+        await interaction.response.send_message(
+            embed = getDefaultMiscEmbed(
+                f"Starting {len(gameSizes)} Coup game(s) with {', '.join(map(str, gameSizes))} players.",
+                f"The maximum number of players in a game is {MAX_PLAYERS}."
             )
+        )
 
 
 @tree.command(name = "joinqueue", description = "Join queue for Coup.", guild = discord.Object(id = COUP_SERVER_ID))
 async def self(interaction: discord.Interaction):
-    global currentGame
-    global playerQueue
-    global playerQueueDisplayNames
     if await usedInAcceptedChannel(interaction, LOBBY_CHANNEL_ID, LOBBY_CHANNEL_NAME):
         async with playerQueueLock:
             player = interaction.user.id
             playerDisplayName = interaction.user.display_name
 
-            # Check that the user isn't in the current game.
-            if currentGame:
-                await currentGame.acquirePlayerLock(f"Checking if player {player} is in the current game.")
-                if player in currentGame.playerNames:
-                    await interaction.response.send_message(
-                        embed = getDefaultErrorEmbed("You are already in the active game.")
-                    )
-                    currentGame.releasePlayerLock(f"Finished checking if player {player} is in the current game.")
-                    return
-                currentGame.releasePlayerLock(f"Finished checking if player {player} is in the current game.")
+            # Check that the user isn't in a game in progress.
+            if await isInGame(player):
+                await interaction.response.send_message(
+                    embed = getDefaultErrorEmbed("You are already in an active game.")
+                )
+                return
 
-            if player in playerQueue:
+            if not playerQueue.join(player, playerDisplayName):
                 await interaction.response.send_message(
                     embed = getDefaultErrorEmbed("You are already in the queue.")
                 )
             else:
-                playerQueue.append(player)
-                playerQueueDisplayNames.append(playerDisplayName)
+                matchmaker.notify()
                 embedQueue = discord.Embed(
                     title = "You have been added to the queue for the next game of Coup.",
-                    description = "Use `/queue` to view your position in queue.\nUse `/leavequeue` to leave the queue.",
+                    description = f"You are number {playerQueue.position(player) + 1} in queue.\n"
+                                  "Use `/queue` to view the queue.\nUse `/leavequeue` to leave the queue.",
                     color = EMBED_MISC_COLOR
                 )
                 await interaction.response.send_message(
@@ -766,19 +945,10 @@ async def self(interaction: discord.Interaction):
 
 @tree.command(name = "leavequeue", description = "Leaves queue for Coup.", guild = discord.Object(id = COUP_SERVER_ID))
 async def self(interaction: discord.Interaction):
-    global playerQueue
-    global playerQueueDisplayNames
     if await usedInAcceptedChannel(interaction, LOBBY_CHANNEL_ID, LOBBY_CHANNEL_NAME):
         async with playerQueueLock:
             player = interaction.user.id
-            playerFound: bool = False
-            for i in range(0, len(playerQueue)):
-                if playerQueue[i] == player:
-                    del playerQueue[i]
-                    del playerQueueDisplayNames[i]
-                    playerFound = True
-                    break
-            if playerFound:
+            if playerQueue.leave(player):
                 await interaction.response.send_message(
                     embed = getDefaultMiscEmbed("You have been removed from the queue for Coup.")
                 )
@@ -790,12 +960,9 @@ async def self(interaction: discord.Interaction):
 
 @tree.command(name = "queue", description = "View current queue for Coup.", guild = discord.Object(id = COUP_SERVER_ID))
 async def self(interaction: discord.Interaction):
-    global playerQueueDisplayNames
     if await usedInAcceptedChannel(interaction, LOBBY_CHANNEL_ID, LOBBY_CHANNEL_NAME):
         async with playerQueueLock:
-            players: str = ""
-            for playerDisplayName in playerQueueDisplayNames:
-                players += playerDisplayName + "\n"
+            players: str = "\n".join(playerQueue.displayNames())
 
             if not players:
                 players = "There are no players in queue currently."
@@ -810,6 +977,26 @@ async def self(interaction: discord.Interaction):
             )
 
 
+@tree.command(name = "locks", description = "Shows lock contention, hold times and recent lock events.", guild = discord.Object(id = COUP_SERVER_ID))
+async def self(interaction: discord.Interaction):
+    if interaction.user.id != ADMIN_ID:
+        await interaction.response.send_message(
+            embed = getDefaultErrorEmbed("Only the admin can use this command."),
+            ephemeral = True
+        )
+        return
+    # Discord messages are limited to 2000 characters, so the full list of
+    # events is attached as a file.
+    await interaction.response.send_message(
+        f"```\n{tracer.contentionReport()[:1900]}```",
+        file = discord.File(
+            BytesIO((tracer.holdTimeReport() + "\n" + tracer.contentionReport() + "\n" + tracer.dump()).encode()),
+            filename = "locks.txt"
+        ),
+        ephemeral = True
+    )
+
+
 @tree.command(name = "commands", description = "Lists all commands.", guild = discord.Object(id = COUP_SERVER_ID))
 async def self(interaction: discord.Interaction):
     if await usedInAcceptedChannel(interaction, LOBBY_CHANNEL_ID, LOBBY_CHANNEL_NAME):
@@ -835,4 +1022,6 @@ async def self(interaction: discord.Interaction):
         )
 
 
-client.run(TOKEN)
+if __name__ == "__main__":
+    computerPlayerExecutor = ProcessPoolExecutor()
+    client.run(TOKEN)
@@ -0,0 +1,323 @@
+from asyncio import gather, get_running_loop
+from concurrent.futures import Executor
+import math
+import random
+import time
+
+from io_abc import IO
+from game import CoupGame, Player, Character, PlayerMove, MAX_PLAYERS
+from state import CoupState, Phase
+
+COMPUTER_PLAYER_NAMES: list[int] = list(range(1, MAX_PLAYERS + 1))
+"""Names of computer players. Discord user ids are far larger than these, so
+they never clash with a real player."""
+MOVE_TIME: float = 2
+"""Default seconds that a computer player spends searching for each decision."""
+EXPLORATION: float = 0.7
+"""Weight of the exploration term when choosing a move in the search tree."""
+MAX_ROLLOUT_MOVES: int = 1000
+"""Moves after which a rollout is abandoned and counted as a loss."""
+CHALLENGE_CHANCE: float = 0.1
+"""Chance that each opponent challenges a claim, in the model of the decisions
+that are not searched."""
+BLOCK_CHANCE: float = 0.9
+"""Chance that an opponent who holds a blocking character blocks with it."""
+BLUFF_CHANCE: float = 0.1
+"""Chance that an opponent who does not hold a blocking character claims it
+anyway."""
+
+
+def isComputerPlayer(playerName: int) -> bool:
+    return 0 < playerName <= MAX_PLAYERS
+
+
+def computerDisplayName(playerName: int) -> str:
+    return f"Computer {playerName}"
+
+
+def determinize(state: CoupState, playerName: int, rng: random.Random) -> CoupState:
+    """Deals the cards that playerName cannot see at random, keeping the size
+    of every hand and of the deck. Every card that has been revealed to win a
+    challenge is shuffled back into the deck, so any deal of the unseen cards
+    is consistent with what playerName has seen.
+
+    :returns: A clone of state, as it could be from the point of view of
+        playerName."""
+    state = state.clone(rng)
+    opponents: list[int] = [player for player in state.players if player != playerName]
+    unseen: list[Character] = list(state.deck)
+    for opponent in opponents:
+        unseen += state.hands[opponent]
+    rng.shuffle(unseen)
+    for opponent in opponents:
+        handSize: int = len(state.hands[opponent])
+        state.hands[opponent] = tuple(unseen[-handSize:])
+        del unseen[-handSize:]
+    state.deck = unseen
+    return state
+
+
+def opponentMove(state: CoupState, rng: random.Random, playerName: int = None) -> tuple:
+    """Models the answer to a challenge or block that is open to every player:
+    each player challenges now and then, and blocks with the characters that
+    they hold far more often than with the ones they do not.
+
+    :param playerName: Player whose answer is being searched, and who is left
+        out of the model.
+    :returns: The move that answers the challenge or block."""
+    if state.phase is Phase.challenge:
+        for player in state.players:
+            if player != state.claimer and player != playerName and rng.random() < CHALLENGE_CHANCE:
+                return "ch", player
+        return "ch", -1
+    for move in state.legalMoves()[1:]:
+        if move[1] != playerName:
+            chance: float = BLOCK_CHANCE if Character(move[2]) in state.hands[move[1]] else BLUFF_CHANCE
+            if rng.random() < chance:
+                return move
+    return "r", -1, None
+
+
+def rolloutMove(state: CoupState, rng: random.Random) -> tuple:
+    """Fast default policy: challenges and blocks follow opponentMove, a
+    challenged player reveals the claimed character if they hold it, and every
+    other decision is made at random.
+
+    :returns: The move to make."""
+    phase = state.phase
+    if phase is Phase.challenge or phase is Phase.block:
+        return opponentMove(state, rng)
+    if phase is Phase.reveal:
+        hand: tuple[Character, ...] = state.hands[state.claimer]
+        if state.claimCharacter in hand:
+            return "k", state.claimer, hand.index(state.claimCharacter)
+    return rng.choice(state.legalMoves())
+
+
+def decision(state: CoupState, playerName: int) -> (int, list[tuple]):
+    """Challenges and blocks are open to every player, but only playerName's
+    answer is searched: passing leaves the answer to opponentMove.
+
+    :returns: The player who makes the next decision in the search tree and
+        the moves that they choose between, or (None, None) if the decision is
+        left to opponentMove."""
+    phase = state.phase
+    if phase is Phase.challenge:
+        if playerName in state.players and playerName != state.claimer:
+            return playerName, [("ch", -1), ("ch", playerName)]
+        return None, None
+    if phase is Phase.block:
+        claims: list[tuple] = [move for move in state.legalMoves()[1:] if move[1] == playerName]
+        if claims:
+            return playerName, [("r", -1, None)] + claims
+        return None, None
+    return state.currentPlayer(), state.legalMoves()
+
+
+class Node:
+    """Node of the search tree, reached by a move that chooser made."""
+
+    __slots__ = ("chooser", "children", "visits", "wins", "availability")
+
+    def __init__(self, chooser: int):
+        self.chooser: int = chooser
+        self.children: dict[tuple, Node] = {}
+        self.visits: int = 0
+        self.wins: int = 0
+        """Number of visits after which chooser won."""
+        self.availability: int = 0
+        """Number of visits to the parent in which the move to this node could
+        be made, since a move may be legal in some deals but not others."""
+
+    def score(self) -> float:
+        return self.wins / self.visits + EXPLORATION * math.sqrt(math.log(self.availability) / self.visits)
+
+
+def searchMove(state: CoupState, playerName: int, moveTime: float, seed: int) -> (tuple, int):
+    """Single-observer information set Monte Carlo tree search: each simulation
+    deals the unseen cards at random, walks down one tree shared by all deals,
+    adds a node for a move that has not been tried and plays the rest of the
+    game with rolloutMove. Every player's decisions are in the tree, except for
+    the challenges and blocks of other players, which follow opponentMove.
+    Runs in a worker, so it takes and returns only picklable values.
+
+    :param playerName: Player whose decision is being searched, from whose
+        point of view the unseen cards are dealt.
+    :returns: The move that was visited the most from the root, and the number
+        of simulations that were run."""
+    rootMoves: list[tuple] = decision(state, playerName)[1]
+    if len(rootMoves) == 1:
+        return rootMoves[0], 0
+    rng = random.Random(seed)
+    root = Node(None)
+    deadline: float = time.perf_counter() + moveTime
+    numSimulations: int = 0
+    while not numSimulations or time.perf_counter() < deadline:
+        simulated: CoupState = determinize(state, playerName, rng)
+        node: Node = root
+        path: list[Node] = []
+        while not simulated.isOver():
+            chooser, moves = decision(simulated, playerName)
+            if chooser is None:
+                simulated.apply(opponentMove(simulated, rng))
+                continue
+            for move in moves:
+                if move in node.children:
+                    node.children[move].availability += 1
+            untried: list[tuple] = [move for move in moves if move not in node.children]
+            if untried:
+                move = rng.choice(untried)
+                node.children[move] = child = Node(chooser)
+                child.availability = 1
+            else:
+                move = max(moves, key = lambda move: node.children[move].score())
+                child = node.children[move]
+            if move[1] == -1:
+                simulated.apply(opponentMove(simulated, rng, playerName))
+            else:
+                simulated.apply(move)
+            node = child
+            path.append(child)
+            if untried:
+                break
+        for _ in range(MAX_ROLLOUT_MOVES):
+            if simulated.isOver():
+                break
+            simulated.apply(rolloutMove(simulated, rng))
+        for node in path:
+            node.visits += 1
+            node.wins += simulated.winner == node.chooser
+        numSimulations += 1
+    return max(rootMoves, key = lambda move: root.children[move].visits if move in root.children else -1), numSimulations
+
+
+class ComputerPlayerIO(IO):
+    """Passes all I/O through to another IO, except for the decisions of
+    computer players, which are searched for in executor so that the event
+    loop is never blocked. Challenges and blocks are put to the computer
+    players first, and only put to the players through the other IO if none of
+    the computer players take them and a player could.
+
+    Keeps a CoupState in step with the game by applying every answer to it, so
+    that a search can start from any decision of a turn. game has to be set
+    once the game has been created."""
+    def __init__(self, ioManager: IO, moveTime: float = MOVE_TIME, executor: Executor = None):
+        """
+        :param moveTime: Seconds that a computer player searches for each
+            decision.
+        :param executor: Pool that searches run in. Defaults to the event
+            loop's default thread pool, but a process pool lets searches from
+            several games run in parallel."""
+        self.ioManager: IO = ioManager
+        self.moveTime: float = moveTime
+        self.executor: Executor = executor
+        self.game: CoupGame = None
+        self.state: CoupState = None
+        """State of game as of the last answer, which is copied from game at
+        the start of each turn."""
+        self.rng: random.Random = random.Random()
+
+    async def search(self, playerName: int) -> tuple:
+        move, _ = await get_running_loop().run_in_executor(
+            self.executor, searchMove, self.state, playerName, self.moveTime, self.rng.getrandbits(64)
+        )
+        return move
+
+    async def displayMessage(self, message: str):
+        await self.ioManager.displayMessage(message)
+
+    async def displayError(self, message: str):
+        await self.ioManager.displayError(message)
+
+    async def displayStatus(self, message: str):
+        await self.ioManager.displayStatus(message)
+
+    async def getInput(self, player: Player = None) -> str:
+        return await self.ioManager.getInput(player)
+
+    async def getPlayerInput(self, player: Player) -> PlayerMove:
+        self.state = CoupState.fromGame(self.game)
+        if isComputerPlayer(player.name):
+            pm = PlayerMove((await self.search(player.name))[2])
+            await self.ioManager.displayStatus(f"{player.displayName} chose {pm.name.replace('_', ' ')}.")
+        else:
+            pm = await self.ioManager.getPlayerInput(player)
+        self.state.apply(("m", player.name, pm.value))
+        return pm
+
+    async def getChallenges(self, curPlayer: Player, claimCharacter: Character, validPlayerNames: list[int]) -> int:
+        eligible: list[int] = [
+            player for player in self.state.players if player != curPlayer.name and player in validPlayerNames
+        ]
+        moves: list[tuple] = await gather(*(self.search(player) for player in eligible if isComputerPlayer(player)))
+        challengers: list[int] = [move[1] for move in moves if move[1] != -1]
+        if challengers:
+            challengerName: int = challengers[0]
+            await self.ioManager.displayStatus(
+                f"{computerDisplayName(challengerName)} challenges {curPlayer.displayName}'s claim of {claimCharacter.name}."
+            )
+        elif any(not isComputerPlayer(player) for player in eligible):
+            challengerName = await self.ioManager.getChallenges(curPlayer, claimCharacter, validPlayerNames)
+        else:
+            challengerName = -1
+        self.state.apply(("ch", challengerName))
+        return challengerName
+
+    async def getPlayerTargetChoice(self, player: Player, playerList: list[Player]) -> int:
+        if isComputerPlayer(player.name):
+            targetName: int = (await self.search(player.name))[2]
+            target: Player = next(target for target in playerList if target.name == targetName)
+            await self.ioManager.displayStatus(f"{player.displayName} targets {target.displayName}.")
+        else:
+            targetName = await self.ioManager.getPlayerTargetChoice(player, playerList)
+        self.state.apply(("t", player.name, targetName))
+        return targetName
+
+    async def getPlayerCardChoice(self, player: Player, isReveal: bool = True) -> int:
+        if isComputerPlayer(player.name):
+            cardIdx: int = (await self.search(player.name))[2]
+            await self.ioManager.displayStatus(
+                f"{player.displayName} has chosen to {'reveal' if isReveal else 'discard'}: "
+                f"{player.peek(cardIdx).name}."
+            )
+        else:
+            cardIdx = await self.ioManager.getPlayerCardChoice(player, isReveal)
+        self.state.apply(("k", player.name, cardIdx))
+        return cardIdx
+
+    async def askPlayerContessa(self, player: Player) -> bool:
+        if isComputerPlayer(player.name):
+            claimContessa: bool = (await self.search(player.name))[2]
+            if claimContessa:
+                await self.ioManager.displayStatus(f"{player.displayName} claims Contessa.")
+        else:
+            claimContessa = await self.ioManager.askPlayerContessa(player)
+        self.state.apply(("co", player.name, claimContessa))
+        return claimContessa
+
+    async def askPlayersRoles(self, characterList: list[Character], validPlayerNames: list[int]) -> (int, Character):
+        eligible: list[int] = list(dict.fromkeys(
+            move[1] for move in self.state.legalMoves()[1:] if move[1] in validPlayerNames
+        ))
+        moves: list[tuple] = await gather(*(self.search(player) for player in eligible if isComputerPlayer(player)))
+        claims: list[tuple] = [move for move in moves if move[1] != -1]
+        if claims:
+            claimPlayerName, claimPlayerRole = claims[0][1], Character(claims[0][2])
+            await self.ioManager.displayStatus(
+                f"{computerDisplayName(claimPlayerName)} claims {claimPlayerRole.name}."
+            )
+        elif any(not isComputerPlayer(player) for player in eligible):
+            claimPlayerName, claimPlayerRole = await self.ioManager.askPlayersRoles(characterList, validPlayerNames)
+        else:
+            claimPlayerName, claimPlayerRole = -1, None
+        self.state.apply(("r", claimPlayerName, None if claimPlayerRole is None else claimPlayerRole.value))
+        return claimPlayerName, claimPlayerRole
+
+    async def playerAssassinated(self, assassin: Player, assassinee: Player):
+        await self.ioManager.playerAssassinated(assassin, assassinee)
+
+    async def playerEliminated(self, player: Player):
+        await self.ioManager.playerEliminated(player)
+
+    async def playerWon(self, player: Player):
+        await self.ioManager.playerWon(player)
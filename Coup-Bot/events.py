@@ -0,0 +1,249 @@
+from enum import Enum
+from typing import Callable, NamedTuple, Union
+
+from game_rules import Character, PlayerMove, STARTING_COINS, STARTING_HAND_SIZE
+
+
+class GameStarted(NamedTuple):
+    players: list[int]
+    """Names of the players, in turn order."""
+
+
+class ActionDeclared(NamedTuple):
+    player: int
+    action: PlayerMove
+    target: int
+    """None for moves without a target."""
+
+
+class Challenged(NamedTuple):
+    challenger: int
+    claimer: int
+    character: Character
+
+
+class Blocked(NamedTuple):
+    """A player claimed a character to block the current move, including
+    claiming Contessa against an assassination."""
+    player: int
+    character: Character
+
+
+class CardRevealed(NamedTuple):
+    """A challenged player revealed a card. If proved, it was the claimed
+    character and they shuffled it into the deck and drew a new card."""
+    player: int
+    character: Character
+    proved: bool
+
+
+class CardLost(NamedTuple):
+    player: int
+    character: Character
+
+
+class CoinsMoved(NamedTuple):
+    """source or destination is None for the treasury."""
+    source: int
+    destination: int
+    amount: int
+
+
+class Eliminated(NamedTuple):
+    """A player lost their last card or quit."""
+    player: int
+
+
+Event = Union[GameStarted, ActionDeclared, Challenged, Blocked, CardRevealed, CardLost, CoinsMoved, Eliminated]
+"""Something that every player in a game saw happen."""
+EVENT_TYPES: dict[str, type] = {eventType.__name__: eventType for eventType in Event.__args__}
+
+
+def toEntry(event: Event) -> list:
+    """
+    :returns: JSON serializable form of event, with Enums stored as their
+        values. See fromEntry."""
+    return [type(event).__name__] + [value.value if isinstance(value, Enum) else value for value in event]
+
+
+def fromEntry(entry: list) -> Event:
+    """
+    :returns: The event that was saved as entry by toEntry."""
+    eventType = EVENT_TYPES[entry[0]]
+    fieldTypes = eventType.__annotations__
+    return eventType(*(
+        fieldTypes[field](value) if isinstance(fieldTypes[field], type) and issubclass(fieldTypes[field], Enum)
+        else value
+        for field, value in zip(eventType._fields, entry[1:])
+    ))
+
+
+class PublicState:
+    """What every player can see of a game: coins, hand sizes and lost cards.
+    Built by applying events in order, and taken back by reverting them in
+    the opposite order, so that it never has to be copied."""
+
+    def __init__(self):
+        self.seats: list[int] = []
+        """Names of all players who started the game, in turn order."""
+        self.coins: dict[int, int] = {}
+        self.handSizes: dict[int, int] = {}
+        self.lostCards: dict[int, list[Character]] = {}
+        """Face up cards that each player has lost, in the order they lost
+        them."""
+        self.eliminated: list[int] = []
+        """Names of eliminated players, in the order they were eliminated."""
+        self.numTurns: int = 0
+
+    @classmethod
+    def project(cls, events: list[Event]):
+        """
+        :returns: The PublicState after events."""
+        state = cls()
+        for event in events:
+            state.apply(event)
+        return state
+
+    def players(self) -> list[int]:
+        """
+        :returns: Names of the players who are still in the game, in turn
+            order."""
+        return [player for player in self.seats if player not in self.eliminated]
+
+    def apply(self, event: Event):
+        eventType = type(event)
+        if eventType is GameStarted:
+            self.seats = list(event.players)
+            self.coins = {player: STARTING_COINS for player in event.players}
+            self.handSizes = {player: STARTING_HAND_SIZE for player in event.players}
+            self.lostCards = {player: [] for player in event.players}
+            self.eliminated = []
+            self.numTurns = 0
+        elif eventType is ActionDeclared:
+            self.numTurns += 1
+        elif eventType is CardLost:
+            self.handSizes[event.player] -= 1
+            self.lostCards[event.player].append(event.character)
+        elif eventType is CoinsMoved:
+            self.moveCoins(event.source, event.destination, event.amount)
+        elif eventType is Eliminated:
+            self.eliminated.append(event.player)
+
+    def revert(self, event: Event):
+        """Takes back event, which has to be the last event that was
+        applied."""
+        eventType = type(event)
+        if eventType is GameStarted:
+            self.__init__()
+        elif eventType is ActionDeclared:
+            self.numTurns -= 1
+        elif eventType is CardLost:
+            self.handSizes[event.player] += 1
+            self.lostCards[event.player].pop()
+        elif eventType is CoinsMoved:
+            self.moveCoins(event.destination, event.source, event.amount)
+        elif eventType is Eliminated:
+            self.eliminated.pop()
+
+    def moveCoins(self, source: int, destination: int, amount: int):
+        if source is not None:
+            self.coins[source] -= amount
+        if destination is not None:
+            self.coins[destination] += amount
+
+
+class EventLog:
+    """Append-only log of the events of a game, with the PublicState that they
+    project to kept up to date. Appending and undoing are O(1)."""
+
+    def __init__(self):
+        self.events: list[Event] = []
+        self.state: PublicState = PublicState()
+        """PublicState after every event in events."""
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    def __iter__(self):
+        return iter(self.events)
+
+    def append(self, event: Event):
+        self.events.append(event)
+        self.state.apply(event)
+
+    def undo(self) -> Event:
+        """Removes the last event, and takes it back from state.
+
+        :returns: The removed event.
+        :raises IndexError: If there are no events."""
+        event = self.events.pop()
+        self.state.revert(event)
+        return event
+
+    def since(self, n: int) -> list[Event]:
+        """
+        :returns: Events after the first n, for catching up a viewer who has
+            seen those."""
+        return self.events[n:]
+
+
+def describe(event: Event, displayName: Callable[[int], str]) -> str:
+    """
+    :param displayName: Gives the display name of a player from their name.
+    :returns: One line description of event."""
+    eventType = type(event)
+    if eventType is GameStarted:
+        return f"The game started with {', '.join(map(displayName, event.players))}."
+    elif eventType is ActionDeclared:
+        description = f"{displayName(event.player)} chose {event.action.name.replace('_', ' ')}"
+        if event.target is not None:
+            description += f" against {displayName(event.target)}"
+        return description + "."
+    elif eventType is Challenged:
+        return f"{displayName(event.challenger)} challenged {displayName(event.claimer)}'s claim of {event.character.name}."
+    elif eventType is Blocked:
+        return f"{displayName(event.player)} claimed {event.character.name} to block."
+    elif eventType is CardRevealed:
+        outcome = "proving the claim" if event.proved else "losing the challenge"
+        return f"{displayName(event.player)} revealed {event.character.name}, {outcome}."
+    elif eventType is CardLost:
+        return f"{displayName(event.player)} lost {event.character.name}."
+    elif eventType is CoinsMoved:
+        if event.source is None:
+            return f"{displayName(event.destination)} took {event.amount} coin(s)."
+        elif event.destination is None:
+            return f"{displayName(event.source)} paid {event.amount} coin(s)."
+        return f"{displayName(event.destination)} stole {event.amount} coin(s) from {displayName(event.source)}."
+    return f"{displayName(event.player)} was eliminated."
+
+
+def summarize(events: list[Event], displayName: Callable[[int], str]) -> str:
+    """
+    :param displayName: Gives the display name of a player from their name.
+    :returns: Summary of a finished game, with a line for each player from
+        the winner to the first player eliminated."""
+    state = PublicState.project(events)
+    turns: dict[int, int] = {player: 0 for player in state.seats}
+    coinsTaken: dict[int, int] = {player: 0 for player in state.seats}
+    challengesWon: dict[int, int] = {player: 0 for player in state.seats}
+    challengesLost: dict[int, int] = {player: 0 for player in state.seats}
+    challenger: int = None
+    for event in events:
+        eventType = type(event)
+        if eventType is ActionDeclared:
+            turns[event.player] += 1
+        elif eventType is CoinsMoved and event.destination is not None:
+            coinsTaken[event.destination] += event.amount
+        elif eventType is Challenged:
+            challenger = event.challenger
+        elif eventType is CardRevealed:
+            winner, loser = (event.player, challenger) if event.proved else (challenger, event.player)
+            challengesWon[winner] += 1
+            challengesLost[loser] += 1
+    lines: list[str] = []
+    for place, player in enumerate(state.players() + state.eliminated[::-1]):
+        lines.append(
+            f"{place + 1}. {displayName(player)}: {turns[player]} turn(s), {coinsTaken[player]} coin(s) taken, "
+            f"{challengesWon[player]} challenge(s) won, {challengesLost[player]} lost"
+        )
+    return "\n".join(lines)
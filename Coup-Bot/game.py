@@ -1,160 +1,136 @@
-from enum import Enum
-from asyncio import Lock, get_event_loop
+from asyncio import run
+from typing import Awaitable, Callable
 import random
+import base64
+import struct
 import logging
+import json
 
 from io_abc import IO
+from tracing import TracedLock
+from game_rules import Character, PlayerMove, MAX_PLAYERS, STARTING_COINS
+from events import (
+    EventLog, GameStarted, ActionDeclared, Challenged, Blocked, CardRevealed, CardLost, CoinsMoved, Eliminated, toEntry,
+    fromEntry
+)
 
 
-class Character(Enum):
-    Duke = 0
-    Assassin = 1
-    Captain = 2
-    Ambassador = 3
-    Contessa = 4
-
-
-class PlayerMove(Enum):
-    Income = 0
-    Foreign_Aid = 1
-    Coup = 2
-    Tax = 3
-    Assassinate = 4
-    Steal = 5
-    Exchange = 6
-    Quit = 7
-
-
-MAX_PLAYERS = 6
-MIN_PLAYERS = 2
-STARTING_COINS = 2
 logging.basicConfig(
     level = logging.INFO,
     handlers = [logging.StreamHandler()]
 )
 
 
+def packRngState(rng: random.Random) -> list:
+    """
+    :returns: JSON serializable state of rng, with the Mersenne Twister state
+        packed into base64 so that it takes up about 3 KB instead of 7."""
+    version, internalState, gauss = rng.getstate()
+    return [version, base64.b64encode(struct.pack(f"<{len(internalState)}I", *internalState)).decode(), gauss]
+
+
+def unpackRngState(rng: random.Random, packedState: list):
+    """Restores the state of rng from packRngState."""
+    version, internalState, gauss = packedState
+    internalState = base64.b64decode(internalState)
+    rng.setstate((version, struct.unpack(f"<{len(internalState) // 4}I", internalState), gauss))
+
+
 class CoupError(Exception):
     def __init__(self, message: str):
         super().__init__(message)
         self.message = message
 
 
-class Card:
-    def __init__(self, character: Character):
-        self.character: Character = character
-
-    def __str__(self) -> str:
-        return self.character.name
+class Deck:
+    """The court deck, kept as a list of characters with the top of the deck at
+    the end, so that drawing does not shift the remaining cards.
 
-    def getCharacter(self) -> Character:
-        return self.character
+    Cards that are returned go to the bottom of the deck, and the deck is
+    always shuffled before anyone draws again, so they are set aside in
+    returned until the next shuffle rather than inserted at the front of
+    cards. shuffle puts the cards in top first order before shuffling, so
+    games shuffle exactly as they did when the deck was kept top first and old
+    game logs still replay."""
 
-
-class CardList:
-    """List of cards for deck, discard, and hands."""
-
-    def __init__(self):
-        self.cardList: list[Card] = []
+    def __init__(self, rng: random.Random = None):
+        """
+        :param rng: Random number generator used to shuffle the deck. Defaults
+            to the random module."""
+        self.rng = rng or random
+        self.cards: list[Character] = []
+        """Cards in the deck, with the top of the deck at the end."""
+        self.returned: list[Character] = [character for character in Character for _ in range(0, 3)]
+        """Cards that are under cards, in the order they were returned."""
+        self.shuffle()
 
     def __str__(self) -> str:
-        s = ""
-        for card in self.cardList:
-            s += str(card) + "\n"
-        return s
+        return "".join(f"{character.name}\n" for character in self.topFirst())
 
     def __len__(self) -> int:
-        return len(self.cardList)
-
-    def __add__(self, other):
-        self.cardList += other.getCards()
+        return len(self.cards) + len(self.returned)
 
-    def add(self, card: Card):
-        self.cardList.append(card)
-
-    def addCards(self, otherCardList):
-        self + otherCardList
-
-    def pop(self) -> Card:
-        """
-        :returns: Top card from the CardList
-        :raises CoupError: If there isn't a card in the CardList
+    def topFirst(self) -> list[Character]:
         """
-        try:
-            return self.cardList.pop(0)
-        except IndexError:
-            raise CoupError("There are no cards remaining in the CardList.")
-
-    def peek(self, n: int) -> Card:
-        """Returns, but does not discard, nth card from the list.
-
-        :param n: Index of card in list that should be revealed. Indexed
-            starting from 0.
-        :returns: nth card from list.
-        :raises CoupError: n is an invalid index."""
-        try:
-            return self.cardList[n]
-        except IndexError:
-            raise CoupError("Invalid card selected.")
-
-    def discard(self, n: int) -> Card:
-        """Discards the nth card from the list.
-
-        :param n: Index of card in list that should be discarded. Indexed
-            starting from 0.
-        :returns: discarded nth card from list.
-        :raises CoupError: n is an invalid index."""
-        try:
-            return self.cardList.pop(n)
-        except IndexError:
-            raise CoupError("Invalid card selected.")
+        :returns: Cards in the deck, with the top of the deck first."""
+        return self.cards[::-1] + self.returned
 
-    def getCards(self) -> list[Card]:
-        return self.cardList
+    def setTopFirst(self, characters: list[Character]):
+        """Replaces the cards in the deck, given with the top of the deck
+        first."""
+        self.cards = characters[::-1]
+        self.returned = []
 
+    def add(self, character: Character):
+        """Returns a card to the bottom of the deck."""
+        self.returned.append(character)
 
-class Deck(CardList):
-    def __init__(self):
-        super().__init__()
-        for char in Character:
-            for _ in range(0, 3):
-                self.cardList.append(Card(char))
-        self.shuffle()
-
-    def popTwo(self) -> list[Card]:
+    def pop(self) -> Character:
+        """
+        :returns: Top card from the deck.
+        :raises CoupError: If there isn't a card in the deck."""
+        if not self.cards:
+            if not self.returned:
+                raise CoupError("There are no cards remaining in the deck.")
+            self.cards, self.returned = self.returned[::-1], []
+        return self.cards.pop()
+
+    def popTwo(self) -> tuple[Character, Character]:
         """
         :returns: Top two cards from the deck.
         :raises CoupError: If there are not two cards in the deck (there should
             always be 3 cards in the deck).
         """
-        if len(self.cardList) < 2:
+        if len(self) < 2:
             raise CoupError("Deck has invalid number of cards.")
-        retVal, self.cardList = self.cardList[:2], self.cardList[2:]
-        return retVal
+        return self.pop(), self.pop()
 
     def shuffle(self):
-        random.shuffle(self.cardList)
+        cards = self.cards
+        cards.reverse()
+        cards += self.returned
+        self.returned.clear()
+        self.rng.shuffle(cards)
+        cards.reverse()
 
 
 class Player:
-    def __init__(self, name: int, displayName: str, startingHand: list[Card]):
+    def __init__(self, name: int, displayName: str, startingHand: tuple[Character, ...]):
         self.name: int = name
         self.displayName: str = displayName
-        self.hand: CardList = CardList()
+        self.hand: tuple[Character, ...] = tuple(startingHand)
+        """Characters in hand, which is replaced rather than changed."""
         self.coins: int = STARTING_COINS
 
-        for card in startingHand:
-            self.add(card)
-
     def __str__(self) -> str:
         s = "Player name: " + str(self.name) + "\nCards in hand:\n"
-        for card in self.hand.getCards():
-            s += str(card) + "\n"
+        for character in self.hand:
+            s += character.name + "\n"
         s += f"Coins: {self.coins}\n"
         return s
 
-    def add(self, card: Card):
-        self.hand.add(card)
+    def add(self, character: Character):
+        self.hand += (character,)
 
     def addCoins(self, n: int):
         self.coins += n
@@ -168,23 +144,29 @@ class Player:
         self.coins = max(self.coins - n, 0)
         return oldBalance - self.coins
 
-    def peek(self, n: int) -> Card:
+    def peek(self, n: int) -> Character:
         """Returns, but does not discrad, nth card from hand.
 
         :param n: Index of card in hand that should be revealed. Indexed
             starting from 0
         :returns: nth card from hand.
         :raises CoupError: n is an invalid index."""
-        return self.hand.peek(n)
+        try:
+            return self.hand[n]
+        except IndexError:
+            raise CoupError("Invalid card selected.")
 
-    def discard(self, n: int) -> Card:
+    def discard(self, n: int) -> Character:
         """Discards the nth card from hand.
 
         :param n: Index of card in hand that should be discarded. Indexed
             starting from 0
         :returns: discarded nth card from hand.
         :raises CoupError: n is an invalid index."""
-        return self.hand.discard(n)
+        character = self.peek(n)
+        n %= len(self.hand)
+        self.hand = self.hand[:n] + self.hand[n + 1:]
+        return character
 
     def handSize(self) -> int:
         return len(self.hand)
@@ -192,15 +174,94 @@ class Player:
     def numCoins(self) -> int:
         return self.coins
 
-    def leave(self, discard: CardList):
-        discard.addCards(self.hand)
+    def leave(self, discard: list[Character]):
+        discard += self.hand
+        self.hand = ()
 
     def setHand(self, characters: list[Character]):
         """Sets the player's hand to have the given characters. Used for
         testing."""
-        self.hand = CardList()
-        for character in characters:
-            self.hand.add(Card(character))
+        self.hand = tuple(characters)
+
+
+class PlayerRegistry:
+    """Players who are still in the game, indexed by name and linked in a
+    circle in turn order, so that finding a player, passing the turn and
+    removing a player are all O(1)."""
+
+    def __init__(self):
+        self.byName: dict[int, Player] = {}
+        self.nextName: dict[int, int] = {}
+        """Name of the player after each player in the turn order."""
+        self.prevName: dict[int, int] = {}
+        """Name of the player before each player in the turn order."""
+        self.currentName: int = None
+        """Name of the player whose turn it is, or None if there are no
+        players."""
+
+    def __len__(self) -> int:
+        return len(self.byName)
+
+    def __contains__(self, name: int) -> bool:
+        return name in self.byName
+
+    def __iter__(self):
+        """Iterates over the players in turn order, starting with the player
+        whose turn it is."""
+        name = self.currentName
+        for _ in range(len(self.byName)):
+            yield self.byName[name]
+            name = self.nextName[name]
+
+    def current(self) -> Player:
+        """
+        :returns: Player whose turn it is."""
+        return self.byName[self.currentName]
+
+    def get(self, name: int) -> Player:
+        """
+        :raises CoupError: If there are no players with the provided name."""
+        try:
+            return self.byName[name]
+        except KeyError:
+            raise CoupError("No player found with name: " + str(name))
+
+    def add(self, player: Player):
+        """Adds player to the end of the turn order, just before the player
+        whose turn it is."""
+        name = player.name
+        self.byName[name] = player
+        if self.currentName is None:
+            self.nextName[name] = self.prevName[name] = self.currentName = name
+            return
+        last = self.prevName[self.currentName]
+        self.nextName[last] = name
+        self.prevName[name] = last
+        self.nextName[name] = self.currentName
+        self.prevName[self.currentName] = name
+
+    def remove(self, name: int) -> Player:
+        """Takes a player out of the turn order. If it was their turn, it
+        becomes the next player's turn.
+
+        :returns: The removed player.
+        :raises CoupError: If there are no players with the provided name."""
+        player = self.get(name)
+        del self.byName[name]
+        nextName = self.nextName.pop(name)
+        prevName = self.prevName.pop(name)
+        if not self.byName:
+            self.currentName = None
+            return player
+        self.nextName[prevName] = nextName
+        self.prevName[nextName] = prevName
+        if self.currentName == name:
+            self.currentName = nextName
+        return player
+
+    def advance(self):
+        """Passes the turn to the next player."""
+        self.currentName = self.nextName[self.currentName]
 
 
 class TextBasedIO(IO):
@@ -254,7 +315,7 @@ class TextBasedIO(IO):
         claimPlayer: int = int(input(s))
         if claimPlayer == -1:
             return -1, None
-        return claimPlayer, int(input("Which character would you like to claim (enter index)?"))
+        return claimPlayer, characterList[int(input("Which character would you like to claim (enter index)?"))]
 
     async def playerAssassinated(self, assassin: Player, assassinee: Player):
         print(f"{assassinee.displayName} has been assassinated by {assassin.displayName}.")
@@ -266,49 +327,247 @@ class TextBasedIO(IO):
         await self.displayMessage(f"{str(player.name)} has just won the game!")
 
 
+class RecordingIO(IO):
+    """Passes all I/O through to another IO, and records the input that it
+    gets from players so that the game can be replayed."""
+    def __init__(self, ioManager: IO, recordMove: Callable):
+        """
+        :param recordMove: Called with the entry for each input, which is
+            ("m", playerName, PlayerMove value) for a move, ("ch", challenger
+            name) for a challenge, ("t", playerName, target name) for a target,
+            ("k", playerName, card index) for a revealed or discarded card,
+            ("co", playerName, claim) for a claim of Contessa and ("r",
+            claiming player name, Character value) for a claimed role."""
+        self.ioManager = ioManager
+        self.recordMove = recordMove
+
+    async def displayMessage(self, message: str):
+        await self.ioManager.displayMessage(message)
+
+    async def displayError(self, message: str):
+        await self.ioManager.displayError(message)
+
+    async def displayStatus(self, message: str):
+        await self.ioManager.displayStatus(message)
+
+    async def getInput(self, player: Player = None) -> str:
+        return await self.ioManager.getInput(player)
+
+    async def getPlayerInput(self, player: Player) -> PlayerMove:
+        pm = await self.ioManager.getPlayerInput(player)
+        self.recordMove("m", player.name, pm.value)
+        return pm
+
+    async def getChallenges(self, curPlayer: Player, claimCharacter: Character, validPlayerNames: list[int]) -> int:
+        challengerName = await self.ioManager.getChallenges(curPlayer, claimCharacter, validPlayerNames)
+        self.recordMove("ch", challengerName)
+        return challengerName
+
+    async def getPlayerTargetChoice(self, player: Player, playerList: list[Player]) -> int:
+        targetName = await self.ioManager.getPlayerTargetChoice(player, playerList)
+        self.recordMove("t", player.name, targetName)
+        return targetName
+
+    async def getPlayerCardChoice(self, player: Player, isReveal: bool = True) -> int:
+        cardIdx = await self.ioManager.getPlayerCardChoice(player, isReveal)
+        self.recordMove("k", player.name, cardIdx)
+        return cardIdx
+
+    async def askPlayerContessa(self, player: Player) -> bool:
+        claimContessa = await self.ioManager.askPlayerContessa(player)
+        self.recordMove("co", player.name, claimContessa)
+        return claimContessa
+
+    async def askPlayersRoles(self, characterList: list[Character], validPlayerNames: list[int]) -> (int, Character):
+        claimPlayerName, claimPlayerRole = await self.ioManager.askPlayersRoles(characterList, validPlayerNames)
+        self.recordMove("r", claimPlayerName, None if claimPlayerRole is None else claimPlayerRole.value)
+        return claimPlayerName, claimPlayerRole
+
+    async def playerAssassinated(self, assassin: Player, assassinee: Player):
+        await self.ioManager.playerAssassinated(assassin, assassinee)
+
+    async def playerEliminated(self, player: Player):
+        await self.ioManager.playerEliminated(player)
+
+    async def playerWon(self, player: Player):
+        await self.ioManager.playerWon(player)
+
+
 class CoupGame:
     """Provides all logic and manages all classes to run a game of Coup."""
 
-    def __init__(self, playerNames: list[int], playerDisplayNames: list[str], ioManager: IO):
+    def __init__(self, playerNames: list[int], playerDisplayNames: list[str], ioManager: IO,
+                 seed: int = None, logFile: str = None):
+        """
+        :param seed: Seed for shuffling the deck. A game with the same players,
+            seed and input always plays out the same. A random seed is chosen if
+            it is not given.
+        :param logFile: Path of a file that the seed, players and moveLog are
+            appended to as the game is played, one JSON value per line. See
+            replay.py."""
         if not playerNames:
             raise CoupError("No players playing the game.")
 
-        self.ioManager = ioManager
-
-        self.deck: Deck = Deck()
-        self.discard: CardList = CardList()
-
-        self.playerNames: list[int] = []
-        """Direct access to playerNames requires managing playerLock."""
-        self.playerDisplayNames: list[str] = []
-        """Direct access to playerDisplayNames requires managing playerLock."""
-        self.players: list[Player] = []
-        """Direct access to players requires managing playerLock."""
-        self.playerLock: Lock = Lock()
+        if seed is None:
+            seed = random.getrandbits(64)
+        self.seed: int = seed
+        self.rng: random.Random = random.Random(seed)
+        self.logFile: str = logFile
+        self.logHandle = None
+        """logFile, kept open while the game is played so that each entry
+        is only buffered rather than written with its own open and close."""
+        self.moveLog: list[tuple] = []
+        """Append-only log of all input from players, in the order it was
+        given. See RecordingIO for the format of entries."""
+        self.logHeader: dict = {
+            "seed": seed, "players": list(playerNames), "displayNames": list(playerDisplayNames)
+        }
+        """Seed and players that the game was created with."""
+        self.writeLog(self.logHeader)
+        self.ioManager = RecordingIO(ioManager, self.recordMove)
+
+        self.deck: Deck = Deck(self.rng)
+        self.discard: list[Character] = []
+        """Cards that players have lost, which are face up."""
+
+        self.playerRegistry: PlayerRegistry = PlayerRegistry()
+        """Direct access to playerRegistry requires managing playerLock."""
+        self.playerLock: TracedLock = TracedLock("playerLock")
         """To prevent race conditions, this lock should be used whenever 
-        playerNames or players is changed/used. Use the corresponding custom
-        acquire/release methods."""
+        playerRegistry, players or playerNames is changed/used. Use the
+        corresponding custom acquire/release methods."""
 
         for i in range(0, len(playerNames)):
             self.addPlayer(playerNames[i], playerDisplayNames[i])
 
+        self.eventLog: EventLog = EventLog()
+        """Append-only log of everything that all players have seen happen,
+        along with the public state that it projects to. See events.py."""
+        self.eventLog.append(GameStarted(list(playerNames)))
+
         self.rootLogger = logging.getLogger()
 
         self.rootLogger.info("Initialization of UnoGame finished successfully.")
 
+    @property
+    def players(self) -> list[Player]:
+        """Players who are still in the game, in turn order starting with the
+        player whose turn it is. Built from playerRegistry on each access, so
+        playerRegistry should be used where speed matters."""
+        return list(self.playerRegistry)
+
+    @property
+    def playerNames(self) -> list[int]:
+        """Names of the players in players."""
+        return [player.name for player in self.playerRegistry]
+
+    def displayName(self, playerName: int) -> str:
+        """
+        :returns: Display name of a player who started the game, including
+            players who have since left it."""
+        return self.logHeader["displayNames"][self.logHeader["players"].index(playerName)]
+
     def __str__(self) -> str:
-        s = f"Game state:\n\nDeck:\n{str(self.deck)}\n\nDiscard\n{str(self.discard)}\n\nPlayers:\n"
+        discard = "".join(f"{character.name}\n" for character in self.discard)
+        s = f"Game state:\n\nDeck:\n{str(self.deck)}\n\nDiscard\n{discard}\n\nPlayers:\n"
         for player in self.players:
             s += str(player) + "\n"
         return s
 
-    async def acquirePlayerLock(self, logMessage: str):
-        await self.playerLock.acquire()
-        self.rootLogger.info(f"playerLock acquired: {logMessage}")
+    def writeLog(self, value):
+        """Appends a JSON value as a line to logFile, if there is one. The line
+        may stay buffered until flushLog is called."""
+        if self.logFile:
+            if self.logHandle is None:
+                self.logHandle = open(self.logFile, "a")
+            self.logHandle.write(json.dumps(value) + "\n")
+
+    def flushLog(self):
+        """Writes any buffered lines to logFile."""
+        if self.logHandle is not None:
+            self.logHandle.flush()
+
+    def closeLog(self):
+        """Flushes and closes logFile. It is reopened if anything else is
+        logged."""
+        if self.logHandle is not None:
+            self.logHandle.close()
+            self.logHandle = None
+
+    def recordMove(self, *entry):
+        """Adds an entry to moveLog and logFile."""
+        self.moveLog.append(entry)
+        self.writeLog(entry)
+
+    def rewriteLog(self):
+        """Replaces the contents of logFile, if there is one, with logHeader
+        and moveLog."""
+        if self.logFile:
+            self.closeLog()
+            self.logHandle = open(self.logFile, "w")
+            for value in [self.logHeader] + self.moveLog:
+                self.logHandle.write(json.dumps(value) + "\n")
+            self.flushLog()
+
+    def toState(self, savedLengths: dict[str, int] = None) -> dict:
+        """Should only be called between turns.
+
+        :param savedLengths: Number of entries at the start of each
+            append-only log (moveLog and events) that are already saved elsewhere
+            and are left out of the snapshot. See GameStore.
+        :returns: JSON serializable snapshot of the whole game, with cards
+            stored as their Character values. See fromState."""
+        savedLengths = savedLengths or {}
+        return {
+            "header": self.logHeader,
+            "logFile": self.logFile,
+            "moveLog": self.moveLog[savedLengths.get("moveLog", 0):],
+            "rng": packRngState(self.rng),
+            "deck": [character.value for character in self.deck.topFirst()],
+            "discard": [character.value for character in self.discard],
+            "players": [
+                [player.name, player.displayName, [character.value for character in player.hand], player.coins]
+                for player in self.playerRegistry
+            ],
+            "events": [toEntry(event) for event in self.eventLog.since(savedLengths.get("events", 0))],
+            "logLengths": {"moveLog": len(self.moveLog), "events": len(self.eventLog)}
+        }
+
+    @classmethod
+    def fromState(cls, state: dict, ioManager: IO):
+        """Rebuilds a game from a snapshot taken by toState, at the start of the
+        turn after the snapshot was taken. logFile is rewritten to match the
+        snapshot, dropping any input that was logged after it.
+
+        :returns: The rebuilt CoupGame."""
+        header: dict = state["header"]
+        game = cls(list(header["players"]), list(header["displayNames"]), ioManager, header["seed"])
+        game.logFile = state["logFile"]
+        game.moveLog = [tuple(entry) for entry in state["moveLog"]]
+        unpackRngState(game.rng, state["rng"])
+        game.deck.setTopFirst([Character(value) for value in state["deck"]])
+        game.discard = [Character(value) for value in state["discard"]]
+        game.playerRegistry = PlayerRegistry()
+        for playerName, playerDisplayName, hand, coins in state["players"]:
+            player = Player(playerName, playerDisplayName, tuple(Character(value) for value in hand))
+            player.coins = coins
+            game.playerRegistry.add(player)
+        # Games saved before events were logged keep only their GameStarted
+        if "events" in state:
+            game.eventLog = EventLog()
+            for entry in state["events"]:
+                game.eventLog.append(fromEntry(entry))
+        game.rewriteLog()
+        return game
+
+    async def acquirePlayerLock(self, logMessage: str, *args):
+        """
+        :param logMessage: %-style template for the message that is traced
+            with the lock event, formatted with args only if it is dumped."""
+        await self.playerLock.acquire(logMessage, *args)
 
-    def releasePlayerLock(self, logMessage: str):
-        self.playerLock.release()
-        self.rootLogger.info(f"playerLock released: {logMessage}")
+    def releasePlayerLock(self, logMessage: str, *args):
+        self.playerLock.release(logMessage, *args)
 
     def addPlayer(self, playerName: int, playerDisplayName: str):
         """Adds a player into the game, if the max number of players has not
@@ -318,27 +577,33 @@ class CoupGame:
 
         :raises CoupError: If max number of players has been exceeded or the
             given player is already in the game."""
-        if len(self.players) >= MAX_PLAYERS:
+        if len(self.playerRegistry) >= MAX_PLAYERS:
             raise CoupError(f"The max number of players ({MAX_PLAYERS}) has been reached.")
-        elif playerName in self.playerNames:
+        elif playerName in self.playerRegistry:
             raise CoupError("You are already in the game.")
-        self.playerNames.append(playerName)
-        self.playerDisplayNames.append(playerDisplayName)
-        self.players.append(Player(playerName, playerDisplayName, self.deck.popTwo()))
+        self.playerRegistry.add(Player(playerName, playerDisplayName, self.deck.popTwo()))
 
     async def executeTurn(self) -> bool:
         """Executes all logic for the next player's turn.
 
         :returns: Whether there is only one player remaining in the game at any
             point during this turn or not."""
-        curPlayer: Player = self.players[0]
+        curPlayer: Player = self.playerRegistry.current()
         playerLeft: bool = False
         """Set to true if curPlayer quits or is eliminated on this turn."""
 
         pm = await self.ioManager.getPlayerInput(curPlayer)
+        if pm in (PlayerMove.Coup, PlayerMove.Assassinate, PlayerMove.Steal):
+            targetPlayerName: int = await self.ioManager.getPlayerTargetChoice(curPlayer, self.players)
+            targetPlayer: Player = self.getPlayerByName(targetPlayerName)
+            self.eventLog.append(ActionDeclared(curPlayer.name, pm, targetPlayerName))
+        else:
+            self.eventLog.append(ActionDeclared(curPlayer.name, pm, None))
+
         if pm is PlayerMove.Income:
-            await self.acquirePlayerLock(f"Player {curPlayer.name} has confirmed move {pm.name}.")
+            await self.acquirePlayerLock("Player %s has confirmed move %s.", curPlayer.name, pm.name)
             curPlayer.addCoins(1)
+            self.eventLog.append(CoinsMoved(None, curPlayer.name, 1))
             self.releasePlayerLock("Player has finished taking income.")
         elif pm is PlayerMove.Foreign_Aid:
             claimPlayerName = await self.playerBlock([Character.Duke])
@@ -348,15 +613,16 @@ class CoupGame:
 
             # Iff claimPlayerName == -1, no one successfully claimed Duke
             if claimPlayerName == -1:
-                await self.acquirePlayerLock(f"Player {curPlayer.name} has confirmed move {pm.name}.")
+                await self.acquirePlayerLock("Player %s has confirmed move %s.", curPlayer.name, pm.name)
                 curPlayer.addCoins(2)
+                self.eventLog.append(CoinsMoved(None, curPlayer.name, 2))
                 self.releasePlayerLock("Player has chosen to take foreign aid.")
         elif pm is PlayerMove.Coup:
-            targetPlayerName: int = await self.ioManager.getPlayerTargetChoice(curPlayer, self.players)
-            targetPlayer: Player = self.getPlayerByName(targetPlayerName)
-            await self.acquirePlayerLock(f"Player {curPlayer.name} paying 7 coins to coup {targetPlayerName}.")
-            curPlayer.subCoins(7)
-            self.releasePlayerLock(f"Player {curPlayer.name} finished paying 7 coins to coup {targetPlayerName}.")
+            await self.acquirePlayerLock("Player %s paying 7 coins to coup %s.", curPlayer.name, targetPlayerName)
+            coinsPaid: int = curPlayer.subCoins(7)
+            if coinsPaid:
+                self.eventLog.append(CoinsMoved(curPlayer.name, None, coinsPaid))
+            self.releasePlayerLock("Player %s finished paying 7 coins to coup %s.", curPlayer.name, targetPlayerName)
             discardedCardIdx = await self.ioManager.getPlayerCardChoice(targetPlayer, False)
             retVal = await self.playerDiscardCard(targetPlayerName, discardedCardIdx)
             if retVal == 2:
@@ -369,12 +635,11 @@ class CoupGame:
                 if not curPlayer.handSize():
                     playerLeft = True
             else:
-                await self.acquirePlayerLock(f"Player {curPlayer.name} getting 3 coins from Tax.")
+                await self.acquirePlayerLock("Player %s getting 3 coins from Tax.", curPlayer.name)
                 curPlayer.addCoins(3)
-                self.releasePlayerLock(f"Player {curPlayer.name} finished getting 3 coins from Tax.")
+                self.eventLog.append(CoinsMoved(None, curPlayer.name, 3))
+                self.releasePlayerLock("Player %s finished getting 3 coins from Tax.", curPlayer.name)
         elif pm is PlayerMove.Assassinate:
-            targetPlayerName: int = await self.ioManager.getPlayerTargetChoice(curPlayer, self.players)
-            targetPlayer: Player = self.getPlayerByName(targetPlayerName)
             retVal = await self.resolveChallenges(curPlayer, Character.Assassin)
             if retVal == -2:
                 return True
@@ -390,6 +655,7 @@ class CoupGame:
                 continueAssassinate: bool = True
                 """If curPlayer successfully assassinates targetPlayer."""
                 if await self.ioManager.askPlayerContessa(targetPlayer):
+                    self.eventLog.append(Blocked(targetPlayerName, Character.Contessa))
                     retVal2 = await self.resolveChallenges(targetPlayer, Character.Contessa)
                     if retVal2 == -2:
                         return True
@@ -413,9 +679,11 @@ class CoupGame:
                             playerLeft = True
 
                 if loseCoins:
-                    await self.acquirePlayerLock(f"Removing coins from Player {curPlayer.name} for assassination.")
-                    curPlayer.subCoins(3)
-                    self.releasePlayerLock(f"Finished removing coins from Player {curPlayer.name} for assassination.")
+                    await self.acquirePlayerLock("Removing coins from Player %s for assassination.", curPlayer.name)
+                    coinsPaid: int = curPlayer.subCoins(3)
+                    if coinsPaid:
+                        self.eventLog.append(CoinsMoved(curPlayer.name, None, coinsPaid))
+                    self.releasePlayerLock("Finished removing coins from Player %s for assassination.", curPlayer.name)
 
                 if continueAssassinate:
                     discardedCardIdx = await self.ioManager.getPlayerCardChoice(targetPlayer, False)
@@ -424,8 +692,6 @@ class CoupGame:
                     if retVal3 == 2:
                         return True
         elif pm is PlayerMove.Steal:
-            targetPlayerName: int = await self.ioManager.getPlayerTargetChoice(curPlayer, self.players)
-            targetPlayer: Player = self.getPlayerByName(targetPlayerName)
             retVal = await self.resolveChallenges(curPlayer, Character.Captain)
             if retVal == -2:
                 return True
@@ -443,10 +709,12 @@ class CoupGame:
                 if not curPlayer.handSize():
                     playerLeft = True
                 if claimPlayerName == -1:
-                    await self.acquirePlayerLock(f"Player {curPlayer.name} stealing max 2 coins from {targetPlayerName}.")
+                    await self.acquirePlayerLock("Player %s stealing max 2 coins from %s.", curPlayer.name, targetPlayerName)
                     stolenCoins: int = targetPlayer.subCoins(2)
                     curPlayer.addCoins(stolenCoins)
-                    self.releasePlayerLock(f"Player {curPlayer.name} finished stealing from {targetPlayerName}.")
+                    if stolenCoins:
+                        self.eventLog.append(CoinsMoved(targetPlayerName, curPlayer.name, stolenCoins))
+                    self.releasePlayerLock("Player %s finished stealing from %s.", curPlayer.name, targetPlayerName)
         elif pm is PlayerMove.Exchange:
             retVal = await self.resolveChallenges(curPlayer, Character.Ambassador)
             if retVal == -2:
@@ -455,28 +723,31 @@ class CoupGame:
                 if not curPlayer.handSize():
                     playerLeft = True
             else:
-                await self.acquirePlayerLock(f"Player {curPlayer.name} drawing 2 cards for Exchange.")
+                await self.acquirePlayerLock("Player %s drawing 2 cards for Exchange.", curPlayer.name)
                 curPlayer.add(self.deck.pop())
                 curPlayer.add(self.deck.pop())
-                self.releasePlayerLock(f"Player {curPlayer.name} finished drawing 2 cards for Exchange.")
+                self.releasePlayerLock("Player %s finished drawing 2 cards for Exchange.", curPlayer.name)
                 discardedCardIdx = await self.ioManager.getPlayerCardChoice(curPlayer, False)
-                await self.acquirePlayerLock(f"Player {curPlayer.name} discarding first card for Exchange.")
+                await self.acquirePlayerLock("Player %s discarding first card for Exchange.", curPlayer.name)
                 self.deck.add(curPlayer.discard(discardedCardIdx))
-                self.releasePlayerLock(f"Player {curPlayer.name} finished discarding first card for Exchange.")
+                self.releasePlayerLock("Player %s finished discarding first card for Exchange.", curPlayer.name)
                 discardedCardIdx = await self.ioManager.getPlayerCardChoice(curPlayer, False)
-                await self.acquirePlayerLock(f"Player {curPlayer.name} discarding second card for Exchange.")
+                await self.acquirePlayerLock("Player %s discarding second card for Exchange.", curPlayer.name)
                 self.deck.add(curPlayer.discard(discardedCardIdx))
-                self.releasePlayerLock(f"Player {curPlayer.name} finished discarding second card for Exchange.")
+                self.releasePlayerLock("Player %s finished discarding second card for Exchange.", curPlayer.name)
                 self.deck.shuffle()
         else:
-            await self.acquirePlayerLock(f"Player {curPlayer.name} has confirmed move {pm.name}.")
+            await self.acquirePlayerLock("Player %s has confirmed move %s.", curPlayer.name, pm.name)
+            for character in curPlayer.hand:
+                self.eventLog.append(CardLost(curPlayer.name, character))
+            self.eventLog.append(Eliminated(curPlayer.name))
             curPlayer.leave(self.discard)
-            del self.players[0]
+            self.playerRegistry.remove(curPlayer.name)
             playerLeft = True
 
             self.releasePlayerLock("Player has successfully quit the game.")
 
-        if len(self.players) == 1:
+        if len(self.playerRegistry) == 1:
             return True
         await self.updateNextPlayer(playerLeft)
         return False
@@ -494,16 +765,18 @@ class CoupGame:
         challengerName: int = await self.ioManager.getChallenges(curPlayer, claimCharacter, self.playerNames)
         if challengerName == -1:
             return challengerName
+        self.eventLog.append(Challenged(challengerName, curPlayer.name, claimCharacter))
         revealedCardIdx: int = await self.ioManager.getPlayerCardChoice(curPlayer)
-        revealedCard: Card = curPlayer.peek(revealedCardIdx)
-        if revealedCard.getCharacter() is claimCharacter:
+        revealedCharacter: Character = curPlayer.peek(revealedCardIdx)
+        self.eventLog.append(CardRevealed(curPlayer.name, revealedCharacter, revealedCharacter is claimCharacter))
+        if revealedCharacter is claimCharacter:
             # Challenged player shuffles claimed card back in the deck then gets
             # a random new one
-            await self.acquirePlayerLock(f"{curPlayer.name} drawing new card.")
+            await self.acquirePlayerLock("%s drawing new card.", curPlayer.name)
             self.deck.add(curPlayer.discard(revealedCardIdx))
             self.deck.shuffle()
             curPlayer.add(self.deck.pop())
-            self.releasePlayerLock(f"{curPlayer.name} finished drawing new card.")
+            self.releasePlayerLock("%s finished drawing new card.", curPlayer.name)
 
             challenger: Player = self.getPlayerByName(challengerName)
             discardedCardIdx: int = await self.ioManager.getPlayerCardChoice(challenger, False)
@@ -530,6 +803,7 @@ class CoupGame:
             claimPlayerName, claimPlayerRole = await self.ioManager.askPlayersRoles(characterList, self.playerNames)
             if claimPlayerName != -1:
                 claimPlayer = self.getPlayerByName(claimPlayerName)
+                self.eventLog.append(Blocked(claimPlayerName, claimPlayerRole))
                 retVal = await self.resolveChallenges(claimPlayer, claimPlayerRole)
                 if retVal == -2:
                     return -2
@@ -546,8 +820,7 @@ class CoupGame:
         Locks: checks playerLock."""
         if not playerLeft:
             await self.acquirePlayerLock("Updating nextPlayer.")
-            self.players.append(self.players.pop(0))
-            self.playerNames.append(self.playerNames.pop(0))
+            self.playerRegistry.advance()
             self.releasePlayerLock("Finished updating nextPlayer.")
 
     def getPlayerByName(self, name: int) -> Player:
@@ -555,10 +828,7 @@ class CoupGame:
 
         :returns: Player from current list of players with given name.
         :raises CoupError: If there are no players with the provided name."""
-        for player in self.players:
-            if player.name == name:
-                return player
-        raise CoupError("No player found with name: " + str(name))
+        return self.playerRegistry.get(name)
 
     async def playerDiscardCard(self, playerName: int, n: int) -> int:
         """Discards the nth card for the Player with name = playerName. Then
@@ -571,25 +841,19 @@ class CoupGame:
             eliminated and there are still >1 players remaining in the game, and
             2 otherwise.
         :raises CoupError: If there are no players with the provided name."""
-        await self.acquirePlayerLock(f"Discarding card for {playerName}.")
-        playerIdx: int = 0
-        player: Player = None
-        for p in self.players:
-            if p.name == playerName:
-                player = p
-                break
-            playerIdx += 1
+        await self.acquirePlayerLock("Discarding card for %s.", playerName)
+        player: Player = self.playerRegistry.byName.get(playerName)
         if not player:
             self.releasePlayerLock("Finished discarding cards.")
             raise CoupError(f"No player found with name {str(playerName)} when discarding cards.")
-        self.discard.add(player.discard(n))
+        self.discard.append(player.discard(n))
+        self.eventLog.append(CardLost(playerName, self.discard[-1]))
         if not player.handSize():
-            del self.players[playerIdx]
-            del self.playerNames[playerIdx]
-            del self.playerDisplayNames[playerIdx]
+            self.playerRegistry.remove(playerName)
+            self.eventLog.append(Eliminated(playerName))
             self.releasePlayerLock("Finished discarding cards.")
             await self.ioManager.playerEliminated(player)
-            if len(self.players) > 1:
+            if len(self.playerRegistry) > 1:
                 return 1
             else:
                 return 2
@@ -597,12 +861,21 @@ class CoupGame:
             self.releasePlayerLock("Finished discarding cards.")
             return 0
 
-    async def startGame(self):
-        """Locks: does not check playerLock"""
-        self.rootLogger.info(f"Starting game with {len(self.playerNames)} players.")
-        while not await self.executeTurn():
-            pass
-        await self.ioManager.playerWon(self.players[0])
+    async def startGame(self, onTurnEnd: Callable[[], Awaitable[None]] = None):
+        """Locks: does not check playerLock
+
+        :param onTurnEnd: Called and awaited after every turn except the last
+            one, when the game can be saved with toState. logFile is flushed before
+            each call and closed once the game ends."""
+        self.rootLogger.info(f"Starting game with {len(self.playerRegistry)} players.")
+        try:
+            while not await self.executeTurn():
+                self.flushLog()
+                if onTurnEnd:
+                    await onTurnEnd()
+            await self.ioManager.playerWon(self.playerRegistry.current())
+        finally:
+            self.closeLog()
 
     def setHand(self, playerIdx, characters: list[Character]):
         """Sets the corresponding player's hand to have the following list of
@@ -614,13 +887,9 @@ async def startGame():
     players = [1, 2, 3]
     playerNames = ["a", "b", "c"]
     game = CoupGame(players, playerNames, TextBasedIO())
-    game.setHand(0, [Character.Assassin, Character.Duke])
-    game.setHand(1, [Character.Assassin, Character.Duke])
-    game.setHand(2, [Character.Assassin, Character.Duke])
     print(game)
     await game.startGame()
 
 
 if __name__ == "__main__":
-    loop = get_event_loop()
-    loop.run_until_complete(startGame())
+    run(startGame())
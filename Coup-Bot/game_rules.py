@@ -0,0 +1,26 @@
+from enum import Enum
+
+
+class Character(Enum):
+    Duke = 0
+    Assassin = 1
+    Captain = 2
+    Ambassador = 3
+    Contessa = 4
+
+
+class PlayerMove(Enum):
+    Income = 0
+    Foreign_Aid = 1
+    Coup = 2
+    Tax = 3
+    Assassinate = 4
+    Steal = 5
+    Exchange = 6
+    Quit = 7
+
+
+MAX_PLAYERS = 6
+MIN_PLAYERS = 2
+STARTING_COINS = 2
+STARTING_HAND_SIZE = 2
@@ -0,0 +1,96 @@
+from asyncio import get_running_loop
+from concurrent.futures import ThreadPoolExecutor
+import json
+import sqlite3
+import time
+
+
+class GameStore:
+    """Saves snapshots of games in progress to a SQLite database, so that they
+    can be resumed after the bot restarts. Each game has one row, keyed by the
+    id of the thread it is played in, which is replaced whenever the game is
+    saved. The row only holds the state that changes from turn to turn.
+    Append-only logs, such as moveLog, are listed in the snapshot's
+    logLengths and stored one entry per row. Each save appends only the
+    entries added since the last save, so a save costs the same on the last
+    turn of a game as on the first.
+
+    All database access, including encoding snapshots, runs in a single
+    writer thread, so that saves never block the event loop and are applied
+    in the order they were requested."""
+
+    def __init__(self, path: str):
+        self.writer: ThreadPoolExecutor = ThreadPoolExecutor(1, thread_name_prefix = "gameStore")
+        self.savedLengths: dict[int, dict[str, int]] = {}
+        """Number of entries of each log of each game that are in the
+        database, keyed by game id. Only used on the event loop."""
+        # The connection is only ever used by one thread at a time
+        self.connection: sqlite3.Connection = sqlite3.connect(path, check_same_thread = False)
+        # With a write-ahead log, a crash can lose the last few saves but never
+        # leaves the database corrupted, and saves do not wait on fsync.
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS games (gameId INTEGER PRIMARY KEY, state TEXT NOT NULL, savedAt REAL NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS logEntries (gameId INTEGER NOT NULL, log TEXT NOT NULL, "
+            "idx INTEGER NOT NULL, entry TEXT NOT NULL, PRIMARY KEY (gameId, log, idx)) WITHOUT ROWID"
+        )
+        self.connection.commit()
+
+    async def save(self, gameId: int, game):
+        """Saves game, which has toState(savedLengths). Has to be awaited
+        before the game is saved again."""
+        state: dict = game.toState(self.savedLengths.get(gameId))
+        await get_running_loop().run_in_executor(self.writer, self.saveSync, gameId, state, time.time())
+        self.savedLengths[gameId] = state["logLengths"]
+
+    async def delete(self, gameId: int):
+        self.savedLengths.pop(gameId, None)
+        await get_running_loop().run_in_executor(self.writer, self.deleteSync, gameId)
+
+    async def loadAll(self) -> list[tuple[int, dict]]:
+        """
+        :returns: Id and latest snapshot of every saved game, with its logs in
+            full, oldest save first."""
+        games = await get_running_loop().run_in_executor(self.writer, self.loadAllSync)
+        for gameId, state in games:
+            self.savedLengths[gameId] = state.get("logLengths", {})
+        return games
+
+    def saveSync(self, gameId: int, state: dict, savedAt: float):
+        """
+        :param state: Snapshot from toState, whose logs hold only the entries
+            that are not saved yet. Those logs are removed from it."""
+        for log, length in state["logLengths"].items():
+            entries: list = state.pop(log)
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO logEntries (gameId, log, idx, entry) VALUES (?, ?, ?, ?)",
+                [(gameId, log, idx, json.dumps(entry, separators = (",", ":")))
+                 for idx, entry in enumerate(entries, length - len(entries))]
+            )
+        self.connection.execute(
+            "INSERT OR REPLACE INTO games (gameId, state, savedAt) VALUES (?, ?, ?)",
+            (gameId, json.dumps(state, separators = (",", ":")), savedAt)
+        )
+        self.connection.commit()
+
+    def deleteSync(self, gameId: int):
+        self.connection.execute("DELETE FROM games WHERE gameId = ?", (gameId,))
+        self.connection.execute("DELETE FROM logEntries WHERE gameId = ?", (gameId,))
+        self.connection.commit()
+
+    def loadAllSync(self) -> list[tuple[int, dict]]:
+        games: list[tuple[int, dict]] = []
+        for gameId, encodedState in self.connection.execute(
+            "SELECT gameId, state FROM games ORDER BY savedAt"
+        ).fetchall():
+            state: dict = json.loads(encodedState)
+            for log, length in state.get("logLengths", {}).items():
+                state[log] = [json.loads(entry) for entry, in self.connection.execute(
+                    "SELECT entry FROM logEntries WHERE gameId = ? AND log = ? AND idx < ? ORDER BY idx",
+                    (gameId, log, length)
+                )]
+            games.append((gameId, state))
+        return games
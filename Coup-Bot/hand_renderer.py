@@ -0,0 +1,96 @@
+from asyncio import Semaphore, Task, create_task, get_running_loop, shield
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from itertools import combinations_with_replacement
+
+from PIL import Image
+
+from game import Character
+
+CARD_IMAGE_DIRECTORY: str = "card-images"
+RENDER_WORKERS: int = 2
+"""Number of threads that render images."""
+MAX_PENDING_RENDERS: int = 8
+"""Maximum number of renders that can be queued on or running in the worker
+threads at once. Further requests wait on the event loop."""
+
+
+class HandRenderer:
+    """Renders images of Coup hands in worker threads so that PIL never runs
+    on the event loop. Each combination of cards is only rendered once, and
+    requests for a combination that is already being rendered wait for that
+    render instead of starting another. A render runs as its own task, so
+    cancelling one request does not cancel it for the others."""
+
+    def __init__(self, imageDirectory: str = CARD_IMAGE_DIRECTORY, numWorkers: int = RENDER_WORKERS,
+                 maxPending: int = MAX_PENDING_RENDERS):
+        self.imageDirectory: str = imageDirectory
+        self.executor: ThreadPoolExecutor = ThreadPoolExecutor(numWorkers, thread_name_prefix = "render")
+        self.pending: Semaphore = Semaphore(maxPending)
+        self.cardImages: dict[str, Image.Image] = self.loadCardImages()
+        """Image of each character, keyed by name. Loaded once, before any
+        worker thread uses it."""
+        self.cache: dict[str, bytes] = {}
+        """PNG of each sorted combination of cards that has been rendered,
+        keyed by the combination, e.g. AssassinContessa."""
+        self.inFlight: dict[str, Task] = {}
+        """Renders that have been started but not finished, keyed by
+        combination."""
+
+    def loadCardImages(self) -> dict[str, Image.Image]:
+        """
+        :returns: Fully decoded image of each character, keyed by name."""
+        cardImages = {}
+        for character in Character:
+            with Image.open(f"{self.imageDirectory}/{character.name}.png") as image:
+                cardImages[character.name] = image.copy()
+        return cardImages
+
+    def renderHandSync(self, hand: list[str]) -> bytes:
+        """Draws the cards in hand side by side. Runs in a worker thread.
+
+        :returns: The image, encoded as a PNG."""
+        imageSize = self.cardImages[hand[0]].size
+        handSize = len(hand)
+        mergedImage = Image.new("RGB", (handSize * imageSize[0], imageSize[1]), (250, 250, 250))
+        for i in range(handSize):
+            mergedImage.paste(self.cardImages[hand[i]], (i * imageSize[0], 0))
+        imageBytes = BytesIO()
+        mergedImage.save(imageBytes, "PNG")
+        return imageBytes.getvalue()
+
+    async def renderHand(self, characters: list[str]) -> bytes:
+        """
+        :param characters: Names of the characters in hand, in any order.
+        :returns: PNG of the cards in hand side by side, in sorted order."""
+        hand = sorted(characters)
+        cardCombination = "".join(hand)
+        pngBytes = self.cache.get(cardCombination)
+        if pngBytes is not None:
+            return pngBytes
+        task = self.inFlight.get(cardCombination)
+        if task is None:
+            task = self.inFlight[cardCombination] = create_task(self.render(hand, cardCombination))
+        return await shield(task)
+
+    async def render(self, hand: list[str], cardCombination: str) -> bytes:
+        """Renders hand in a worker thread and caches the result.
+
+        :returns: The image, encoded as a PNG."""
+        try:
+            async with self.pending:
+                pngBytes = await get_running_loop().run_in_executor(self.executor, self.renderHandSync, hand)
+            self.cache[cardCombination] = pngBytes
+            return pngBytes
+        finally:
+            del self.inFlight[cardCombination]
+
+    async def prerender(self):
+        """Renders every hand that can occur outside of an exchange."""
+        names = sorted(character.name for character in Character)
+        for handSize in (1, 2):
+            for hand in combinations_with_replacement(names, handSize):
+                await self.renderHand(list(hand))
+
+    def shutdown(self):
+        self.executor.shutdown(wait = False)
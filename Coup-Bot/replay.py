@@ -0,0 +1,131 @@
+from asyncio import run
+import argparse
+import json
+import logging
+import time
+
+from io_abc import IO
+from game import CoupGame, CoupError, Player, Character, PlayerMove
+
+
+class ReplayError(CoupError):
+    """Raised when a game does not follow the log that it is replayed from."""
+
+
+def loadLog(path: str) -> (dict, list[tuple]):
+    """Reads a log written by CoupGame.
+
+    :returns: The log header, with the seed and players of the game, and the
+        moveLog of the game."""
+    with open(path, "r") as file:
+        header = json.loads(file.readline())
+        moves = [tuple(json.loads(line)) for line in file if line.strip()]
+    return header, moves
+
+
+class ReplayIO(IO):
+    """Defines silent I/O methods for Coup where every player's input is taken
+    from a moveLog."""
+    def __init__(self, moves: list[tuple]):
+        self.moves: list[tuple] = moves
+        self.nextMove: int = 0
+        """Index of the next entry of moves to replay."""
+
+    def movesRemaining(self) -> bool:
+        return self.nextMove < len(self.moves)
+
+    def takeMove(self, kind: str, playerName: int = None) -> tuple:
+        """
+        :param playerName: Name of the player who is expected to give the
+            input, if the input is asked of a specific player.
+        :returns: The next entry in the log, which should be of the given kind.
+        :raises ReplayError: If the next entry in the log is not the expected
+            one."""
+        if not self.movesRemaining():
+            raise ReplayError(f"The log ended while waiting for an entry of type {kind}.")
+        entry = self.moves[self.nextMove]
+        if entry[0] != kind or (playerName is not None and entry[1] != playerName):
+            expected = f"type {kind}" if playerName is None else f"type {kind} from player {playerName}"
+            raise ReplayError(f"Log entry {self.nextMove} is {entry}, but an entry of {expected} was expected.")
+        self.nextMove += 1
+        return entry
+
+    async def displayMessage(self, message: str):
+        pass
+
+    async def displayError(self, message: str):
+        pass
+
+    async def displayStatus(self, message: str):
+        pass
+
+    async def getInput(self, player: Player = None) -> str:
+        return ""
+
+    async def getPlayerInput(self, player: Player) -> PlayerMove:
+        return PlayerMove(self.takeMove("m", player.name)[2])
+
+    async def getChallenges(self, curPlayer: Player, claimCharacter: Character, validPlayerNames: list[int]) -> int:
+        return self.takeMove("ch")[1]
+
+    async def getPlayerTargetChoice(self, player: Player, playerList: list[Player]) -> int:
+        return self.takeMove("t", player.name)[2]
+
+    async def getPlayerCardChoice(self, player: Player, isReveal: bool = True) -> int:
+        return self.takeMove("k", player.name)[2]
+
+    async def askPlayerContessa(self, player: Player) -> bool:
+        return self.takeMove("co", player.name)[2]
+
+    async def askPlayersRoles(self, characterList: list[Character], validPlayerNames: list[int]) -> (int, Character):
+        _, claimPlayerName, claimPlayerRole = self.takeMove("r")
+        return claimPlayerName, None if claimPlayerRole is None else Character(claimPlayerRole)
+
+    async def playerAssassinated(self, assassin: Player, assassinee: Player):
+        pass
+
+    async def playerEliminated(self, player: Player):
+        pass
+
+    async def playerWon(self, player: Player):
+        pass
+
+
+async def replayGame(header: dict, moves: list[tuple], turns: int = None) -> (CoupGame, int):
+    """Rebuilds a game from its log without any I/O, by replaying its input on
+    a game with the same seed and players.
+
+    :param header: CoupGame.logHeader of the game.
+    :param moves: CoupGame.moveLog of the game.
+    :param turns: Number of turns to replay. Defaults to replaying the whole
+        log.
+    :returns: The game after the replayed turns and the number of turns that
+        were replayed.
+    :raises ReplayError: If the game does not follow the log."""
+    ioManager = ReplayIO(moves)
+    game = CoupGame(list(header["players"]), list(header["displayNames"]), ioManager, header["seed"])
+    turn: int = 0
+    while (turns is None or turn < turns) and ioManager.movesRemaining():
+        turn += 1
+        if await game.executeTurn():
+            break
+    return game, turn
+
+
+def parseArgs():
+    parser = argparse.ArgumentParser(description = "Rebuilds the state of a game of Coup from its log.")
+    parser.add_argument("log", help = "Path of a log written by CoupGame.")
+    parser.add_argument("--turn", type = int, help = "Number of turns to replay. Defaults to the whole game.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parseArgs()
+    header, moves = loadLog(args.log)
+    logging.getLogger().setLevel(logging.WARNING)
+    start = time.perf_counter()
+    game, turn = run(replayGame(header, moves, args.turn))
+    elapsed = time.perf_counter() - start
+    print(game)
+    print(f"State after turn {turn}, replayed in {elapsed * 1000:.1f} ms.")
+    print(f"Player {game.playerRegistry.currentName} is next.")
@@ -0,0 +1,453 @@
+from abc import ABC, abstractmethod
+from asyncio import run
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import logging
+import os
+import random
+import statistics
+import time
+
+from io_abc import IO
+from game import CoupGame, CoupError, Player, Character, PlayerMove, MAX_PLAYERS
+from game_rules import MIN_PLAYERS
+from state import CoupState
+
+MAX_TURNS: int = 1000
+"""Number of turns after which a simulated game is abandoned."""
+ACTION_CHARACTERS: dict[PlayerMove, Character] = {
+    PlayerMove.Tax: Character.Duke,
+    PlayerMove.Assassinate: Character.Assassin,
+    PlayerMove.Steal: Character.Captain,
+    PlayerMove.Exchange: Character.Ambassador
+}
+"""Character that is claimed by each move that needs one."""
+
+
+class Policy(ABC):
+    """Decides the input of a scripted player."""
+    def __init__(self, rng: random.Random = None):
+        """
+        :param rng: Random number generator for any choices the policy makes
+            at random."""
+        self.rng = rng or random.Random()
+
+    @abstractmethod
+    def chooseMove(self, player: Player) -> PlayerMove:
+        pass
+
+    @abstractmethod
+    def challenges(self, player: Player, claimer: Player, claimCharacter: Character) -> bool:
+        """
+        :returns: Whether player challenges claimer's claim of claimCharacter."""
+        pass
+
+    @abstractmethod
+    def chooseBlock(self, player: Player, characterList: list[Character]) -> Character:
+        """
+        :returns: Character in characterList that player claims to block the
+            move, or None if they do not block it."""
+        pass
+
+    @abstractmethod
+    def claimsContessa(self, player: Player) -> bool:
+        """
+        :returns: Whether player, who is being assassinated, claims Contessa."""
+        pass
+
+    def chooseTarget(self, player: Player, targets: list[Player]) -> int:
+        """
+        :returns: Name of the player in targets that player targets."""
+        return self.rng.choice(targets).name
+
+    def chooseCard(self, player: Player, isReveal: bool, claimCharacter: Character) -> int:
+        """Reveals the claimed character if player has it, and otherwise
+        chooses a card at random.
+
+        :param claimCharacter: Character that player has been challenged on,
+            if isReveal.
+        :returns: Index of the card in player's hand to reveal or discard."""
+        if isReveal and claimCharacter in player.hand:
+            return player.hand.index(claimCharacter)
+        return self.rng.randrange(len(player.hand))
+
+    def legalMoves(self, player: Player) -> list[PlayerMove]:
+        """
+        :returns: Every move that player can make with their coins, apart from
+            quitting."""
+        coins = player.numCoins()
+        if coins >= 10:
+            return [PlayerMove.Coup]
+        return [pm for pm in PlayerMove if pm is not PlayerMove.Quit and not
+                (pm is PlayerMove.Coup and coins < 7) and not (pm is PlayerMove.Assassinate and coins < 3)]
+
+
+class RandomPolicy(Policy):
+    """Makes random moves, and challenges, blocks and claims Contessa now and
+    then whatever their hand."""
+    def chooseMove(self, player: Player) -> PlayerMove:
+        return self.rng.choice(self.legalMoves(player))
+
+    def challenges(self, player: Player, claimer: Player, claimCharacter: Character) -> bool:
+        return self.rng.random() < 0.2
+
+    def chooseBlock(self, player: Player, characterList: list[Character]) -> Character:
+        return self.rng.choice(characterList) if self.rng.random() < 0.2 else None
+
+    def claimsContessa(self, player: Player) -> bool:
+        return self.rng.random() < 0.5
+
+
+class HonestPolicy(Policy):
+    """Only claims characters that it has, coups whenever it can, and rarely
+    challenges."""
+    def chooseMove(self, player: Player) -> PlayerMove:
+        moves = self.legalMoves(player)
+        if PlayerMove.Coup in moves:
+            return PlayerMove.Coup
+        return self.rng.choice([
+            pm for pm in moves if pm not in ACTION_CHARACTERS or ACTION_CHARACTERS[pm] in player.hand
+        ])
+
+    def challenges(self, player: Player, claimer: Player, claimCharacter: Character) -> bool:
+        return self.rng.random() < 0.05
+
+    def chooseBlock(self, player: Player, characterList: list[Character]) -> Character:
+        return next((character for character in characterList if character in player.hand), None)
+
+    def claimsContessa(self, player: Player) -> bool:
+        return Character.Contessa in player.hand
+
+
+class BluffPolicy(Policy):
+    """Claims any character, blocks and claims Contessa whenever it is asked,
+    and challenges often."""
+    def chooseMove(self, player: Player) -> PlayerMove:
+        moves = self.legalMoves(player)
+        return self.rng.choice([pm for pm in moves if pm in ACTION_CHARACTERS or pm is PlayerMove.Coup] or moves)
+
+    def challenges(self, player: Player, claimer: Player, claimCharacter: Character) -> bool:
+        return self.rng.random() < 0.3
+
+    def chooseBlock(self, player: Player, characterList: list[Character]) -> Character:
+        return self.rng.choice(characterList)
+
+    def claimsContessa(self, player: Player) -> bool:
+        return True
+
+
+POLICIES = {
+    "random": RandomPolicy,
+    "honest": HonestPolicy,
+    "bluff": BluffPolicy
+}
+"""Policies that can be chosen from the command line."""
+
+
+class ScriptedIO(IO):
+    """Defines synchronous, non-printing I/O methods for Coup where every
+    player's input comes from a policy. Used for headless simulation.
+
+    Challenges and blocks are put to each player who may make them in turn
+    order, and the first one whose policy takes it answers. Only the target
+    can block a Steal, and anyone but the player whose turn it is can block
+    Foreign Aid. game has to be set once the game has been created."""
+    def __init__(self, policies: dict[int, Policy]):
+        """
+        :param policies: Policy used for each player, keyed by player name."""
+        self.policies = policies
+        self.game: CoupGame = None
+        self.paths: Counter = Counter()
+        """Number of times that each claim was left unchallenged, proved or
+        caught as a bluff, keyed by a description of the path."""
+        self.actor: int = None
+        self.action: PlayerMove = None
+        self.target: int = None
+        self.blockedAction: str = None
+        """Move that a block which has just been claimed is blocking."""
+        self.claim: str = None
+        """Description of the claim that is being challenged."""
+        self.claimCharacter: Character = None
+
+    async def displayMessage(self, message: str):
+        pass
+
+    async def displayError(self, message: str):
+        pass
+
+    async def displayStatus(self, message: str):
+        pass
+
+    async def getInput(self, player: Player = None) -> str:
+        return ""
+
+    async def getPlayerInput(self, player: Player) -> PlayerMove:
+        self.actor = player.name
+        self.action = self.policies[player.name].chooseMove(player)
+        self.target = None
+        return self.action
+
+    async def getChallenges(self, curPlayer: Player, claimCharacter: Character, validPlayerNames: list[int]) -> int:
+        if self.blockedAction:
+            self.claim = f"Block {self.blockedAction} ({claimCharacter.name})"
+            self.blockedAction = None
+        else:
+            self.claim = f"{self.action.name.replace('_', ' ')} ({claimCharacter.name})"
+        self.claimCharacter = claimCharacter
+        for player in self.game.playerRegistry:
+            if (player is not curPlayer and player.name in validPlayerNames
+                    and self.policies[player.name].challenges(player, curPlayer, claimCharacter)):
+                return player.name
+        self.paths[f"{self.claim}: unchallenged"] += 1
+        return -1
+
+    async def getPlayerTargetChoice(self, player: Player, playerList: list[Player]) -> int:
+        self.target = self.policies[player.name].chooseTarget(
+            player, [target for target in playerList if target is not player]
+        )
+        return self.target
+
+    async def getPlayerCardChoice(self, player: Player, isReveal: bool = True) -> int:
+        cardIdx = self.policies[player.name].chooseCard(player, isReveal, self.claimCharacter if isReveal else None)
+        if isReveal:
+            proved: bool = player.peek(cardIdx) is self.claimCharacter
+            self.paths[f"{self.claim}: {'claim proved' if proved else 'bluff caught'}"] += 1
+        return cardIdx
+
+    async def askPlayerContessa(self, player: Player) -> bool:
+        claimContessa = self.policies[player.name].claimsContessa(player)
+        if claimContessa:
+            self.blockedAction = self.action.name
+        return claimContessa
+
+    async def askPlayersRoles(self, characterList: list[Character], validPlayerNames: list[int]) -> (int, Character):
+        for player in self.game.playerRegistry:
+            if player.name not in validPlayerNames or player.name == self.actor:
+                continue
+            if self.action is PlayerMove.Steal and player.name != self.target:
+                continue
+            character = self.policies[player.name].chooseBlock(player, characterList)
+            if character:
+                self.blockedAction = self.action.name.replace("_", " ")
+                return player.name, character
+        return -1, None
+
+    async def playerAssassinated(self, assassin: Player, assassinee: Player):
+        pass
+
+    async def playerEliminated(self, player: Player):
+        pass
+
+    async def playerWon(self, player: Player):
+        pass
+
+
+class SimulationStats:
+    """Results of a batch of simulated games."""
+
+    def __init__(self):
+        self.numGames: int = 0
+        self.totalTurns: int = 0
+        self.unfinished: int = 0
+        """Number of games abandoned after MAX_TURNS turns."""
+        self.wins: Counter = Counter()
+        """Number of wins for each player name."""
+        self.gameLengths: Counter = Counter()
+        """Number of finished games for each game length, in turns."""
+        self.paths: Counter = Counter()
+        """Number of times that each challenge resolution path was taken. See
+        ScriptedIO.paths."""
+        self.mismatches: int = 0
+        """Number of checked games that CoupState did not play out the same
+        way."""
+        self.elapsed: float = 0
+
+    def merge(self, other):
+        """Adds the results of another batch of games to these results. Elapsed
+        time is not merged, since batches may have run in parallel."""
+        self.numGames += other.numGames
+        self.totalTurns += other.totalTurns
+        self.unfinished += other.unfinished
+        self.wins.update(other.wins)
+        self.gameLengths.update(other.gameLengths)
+        self.paths.update(other.paths)
+        self.mismatches += other.mismatches
+
+    def addGame(self, turns: int, winner: int):
+        """
+        :param winner: Name of the player who won, or None if the game was
+            abandoned."""
+        self.numGames += 1
+        self.totalTurns += turns
+        if winner is None:
+            self.unfinished += 1
+        else:
+            self.wins[winner] += 1
+            self.gameLengths[turns] += 1
+
+    def report(self) -> str:
+        """
+        :returns: Human readable summary of throughput, game lengths and
+            challenge resolution paths."""
+        s = f"Games: {self.numGames} ({self.unfinished} abandoned after {MAX_TURNS} turns)\n"
+        s += f"Turns: {self.totalTurns}\n"
+        if self.elapsed:
+            s += f"Games/sec: {self.numGames / self.elapsed:,.1f}\n"
+            s += f"Turns/sec: {self.totalTurns / self.elapsed:,.1f}\n"
+        lengths = sorted(self.gameLengths.elements())
+        if lengths:
+            s += "Game length (turns): "
+            s += f"min {lengths[0]}, median {statistics.median(lengths)}, "
+            s += f"mean {statistics.mean(lengths):.1f}, "
+            s += f"p90 {lengths[int(len(lengths) * 0.9)]}, max {lengths[-1]}\n"
+        s += "Wins: " + ", ".join(
+            f"{name}: {self.wins[name]} ({100 * self.wins[name] / self.numGames:.1f}%)" for name in sorted(self.wins)
+        ) + "\n"
+        s += f"Challenge resolution paths ({len(self.paths)} exercised):\n"
+        for path in sorted(self.paths):
+            s += f"  {path:<45} {self.paths[path]}\n"
+        if self.mismatches:
+            s += f"Games that CoupState played out differently: {self.mismatches}\n"
+        return s
+
+
+async def playGame(game: CoupGame) -> (int, int):
+    """Plays a game of Coup until a player wins or MAX_TURNS turns have
+    passed.
+
+    :returns: Number of turns played and the name of the winner, or None if
+        the game was abandoned."""
+    turns: int = 0
+    while turns < MAX_TURNS:
+        turns += 1
+        if await game.executeTurn():
+            return turns, game.playerRegistry.currentName
+    return turns, None
+
+
+def checkGame(game: CoupGame, state: CoupState) -> bool:
+    """Applies game's moveLog to state, which was copied from game before its
+    first turn.
+
+    :returns: Whether state ends up with the same players, hands, coins, deck
+        and discard pile as game."""
+    try:
+        for entry in game.moveLog:
+            state.apply(entry)
+    except CoupError:
+        return False
+    end = CoupState.fromGame(game)
+    return (state.players == end.players and state.deck == end.deck and state.discard == end.discard
+            and all(state.hands[player] == end.hands[player] and state.coins[player] == end.coins[player]
+                    for player in end.players))
+
+
+def makePolicies(policyNames: list[str], rng: random.Random) -> dict[int, Policy]:
+    """
+    :returns: Policies for players 0 to len(policyNames) - 1, with any
+        randomness drawn from rng."""
+    return {
+        name: POLICIES[policyName](random.Random(rng.getrandbits(64)))
+        for name, policyName in enumerate(policyNames)
+    }
+
+
+async def simulateGames(seeds: list[int], policyNames: list[str], check: bool = False) -> SimulationStats:
+    """Plays one game for each seed, where player i uses the policy
+    policyNames[i]. Each seed determines the shuffles of its game and the
+    choices of any random policies.
+
+    :param check: Also play every game on a CoupState and count the games
+        that it plays out differently."""
+    playerNames = list(range(len(policyNames)))
+    stats = SimulationStats()
+    start = time.perf_counter()
+    for seed in seeds:
+        gameRng = random.Random(seed)
+        ioManager = ScriptedIO(makePolicies(policyNames, gameRng))
+        game = CoupGame(playerNames, [str(name) for name in playerNames], ioManager, gameRng.getrandbits(64))
+        ioManager.game = game
+        state = CoupState.fromGame(game) if check else None
+        stats.addGame(*await playGame(game))
+        stats.paths.update(ioManager.paths)
+        if check and not checkGame(game, state):
+            stats.mismatches += 1
+    stats.elapsed = time.perf_counter() - start
+    return stats
+
+
+def gameSeeds(numGames: int, masterSeed: int = None) -> list[int]:
+    """
+    :returns: Seeds for numGames games, all derived from masterSeed."""
+    rng = random.Random(masterSeed)
+    return [rng.getrandbits(64) for _ in range(numGames)]
+
+
+def simulateSeeds(seeds: list[int], policyNames: list[str], check: bool = False) -> SimulationStats:
+    """Runs one headless game of Coup for each seed with no lock/turn logging.
+    Also used as the entry point of worker processes."""
+    rootLogger = logging.getLogger()
+    oldLevel = rootLogger.level
+    rootLogger.setLevel(logging.WARNING)
+    try:
+        return run(simulateGames(seeds, policyNames, check))
+    finally:
+        rootLogger.setLevel(oldLevel)
+
+
+def simulate(numGames: int, policyNames: list[str], masterSeed: int = None, check: bool = False) -> SimulationStats:
+    """Runs numGames headless games of Coup in this process."""
+    return simulateSeeds(gameSeeds(numGames, masterSeed), policyNames, check)
+
+
+def simulateParallel(numGames: int, policyNames: list[str], masterSeed: int = None,
+                     numWorkers: int = None, check: bool = False) -> SimulationStats:
+    """Runs numGames headless games of Coup split across worker processes and
+    merges their results. Every game's seed is derived from masterSeed, so the
+    results only depend on masterSeed and not on how the games are split.
+
+    :param numWorkers: Number of worker processes. Defaults to the number of
+        CPUs."""
+    numWorkers = numWorkers or os.cpu_count()
+    seeds = gameSeeds(numGames, masterSeed)
+    # Several chunks per worker so that slow chunks do not leave workers idle.
+    chunkSize = max(1, -(-numGames // (numWorkers * 4)))
+    chunks = [seeds[i:i + chunkSize] for i in range(0, numGames, chunkSize)]
+    stats = SimulationStats()
+    start = time.perf_counter()
+    with ProcessPoolExecutor(numWorkers) as executor:
+        for chunkStats in executor.map(simulateSeeds, chunks, [policyNames] * len(chunks), [check] * len(chunks)):
+            stats.merge(chunkStats)
+    stats.elapsed = time.perf_counter() - start
+    return stats
+
+
+def parseArgs():
+    parser = argparse.ArgumentParser(description = "Runs headless games of Coup between scripted players.")
+    parser.add_argument("--games", type = int, default = 1000, help = "Number of games to play.")
+    parser.add_argument("--players", type = int, default = 4, help = "Number of players in each game.")
+    parser.add_argument("--policy", choices = sorted(POLICIES), default = "random",
+                        help = "Policy used by every player.")
+    parser.add_argument("--policies", help = "Comma separated policy for each player. Overrides --players and --policy.")
+    parser.add_argument("--seed", type = int, help = "Master seed that all game seeds are derived from.")
+    parser.add_argument("--workers", type = int, default = 1,
+                        help = "Number of worker processes. 0 uses one per CPU.")
+    parser.add_argument("--check", action = "store_true",
+                        help = "Also play every game on a CoupState and report any that differ.")
+    args = parser.parse_args()
+    policyNames = args.policies.split(",") if args.policies else [args.policy] * args.players
+    if not MIN_PLAYERS <= len(policyNames) <= MAX_PLAYERS:
+        parser.error(f"A game must have between {MIN_PLAYERS} and {MAX_PLAYERS} players.")
+    for policyName in policyNames:
+        if policyName not in POLICIES:
+            parser.error(f"Unknown policy: {policyName}")
+    return args, policyNames
+
+
+if __name__ == "__main__":
+    args, policyNames = parseArgs()
+    if args.workers == 1:
+        print(simulate(args.games, policyNames, args.seed, args.check).report())
+    else:
+        print(simulateParallel(args.games, policyNames, args.seed, args.workers or None, args.check).report())
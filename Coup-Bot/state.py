@@ -0,0 +1,435 @@
+from enum import Enum
+import random
+
+from game import CoupGame, CoupError, Character, PlayerMove
+
+
+class Phase(Enum):
+    """Decision that a CoupState is waiting on."""
+    action = 0
+    """The player whose turn it is chooses a move."""
+    target = 1
+    """The player whose turn it is chooses who to target."""
+    challenge = 2
+    """Anyone but the claimer may challenge their claim."""
+    reveal = 3
+    """The challenged claimer chooses a card to reveal."""
+    discard = 4
+    """A player chooses a card to lose."""
+    contessa = 5
+    """The target of an assassination decides whether to claim Contessa."""
+    block = 6
+    """Anyone may claim a character to block the move."""
+    exchange = 7
+    """The player whose turn it is chooses a card to return to the deck."""
+    gameOver = 8
+
+
+def copyRng(rng: random.Random) -> random.Random:
+    """
+    :returns: New generator that produces the same numbers as rng."""
+    copy = random.Random()
+    copy.setstate(rng.getstate())
+    return copy
+
+
+class CoupState:
+    """The rules of Coup on plain lists, tuples and ints, without IO, locks or
+    logging, so that search can copy a game with clone and play it forward
+    with legalMoves and apply.
+
+    Moves are the same tuples as the entries of CoupGame.moveLog (see
+    RecordingIO), so a game's log can be applied to its state directly. A turn
+    is a series of decisions by different players, so phase records which
+    decision comes next and step records how far the turn's move has got."""
+
+    __slots__ = ("players", "hands", "coins", "deck", "discard", "rng", "phase", "actor", "action", "target",
+                 "step", "claimer", "claimCharacter", "challenger", "challengeLoser", "discarder", "blockCharacters",
+                 "blocker", "exchangesLeft", "winner")
+
+    def __init__(self, players: list[int], hands: dict[int, tuple], coins: dict[int, int], deck: list[Character],
+                 discard: list[Character], rng: random.Random = None):
+        """
+        :param players: Names of the players still in the game, in turn order
+            starting with the player whose turn it is.
+        :param deck: Characters in the deck, with the top of the deck first.
+        :param rng: Random number generator used to shuffle the deck. Defaults
+            to a new unseeded generator."""
+        self.players: list[int] = players
+        self.hands: dict[int, tuple[Character, ...]] = hands
+        """Hand of each player, which is replaced rather than changed so that
+        clones can share it."""
+        self.coins: dict[int, int] = coins
+        self.deck: list[Character] = deck
+        self.discard: list[Character] = discard
+        """Cards that players have lost, which are face up."""
+        self.rng: random.Random = rng or random.Random()
+        self.phase: Phase = Phase.action
+        self.actor: int = None
+        """Player whose turn it is, once they have chosen a move."""
+        self.action: PlayerMove = None
+        self.target: int = None
+        self.step: int = 0
+        """Number of decisions of the move that have been resolved."""
+        self.claimer: int = None
+        self.claimCharacter: Character = None
+        self.challenger: int = None
+        self.challengeLoser: int = None
+        """Player who lost the last challenge, or -1 if no one challenged."""
+        self.discarder: int = None
+        self.blockCharacters: tuple[Character, ...] = None
+        """Characters that can block the move while blocking is being asked
+        about, otherwise None."""
+        self.blocker: int = None
+        """Player who blocked the move, or -1 if no one did."""
+        self.exchangesLeft: int = 0
+        self.winner: int = None
+        """Name of the player who has won, once the game is over."""
+
+    @classmethod
+    def fromGame(cls, game: CoupGame):
+        """Copies the current state of game. Like toState, this should only be
+        called between turns.
+
+        Locks: does not check playerLock
+
+        :returns: The copied CoupState, with a copy of the game's random number
+            generator so that it plays out exactly like the game."""
+        players = list(game.playerRegistry)
+        return cls(
+            [player.name for player in players],
+            {player.name: player.hand for player in players},
+            {player.name: player.coins for player in players},
+            game.deck.topFirst(),
+            list(game.discard),
+            copyRng(game.rng)
+        )
+
+    def clone(self, rng: random.Random = None):
+        """
+        :param rng: Random number generator for the clone. Defaults to a copy
+            of rng, so that the clone plays out exactly like self. Rollouts that
+            do not need this can pass a shared generator, which is much cheaper
+            to clone with.
+        :returns: Copy of self that can be changed without changing self."""
+        state = CoupState.__new__(CoupState)
+        state.players = self.players[:]
+        state.hands = self.hands.copy()
+        state.coins = self.coins.copy()
+        state.deck = self.deck[:]
+        state.discard = self.discard[:]
+        state.rng = rng or copyRng(self.rng)
+        state.phase = self.phase
+        state.actor = self.actor
+        state.action = self.action
+        state.target = self.target
+        state.step = self.step
+        state.claimer = self.claimer
+        state.claimCharacter = self.claimCharacter
+        state.challenger = self.challenger
+        state.challengeLoser = self.challengeLoser
+        state.discarder = self.discarder
+        state.blockCharacters = self.blockCharacters
+        state.blocker = self.blocker
+        state.exchangesLeft = self.exchangesLeft
+        state.winner = self.winner
+        return state
+
+    def isOver(self) -> bool:
+        return self.phase is Phase.gameOver
+
+    def currentPlayer(self) -> int:
+        """
+        :returns: Name of the player whose decision the state is waiting on,
+            or None if any player may answer, which is the case for challenges
+            and blocks."""
+        phase = self.phase
+        if phase is Phase.action or phase is Phase.target or phase is Phase.exchange:
+            return self.players[0]
+        elif phase is Phase.reveal:
+            return self.claimer
+        elif phase is Phase.discard:
+            return self.discarder
+        elif phase is Phase.contessa:
+            return self.target
+        return None
+
+    def legalMoves(self) -> list[tuple]:
+        """Leaves out quitting, and moves that the bot accepts but the rules of
+        Coup do not allow, such as blocking your own Foreign Aid. apply accepts
+        them.
+
+        :returns: Every move that can be made, with one card choice for each
+            distinct character rather than for each card."""
+        phase = self.phase
+        actor: int = self.players[0] if self.players else None
+        if phase is Phase.action:
+            coins: int = self.coins[actor]
+            if coins >= 10:
+                return [("m", actor, PlayerMove.Coup.value)]
+            moves = [("m", actor, pm.value) for pm in (
+                PlayerMove.Income, PlayerMove.Foreign_Aid, PlayerMove.Tax, PlayerMove.Steal, PlayerMove.Exchange
+            )]
+            if coins >= 7:
+                moves.append(("m", actor, PlayerMove.Coup.value))
+            if coins >= 3:
+                moves.append(("m", actor, PlayerMove.Assassinate.value))
+            return moves
+        elif phase is Phase.target:
+            return [("t", actor, player) for player in self.players if player != actor]
+        elif phase is Phase.challenge:
+            return [("ch", -1)] + [("ch", player) for player in self.players if player != self.claimer]
+        elif phase is Phase.reveal or phase is Phase.discard or phase is Phase.exchange:
+            player: int = self.currentPlayer()
+            hand: tuple[Character, ...] = self.hands[player]
+            return [("k", player, i) for i, character in enumerate(hand) if character not in hand[:i]]
+        elif phase is Phase.contessa:
+            return [("co", self.target, False), ("co", self.target, True)]
+        elif phase is Phase.block:
+            if self.action is PlayerMove.Foreign_Aid:
+                blockers = [player for player in self.players if player != self.actor]
+            else:
+                blockers = [self.target] if self.target in self.players else []
+            return [("r", -1, None)] + [
+                ("r", player, character.value) for player in blockers for character in self.blockCharacters
+            ]
+        return []
+
+    def apply(self, move: tuple):
+        """Makes a move, following the same rules as CoupGame.executeTurn.
+
+        :param move: Entry in the format of CoupGame.moveLog.
+        :raises CoupError: If move is not allowed in the current state."""
+        kind: str = move[0]
+        phase = self.phase
+        if phase is Phase.action and kind == "m" and move[1] == self.players[0]:
+            self.startMove(PlayerMove(move[2]))
+        elif phase is Phase.target and kind == "t" and move[1] == self.players[0]:
+            if move[2] not in self.players or move[2] == move[1]:
+                raise CoupError(f"Player {move[2]} cannot be targeted.")
+            self.target = move[2]
+            self.step = 1
+            self.continueMove()
+        elif phase is Phase.challenge and kind == "ch":
+            if move[1] == -1:
+                self.challengeLoser = -1
+                self.challengeResolved()
+            elif move[1] in self.players and move[1] != self.claimer:
+                self.challenger = move[1]
+                self.phase = Phase.reveal
+            else:
+                raise CoupError(f"Player {move[1]} cannot challenge.")
+        elif phase is Phase.reveal and kind == "k" and move[1] == self.claimer:
+            self.revealCard(move[2])
+        elif phase is Phase.discard and kind == "k" and move[1] == self.discarder:
+            self.loseCard(move[2])
+        elif phase is Phase.contessa and kind == "co" and move[1] == self.target:
+            if move[2]:
+                self.startChallenge(self.target, Character.Contessa)
+            else:
+                self.finishAssassination(True, True)
+        elif phase is Phase.block and kind == "r":
+            if move[1] == -1:
+                self.blocker = -1
+                self.blockCharacters = None
+                self.continueMove()
+            elif move[1] in self.players and Character(move[2]) in self.blockCharacters:
+                self.startChallenge(move[1], Character(move[2]))
+            else:
+                raise CoupError(f"Player {move[1]} cannot block with {move[2]}.")
+        elif phase is Phase.exchange and kind == "k" and move[1] == self.actor:
+            hand: tuple[Character, ...] = self.hands[move[1]]
+            if not 0 <= move[2] < len(hand):
+                raise CoupError("Invalid card selected.")
+            self.deck.append(hand[move[2]])
+            self.hands[move[1]] = hand[:move[2]] + hand[move[2] + 1:]
+            self.exchangesLeft -= 1
+            if not self.exchangesLeft:
+                self.rng.shuffle(self.deck)
+                self.endTurn()
+        else:
+            raise CoupError(f"{move} cannot be made while waiting on {phase.name}.")
+
+    def startMove(self, pm: PlayerMove):
+        actor: int = self.players[0]
+        self.actor = actor
+        self.action = pm
+        self.step = 0
+        if pm is PlayerMove.Income:
+            self.coins[actor] += 1
+            self.endTurn()
+        elif pm is PlayerMove.Foreign_Aid:
+            self.startBlock((Character.Duke,))
+        elif pm is PlayerMove.Tax:
+            self.startChallenge(actor, Character.Duke)
+        elif pm is PlayerMove.Exchange:
+            self.startChallenge(actor, Character.Ambassador)
+        elif pm is PlayerMove.Quit:
+            self.discard += self.hands[actor]
+            self.hands[actor] = ()
+            self.removePlayer(actor)
+            if self.phase is not Phase.gameOver:
+                self.endTurn()
+        else:
+            self.phase = Phase.target
+
+    def continueMove(self):
+        """Carries on with the current move after a decision has been
+        resolved. See CoupGame.executeTurn for the rules that this follows."""
+        actor: int = self.actor
+        pm: PlayerMove = self.action
+        if pm is PlayerMove.Foreign_Aid:
+            if self.blocker == -1:
+                self.coins[actor] += 2
+            self.endTurn()
+        elif pm is PlayerMove.Coup:
+            if self.step == 1:
+                self.coins[actor] = max(self.coins[actor] - 7, 0)
+                self.step = 2
+                self.startDiscard(self.target)
+            else:
+                self.endTurn()
+        elif pm is PlayerMove.Tax:
+            if self.challengeLoser != actor:
+                self.coins[actor] += 3
+            self.endTurn()
+        elif pm is PlayerMove.Assassinate:
+            if self.step == 1:
+                self.step = 2
+                self.startChallenge(actor, Character.Assassin)
+            elif self.step == 2:
+                if self.challengeLoser == actor or (self.challengeLoser == self.target and not self.hands[self.target]):
+                    self.endTurn()
+                else:
+                    self.step = 3
+                    self.phase = Phase.contessa
+            elif self.step == 3:
+                # The target has claimed Contessa and the claim was resolved
+                if self.challengeLoser == -1:
+                    self.finishAssassination(True, False)
+                elif self.challengeLoser == self.target:
+                    targetLeft: bool = not self.hands[self.target]
+                    self.finishAssassination(not targetLeft, not targetLeft)
+                else:
+                    self.finishAssassination(True, False)
+            else:
+                self.endTurn()
+        elif pm is PlayerMove.Steal:
+            if self.step == 1:
+                self.step = 2
+                self.startChallenge(actor, Character.Captain)
+            elif self.step == 2:
+                if self.challengeLoser == actor or (self.challengeLoser == self.target and not self.hands[self.target]):
+                    self.endTurn()
+                else:
+                    self.step = 3
+                    self.startBlock((Character.Captain, Character.Ambassador))
+            else:
+                if self.blocker == -1:
+                    stolenCoins: int = min(self.coins[self.target], 2)
+                    self.coins[self.target] -= stolenCoins
+                    self.coins[actor] += stolenCoins
+                self.endTurn()
+        elif pm is PlayerMove.Exchange:
+            if self.challengeLoser == actor:
+                self.endTurn()
+            else:
+                self.hands[actor] += (self.deck.pop(0), self.deck.pop(0))
+                self.exchangesLeft = 2
+                self.phase = Phase.exchange
+
+    def finishAssassination(self, loseCoins: bool, continueAssassinate: bool):
+        if loseCoins:
+            self.coins[self.actor] = max(self.coins[self.actor] - 3, 0)
+        if continueAssassinate:
+            self.step = 4
+            self.startDiscard(self.target)
+        else:
+            self.endTurn()
+
+    def startChallenge(self, claimer: int, claimCharacter: Character):
+        self.claimer = claimer
+        self.claimCharacter = claimCharacter
+        self.challenger = None
+        self.phase = Phase.challenge
+
+    def revealCard(self, n: int):
+        """Resolves a challenge by revealing the claimer's nth card, which the
+        claimer swaps for a new one if it is the claimed character."""
+        hand: tuple[Character, ...] = self.hands[self.claimer]
+        if not 0 <= n < len(hand):
+            raise CoupError("Invalid card selected.")
+        if hand[n] is self.claimCharacter:
+            self.deck.append(hand[n])
+            self.rng.shuffle(self.deck)
+            self.hands[self.claimer] = hand[:n] + hand[n + 1:] + (self.deck.pop(0),)
+            self.challengeLoser = self.challenger
+        else:
+            self.challengeLoser = self.claimer
+        self.startDiscard(self.challengeLoser)
+
+    def challengeResolved(self):
+        if self.blockCharacters is None:
+            self.continueMove()
+        # The blocker lost the challenge, so anyone may try to block again
+        elif self.challengeLoser == self.claimer:
+            self.phase = Phase.block
+        else:
+            self.blocker = self.claimer
+            self.blockCharacters = None
+            self.continueMove()
+
+    def startBlock(self, blockCharacters: tuple[Character, ...]):
+        self.blockCharacters = blockCharacters
+        self.blocker = None
+        self.phase = Phase.block
+
+    def startDiscard(self, player: int):
+        self.discarder = player
+        self.phase = Phase.discard
+
+    def loseCard(self, n: int):
+        """The discarder loses their nth card, and is eliminated if it was
+        their last one."""
+        hand: tuple[Character, ...] = self.hands[self.discarder]
+        if not 0 <= n < len(hand):
+            raise CoupError("Invalid card selected.")
+        self.discard.append(hand[n])
+        self.hands[self.discarder] = hand = hand[:n] + hand[n + 1:]
+        if not hand:
+            self.removePlayer(self.discarder)
+            if self.phase is Phase.gameOver:
+                return
+        # Lost cards either settle a challenge or finish a Coup or Assassinate
+        if self.challenger is not None and self.discarder == self.challengeLoser:
+            self.challenger = None
+            self.challengeResolved()
+        else:
+            self.continueMove()
+
+    def removePlayer(self, player: int):
+        """Takes an eliminated player out of the turn order, ending the game if
+        only one player is left."""
+        self.players.remove(player)
+        if len(self.players) == 1:
+            self.winner = self.players[0]
+            self.phase = Phase.gameOver
+
+    def endTurn(self):
+        """Passes the turn to the next player, like CoupGame.updateNextPlayer.
+        The turn order is not rotated if the player whose turn it was has left,
+        since the next player is already first."""
+        if self.actor in self.players:
+            self.players.append(self.players.pop(0))
+        self.phase = Phase.action
+        self.actor = None
+        self.action = None
+        self.target = None
+        self.step = 0
+        self.claimer = None
+        self.claimCharacter = None
+        self.challenger = None
+        self.challengeLoser = None
+        self.discarder = None
+        self.blockCharacters = None
+        self.blocker = None
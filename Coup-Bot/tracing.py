@@ -0,0 +1,244 @@
+from asyncio import Lock, current_task
+from collections import deque
+import os
+import sys
+import time
+
+TRACE_CAPACITY: int = 4096
+"""Number of most recent lock events that are kept."""
+HOLD_TIME_CAPACITY: int = 10000
+"""Number of most recent hold and wait times that are kept for each lock and
+for each call site."""
+
+
+class CallSiteStats:
+    """Contention of a lock at one place in the code that acquires it."""
+
+    def __init__(self):
+        self.waitTimes: deque = deque(maxlen = HOLD_TIME_CAPACITY)
+        """Recent times in seconds between asking for the lock and getting
+        it."""
+        self.holdTimes: deque = deque(maxlen = HOLD_TIME_CAPACITY)
+        """Recent times in seconds that the lock was held for after being
+        acquired here."""
+        self.maxQueueDepth: int = 0
+        """Most tasks that were holding or waiting for the lock when it was
+        asked for here."""
+        self.networkCalls: int = 0
+        """Number of network calls made by the task holding the lock after it
+        was acquired here."""
+
+
+class LockTracer:
+    """Records when TracedLocks are acquired and released in a ring buffer,
+    along with wait times, hold times and queue depths for each lock and call
+    site, and network calls that are made while holding a lock. Messages are
+    stored as a template and its arguments and are only formatted when the
+    buffer is dumped, so that tracing costs little when enabled and almost
+    nothing when disabled."""
+
+    def __init__(self, enabled: bool = False):
+        self.enabled: bool = enabled
+        self.events: deque = deque(maxlen = TRACE_CAPACITY)
+        """(time, lock name, event, duration in seconds or None, message
+        template, message arguments) for recent events, oldest first. The event
+        is "acquired", with the wait time as the duration, "released", with
+        the hold time as the duration, or "network", for a network call made
+        while holding the lock, with the time it had been held for as the
+        duration."""
+        self.holdTimes: dict[str, deque] = {}
+        """Recent hold times in seconds, keyed by lock name."""
+        self.callSites: dict[tuple[str, str], CallSiteStats] = {}
+        """Keyed by lock name and call site."""
+        self.held: dict[int, tuple] = {}
+        """Time that each held lock was acquired, its name, the call site that
+        acquired it and the task that acquired it, keyed by the id of the
+        lock."""
+
+    def acquired(self, lock, callSite: str, queueDepth: int, waitTime: float, template: str, args: tuple):
+        """Records that lock has just been acquired.
+
+        :param queueDepth: Number of tasks that were holding or waiting for
+            the lock when it was asked for.
+        :param template: %-style message template, formatted with args when
+            the event is dumped."""
+        now = time.perf_counter()
+        self.held[id(lock)] = (now, lock.name, callSite, current_task())
+        stats = self.callSites.get((lock.name, callSite))
+        if stats is None:
+            stats = self.callSites[(lock.name, callSite)] = CallSiteStats()
+        stats.waitTimes.append(waitTime)
+        stats.maxQueueDepth = max(stats.maxQueueDepth, queueDepth)
+        self.events.append((now, lock.name, "acquired", waitTime, template, args))
+
+    def released(self, lock, template: str, args: tuple):
+        """Records that lock has just been released."""
+        now = time.perf_counter()
+        held = self.held.pop(id(lock), None)
+        holdTime = None
+        if held is not None:
+            acquiredAt, _, callSite, _ = held
+            holdTime = now - acquiredAt
+            if lock.name not in self.holdTimes:
+                self.holdTimes[lock.name] = deque(maxlen = HOLD_TIME_CAPACITY)
+            self.holdTimes[lock.name].append(holdTime)
+            self.callSites[(lock.name, callSite)].holdTimes.append(holdTime)
+        self.events.append((now, lock.name, "released", holdTime, template, args))
+
+    def networkCall(self, description: str):
+        """Flags a network call if the current task is holding any
+        TracedLocks. Call right before awaiting network I/O."""
+        if not self.enabled or not self.held:
+            return
+        now = time.perf_counter()
+        task = current_task()
+        for acquiredAt, lockName, callSite, holder in list(self.held.values()):
+            if holder is task:
+                self.callSites[(lockName, callSite)].networkCalls += 1
+                self.events.append((now, lockName, "network", now - acquiredAt, "%s while held from %s",
+                                    (description, callSite)))
+
+    def clear(self):
+        self.events.clear()
+        self.holdTimes.clear()
+        self.callSites.clear()
+        self.held.clear()
+
+    def dump(self, limit: int = None) -> str:
+        """
+        :param limit: Maximum number of events to include, most recent first.
+            Defaults to all events in the buffer.
+        :returns: Human readable list of recent events, oldest first, with
+            times relative to now."""
+        if not self.enabled:
+            return "Lock tracing is disabled."
+        now = time.perf_counter()
+        events = list(self.events)
+        if limit is not None:
+            events = events[-limit:]
+        s = ""
+        for eventTime, lockName, event, duration, template, args in events:
+            s += f"{eventTime - now:+10.3f}s {lockName} "
+            if event == "acquired":
+                s += f"acquired after waiting {formatSeconds(duration)}"
+            elif event == "network":
+                s += f"NETWORK CALL after holding for {formatSeconds(duration)}"
+            elif duration is None:
+                s += "released"
+            else:
+                s += f"released after {formatSeconds(duration)}"
+            if template:
+                s += f": {template % args if args else template}"
+            s += "\n"
+        return s or "No lock events have been recorded."
+
+    def holdTimeReport(self) -> str:
+        """
+        :returns: Human readable p50, p99 and max hold times for each lock,
+            with a histogram of hold times using power of two buckets."""
+        if not self.enabled:
+            return "Lock tracing is disabled."
+        s = ""
+        for lockName in sorted(self.holdTimes):
+            holdTimes = sorted(self.holdTimes[lockName])
+            s += f"{lockName}: {len(holdTimes)} holds, p50 {formatSeconds(percentile(holdTimes, 0.5))}, "
+            s += f"p99 {formatSeconds(percentile(holdTimes, 0.99))}, max {formatSeconds(holdTimes[-1])}\n"
+            buckets: dict[int, int] = {}
+            for holdTime in holdTimes:
+                bucket = max(0, int(holdTime * 1e6)).bit_length()
+                buckets[bucket] = buckets.get(bucket, 0) + 1
+            for bucket in range(min(buckets), max(buckets) + 1):
+                count = buckets.get(bucket, 0)
+                upper = formatSeconds((1 << bucket) / 1e6)
+                s += f"  < {upper:>8} {'#' * -(-40 * count // len(holdTimes))} {count}\n"
+        return s or "No lock hold times have been recorded."
+
+    def contentionReport(self) -> str:
+        """
+        :returns: Human readable wait and hold times, max queue depth and
+            number of network calls made while holding the lock for each call
+            site of each lock, with the sites that waited longest first."""
+        if not self.enabled:
+            return "Lock tracing is disabled."
+        s = ""
+        for (lockName, callSite), stats in sorted(
+            self.callSites.items(), key = lambda item: -sum(item[1].waitTimes)
+        ):
+            waitTimes, holdTimes = sorted(stats.waitTimes), sorted(stats.holdTimes)
+            s += f"{lockName} at {callSite}: {len(waitTimes)} acquires, max queue {stats.maxQueueDepth}\n"
+            s += f"  wait p50 {formatSeconds(percentile(waitTimes, 0.5))}, p99 {formatSeconds(percentile(waitTimes, 0.99))}"
+            if holdTimes:
+                s += f"; hold p50 {formatSeconds(percentile(holdTimes, 0.5))}, "
+                s += f"p99 {formatSeconds(percentile(holdTimes, 0.99))}"
+            s += "\n"
+            if stats.networkCalls:
+                s += f"  WARNING: {stats.networkCalls} network calls made while holding {lockName}\n"
+        return s or "No locks have been acquired."
+
+
+class TracedLock(Lock):
+    """asyncio.Lock that reports to the tracer. acquire and release take an
+    optional %-style message template and its arguments, which are only
+    formatted if the trace is dumped. Every acquire is attributed to the
+    first caller outside of the lock and its acquire/release helper
+    methods."""
+
+    def __init__(self, name: str):
+        super().__init__()
+        self.name: str = name
+        self.numWaiting: int = 0
+        """Number of tasks waiting to acquire the lock."""
+
+    async def acquire(self, template: str = "", *args) -> bool:
+        if not tracer.enabled:
+            self.numWaiting += 1
+            try:
+                return await super().acquire()
+            finally:
+                self.numWaiting -= 1
+        site = callSite()
+        queueDepth = self.numWaiting + self.locked()
+        start = time.perf_counter()
+        self.numWaiting += 1
+        try:
+            await super().acquire()
+        finally:
+            self.numWaiting -= 1
+        tracer.acquired(self, site, queueDepth, time.perf_counter() - start, template, args)
+        return True
+
+    def release(self, template: str = "", *args):
+        super().release()
+        if tracer.enabled:
+            tracer.released(self, template, args)
+
+
+def callSite() -> str:
+    """
+    :returns: File, line and function of the code that is acquiring a lock,
+        skipping frames of lock methods and helpers named acquire... or
+        release...."""
+    frame = sys._getframe(2)
+    while frame.f_back and frame.f_code.co_name.startswith(("acquire", "release", "__aenter__")):
+        frame = frame.f_back
+    return f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno} {frame.f_code.co_name}"
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """
+    :param values: Sorted, non-empty list of values.
+    :returns: The value below which the given fraction of values lie."""
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def formatSeconds(seconds: float) -> str:
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.0f}us"
+    elif seconds < 1:
+        return f"{seconds * 1e3:.1f}ms"
+    return f"{seconds:.2f}s"
+
+
+tracer: LockTracer = LockTracer(os.getenv("LOCK_TRACING", "0") not in ("", "0"))
+"""Tracer shared by all locks. Enabled by setting the LOCK_TRACING environment
+variable to 1."""
@@ -0,0 +1,308 @@
+from asyncio import run
+from collections import Counter
+import argparse
+import logging
+import math
+import random
+import sys
+import time
+
+import numpy as np
+
+from game import UnoGame, Deck, Card, Color, Value, STARTING_HAND_SIZE, MAX_PLAYERS, MIN_PLAYERS
+from simulate import ScriptedIO, LowestCodePolicy, MAX_TURNS
+
+KINDS: list[Card] = sorted(
+    [Card(color, value) for color in Color if color is not Color.black for value in Value
+     if value not in (Value.wild, Value.drawFour)] +
+    [Card(Color.black, Value.wild), Card(Color.black, Value.drawFour)],
+    key = lambda card: card.code
+)
+"""The 54 distinct cards, ordered by Card.code. Batch games refer to cards by
+their index in this list."""
+NUM_KINDS: int = len(KINDS)
+KIND_OF_CODE = np.full(128, -1, dtype = np.int16)
+KIND_OF_CODE[[card.code for card in KINDS]] = np.arange(NUM_KINDS)
+KIND_COLOR = np.array([card.color.value for card in KINDS], dtype = np.int8)
+KIND_VALUE = np.array([card.value.value for card in KINDS], dtype = np.int8)
+KIND_IS_BLACK = KIND_COLOR == Color.black.value
+KIND_IS_ACTION = np.array([card.isActionCard for card in KINDS])
+KIND_SKIPS = np.isin(KIND_VALUE, (Value.drawFour.value, Value.drawTwo.value, Value.skip.value))
+"""Whether playing a kind skips the next player."""
+KIND_COLOR_ONE_HOT = np.stack([KIND_COLOR == color for color in range(4)], axis = 1).astype(np.int16)
+"""KIND_COLOR_ONE_HOT[k, c] is 1 iff kind k has non-black color c."""
+
+_deckCounts = Counter(card.code for card in Deck(random.Random(0)).cards)
+DECK_KINDS = np.repeat(np.arange(NUM_KINDS, dtype = np.int16), [_deckCounts[card.code] for card in KINDS])
+"""Kinds of the cards in a full deck, with the same composition as Deck."""
+DECK_SIZE: int = len(DECK_KINDS)
+
+
+class BatchUnoGame:
+    """Plays many games of Uno at once with NumPy arrays, advancing every
+    unfinished game by one turn per step. Follows the same rules as
+    UnoGame.executeTurn/updateActions, including draw chaining and shuffling
+    the discard pile back into the deck, with every player using the policy
+    of simulate.LowestCodePolicy and never calling 'Uno!' or quitting.
+
+    Game state is stored per game g (and per player p):
+        deck[g, :deckSize[g]]: kinds in the deck, with the top at the end.
+        discardCounts[g, k]: number of cards of kind k under the top card.
+        top[g], topColor[g]: top card of the discard pile and its (chosen)
+            color.
+        hands[g, p, k]: number of cards of kind k in hand.
+        nextPlayer, turnOrder, numDraw, skipNextPlayer: as in UnoGame."""
+
+    def __init__(self, numGames: int, numPlayers: int, seed: int = None):
+        if not MIN_PLAYERS <= numPlayers <= MAX_PLAYERS:
+            raise ValueError(f"A game must have between {MIN_PLAYERS} and {MAX_PLAYERS} players.")
+        self.numGames: int = numGames
+        self.numPlayers: int = numPlayers
+        self.rng = np.random.default_rng(seed)
+        games = np.arange(numGames)
+
+        self.deck = self.rng.permuted(np.tile(DECK_KINDS, (numGames, 1)), axis = 1)
+        self.deckSize = np.full(numGames, DECK_SIZE, dtype = np.int32)
+
+        # Deal starting hands from the top of the deck
+        self.hands = np.zeros((numGames, numPlayers, NUM_KINDS), dtype = np.int16)
+        dealt = self.deck[:, DECK_SIZE - numPlayers * STARTING_HAND_SIZE:]
+        dealt = dealt.reshape(numGames, numPlayers, STARTING_HAND_SIZE)
+        np.add.at(
+            self.hands,
+            (games[:, None, None], np.arange(numPlayers)[None, :, None], dealt),
+            1
+        )
+        self.deckSize -= numPlayers * STARTING_HAND_SIZE
+
+        # Start the discard pile with the non-action card closest to the top of
+        # the deck, moving the top card of the deck into its place.
+        remaining: int = DECK_SIZE - numPlayers * STARTING_HAND_SIZE
+        nonAction = ~KIND_IS_ACTION[self.deck[:, :remaining]]
+        firstNonAction = remaining - 1 - np.argmax(nonAction[:, ::-1], axis = 1)
+        self.top = self.deck[games, firstNonAction].astype(np.int16)
+        self.topColor = KIND_COLOR[self.top].astype(np.int8)
+        self.deck[games, firstNonAction] = self.deck[:, remaining - 1]
+        self.deckSize -= 1
+        self.discardCounts = np.zeros((numGames, NUM_KINDS), dtype = np.int16)
+
+        self.nextPlayer = np.zeros(numGames, dtype = np.int32)
+        self.turnOrder = np.ones(numGames, dtype = np.int32)
+        self.numDraw = np.zeros(numGames, dtype = np.int32)
+        self.skipNextPlayer = np.zeros(numGames, dtype = bool)
+
+        self.done = np.zeros(numGames, dtype = bool)
+        self.winner = np.full(numGames, -1, dtype = np.int32)
+        """Turn position of the winner of each game, or -1."""
+        self.turns = np.zeros(numGames, dtype = np.int32)
+
+    def playableMask(self, games: np.ndarray, topDrawAndActive: np.ndarray) -> np.ndarray:
+        """
+        :returns: mask[i, k] is True iff kind k can be played on the top card
+            of game games[i]. See Card.matches."""
+        top = self.top[games]
+        sameValue = KIND_VALUE[None, :] == KIND_VALUE[top][:, None]
+        sameColor = KIND_COLOR[None, :] == self.topColor[games][:, None]
+        return sameValue | (~topDrawAndActive[:, None] & (sameColor | KIND_IS_BLACK[None, :]))
+
+    def reshuffle(self, game: int):
+        """Shuffles the cards under the top of the discard pile into the deck
+        of one game. See Deck.pop."""
+        cards = np.repeat(np.arange(NUM_KINDS, dtype = np.int16), self.discardCounts[game])
+        self.rng.shuffle(cards)
+        self.deck[game, :len(cards)] = cards
+        self.deckSize[game] = len(cards)
+        self.discardCounts[game] = 0
+
+    def draw(self, games: np.ndarray) -> (np.ndarray, np.ndarray):
+        """Draws the top card of the deck for each game.
+
+        :returns: The games that could draw a card and the drawn kinds. Games
+            with no cards in their deck or under the top of their discard pile
+            cannot draw."""
+        for game in games[self.deckSize[games] == 0]:
+            self.reshuffle(game)
+        games = games[self.deckSize[games] > 0]
+        self.deckSize[games] -= 1
+        return games, self.deck[games, self.deckSize[games]]
+
+    def chooseColors(self, games: np.ndarray) -> np.ndarray:
+        """
+        :returns: The most common non-black color in the current player's hand
+            for each game, with ties broken in Color order."""
+        counts = self.hands[games, self.nextPlayer[games]] @ KIND_COLOR_ONE_HOT
+        return np.argmax(counts, axis = 1).astype(np.int8)
+
+    def playCards(self, games: np.ndarray, kinds: np.ndarray):
+        """Puts cards on top of the discard piles, choosing a color for black
+        cards, and updates actions. See UnoGame.updateActions."""
+        self.discardCounts[games, self.top[games]] += 1
+        self.top[games] = kinds
+        self.topColor[games] = KIND_COLOR[kinds]
+        black = KIND_IS_BLACK[kinds]
+        self.topColor[games[black]] = self.chooseColors(games[black])
+
+        values = KIND_VALUE[kinds]
+        self.turnOrder[games[values == Value.reverse.value]] *= -1
+        self.skipNextPlayer[games[KIND_SKIPS[kinds]]] = True
+        self.numDraw[games[values == Value.drawFour.value]] += 4
+        self.numDraw[games[values == Value.drawTwo.value]] += 2
+
+    def step(self):
+        """Executes one turn of every unfinished game. See
+        UnoGame.executeTurn."""
+        games = np.flatnonzero(~self.done)
+        self.turns[games] += 1
+
+        # If the top card is a skip and has not been executed, skip this turn
+        skip = (self.numDraw[games] == 0) & self.skipNextPlayer[games]
+        skipped, games = games[skip], games[~skip]
+        self.skipNextPlayer[skipped] = False
+
+        curPlayers = self.nextPlayer[games]
+        topDrawAndActive = self.numDraw[games] > 0
+        playable = (self.hands[games, curPlayers] > 0) & self.playableMask(games, topDrawAndActive)
+        canPlay = playable.any(axis = 1)
+
+        # Play the playable card with the lowest code
+        playing = games[canPlay]
+        kinds = np.argmax(playable[canPlay], axis = 1).astype(np.int16)
+        self.hands[playing, self.nextPlayer[playing], kinds] -= 1
+        self.playCards(playing, kinds)
+        won = playing[self.hands[playing, self.nextPlayer[playing]].sum(axis = 1) == 0]
+        self.done[won] = True
+        self.winner[won] = self.nextPlayer[won]
+
+        # Draw for an active drawTwo/drawFour
+        drawing = games[~canPlay & topDrawAndActive]
+        for n in range(int(self.numDraw[drawing].max(initial = 0))):
+            drawing = drawing[self.numDraw[drawing] > n]
+            drawing, kinds = self.draw(drawing)
+            self.hands[drawing, self.nextPlayer[drawing], kinds] += 1
+        drawing = games[~canPlay & topDrawAndActive]
+        self.numDraw[drawing] = 0
+        self.skipNextPlayer[drawing] = False
+
+        # Draw until a playable card is found, which is played automatically
+        searching = games[~canPlay & ~topDrawAndActive]
+        while len(searching):
+            searching, kinds = self.draw(searching)
+            matches = self.playableMask(searching, np.zeros(len(searching), dtype = bool))
+            matches = matches[np.arange(len(searching)), kinds]
+            self.playCards(searching[matches], kinds[matches])
+            searching, kinds = searching[~matches], kinds[~matches]
+            self.hands[searching, self.nextPlayer[searching], kinds] += 1
+
+        # Update to the next player
+        moving = np.concatenate((skipped, games[~self.done[games]]))
+        self.nextPlayer[moving] = (self.nextPlayer[moving] + self.turnOrder[moving]) % self.numPlayers
+
+    def run(self, maxTurns: int = MAX_TURNS):
+        """Steps until every game has finished or has been played for maxTurns
+        turns."""
+        while not self.done.all():
+            self.step()
+            self.done |= self.turns >= maxTurns
+
+
+def playObjectGames(numGames: int, numPlayers: int, seed: int = None) -> (np.ndarray, np.ndarray):
+    """Plays games with UnoGame and LowestCodePolicy for comparison with
+    BatchUnoGame.
+
+    :returns: Number of turns and turn position of the winner (or -1) of each
+        game."""
+    async def playGames():
+        rng = random.Random(seed)
+        playerNames = list(range(numPlayers))
+        ioManager = ScriptedIO({name: LowestCodePolicy() for name in playerNames})
+        turns, winners = [], []
+        for _ in range(numGames):
+            game = UnoGame(list(playerNames), ioManager, rng.getrandbits(64))
+            winner = -1
+            turn = 0
+            while turn < MAX_TURNS:
+                turn += 1
+                if await game.executeTurn():
+                    winner = game.nextPlayer
+                    break
+            turns.append(turn)
+            winners.append(winner)
+        return np.array(turns), np.array(winners)
+
+    rootLogger = logging.getLogger()
+    oldLevel = rootLogger.level
+    rootLogger.setLevel(logging.WARNING)
+    try:
+        return run(playGames())
+    finally:
+        rootLogger.setLevel(oldLevel)
+
+
+def ksTest(a: np.ndarray, b: np.ndarray) -> (float, float):
+    """Two sample Kolmogorov-Smirnov test.
+
+    :returns: The KS statistic and its asymptotic p-value."""
+    values = np.union1d(a, b)
+    cdfA = np.searchsorted(np.sort(a), values, side = "right") / len(a)
+    cdfB = np.searchsorted(np.sort(b), values, side = "right") / len(b)
+    d = float(np.abs(cdfA - cdfB).max())
+    en = math.sqrt(len(a) * len(b) / (len(a) + len(b)))
+    lam = (en + 0.12 + 0.11 / en) * d
+    p = 2 * sum((-1) ** (j - 1) * math.exp(-2 * j * j * lam * lam) for j in range(1, 101))
+    return d, min(1.0, max(0.0, p))
+
+
+def chiSquareTest(a: np.ndarray, b: np.ndarray) -> (float, float):
+    """Chi-square test that two samples of winners come from the same
+    distribution over turn positions.
+
+    :returns: The chi-square statistic and its p-value, using the
+        Wilson-Hilferty approximation."""
+    numPositions = int(max(a.max(), b.max())) + 2
+    table = np.stack([np.bincount(a + 1, minlength = numPositions), np.bincount(b + 1, minlength = numPositions)])
+    table = table[:, table.sum(axis = 0) > 0]
+    expected = table.sum(axis = 1, keepdims = True) * table.sum(axis = 0, keepdims = True) / table.sum()
+    chi2 = float(((table - expected) ** 2 / expected).sum())
+    df = table.shape[1] - 1
+    z = ((chi2 / df) ** (1 / 3) - (1 - 2 / (9 * df))) / math.sqrt(2 / (9 * df))
+    return chi2, 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def crossCheck(numGames: int, numPlayers: int, seed: int = None, alpha: float = 0.001) -> bool:
+    """Plays numGames games with both engines and tests whether the game
+    lengths and winning turn positions have the same distribution.
+
+    :returns: Whether neither test rejects at significance level alpha."""
+    batch = BatchUnoGame(numGames, numPlayers, seed)
+    batch.run()
+    turns, winners = playObjectGames(numGames, numPlayers, seed)
+
+    print(f"Mean turns: batch {batch.turns.mean():.2f}, object {turns.mean():.2f}")
+    print(f"Winning positions: batch {np.bincount(batch.winner + 1).tolist()}, "
+          f"object {np.bincount(winners + 1).tolist()} (first count is abandoned games)")
+    d, pLength = ksTest(batch.turns, turns)
+    chi2, pWinner = chiSquareTest(batch.winner, winners)
+    print(f"Game length KS test: D = {d:.4f}, p = {pLength:.4f}")
+    print(f"Winning position chi-square test: chi2 = {chi2:.2f}, p = {pWinner:.4f}")
+    return pLength >= alpha and pWinner >= alpha
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Plays batches of Uno games with NumPy.")
+    parser.add_argument("--games", type = int, default = 10000, help = "Number of games to play.")
+    parser.add_argument("--players", type = int, default = 4, help = "Number of players in each game.")
+    parser.add_argument("--seed", type = int, help = "Seed for shuffling.")
+    parser.add_argument("--cross-check", action = "store_true",
+                        help = "Compare outcomes against the same number of UnoGame games.")
+    args = parser.parse_args()
+
+    if args.cross_check:
+        sys.exit(0 if crossCheck(args.games, args.players, args.seed) else 1)
+
+    start = time.perf_counter()
+    batchGame = BatchUnoGame(args.games, args.players, args.seed)
+    batchGame.run()
+    elapsed = time.perf_counter() - start
+    print(f"Games/sec: {args.games / elapsed:,.1f}")
+    print(f"Turns/sec: {batchGame.turns.sum() / elapsed:,.1f}")
+    print(f"Mean turns: {batchGame.turns.mean():.2f}, abandoned: {int((batchGame.winner == -1).sum())}")
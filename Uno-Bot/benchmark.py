@@ -0,0 +1,101 @@
+import logging
+import random
+import time
+
+from game import UnoGame, UnoError, Deck, Discard, Card, MAX_PLAYERS, STARTING_HAND_SIZE
+from state import UnoState
+
+
+class ListFrontDeck(Deck):
+    """Deck that keeps its top card at the front of its list, with the methods
+    that Deck had before it was stored as a stack. Only used as a baseline for
+    benchmarking."""
+    def __init__(self):
+        super().__init__()
+        self.cards = list(self.cards)
+
+    def pop(self, discard: Discard) -> Card:
+        if len(self.cards) == 0:
+            self.cards = discard.shuffleBack()
+            if len(self.cards) == 0:
+                raise UnoError("No cards remaining in deck.")
+            self.shuffle()
+        return self.cards.pop(0)
+
+    def popNonAction(self) -> Card:
+        count: int = 0
+        while self.cards[count].isActionCard:
+            count += 1
+        return self.cards.pop(count)
+
+    def popStartingHand(self) -> list[Card]:
+        if STARTING_HAND_SIZE > len(self.cards):
+            raise UnoError("Invalid usage of popStartingHand.")
+        retVal, self.cards = self.cards[:STARTING_HAND_SIZE], self.cards[STARTING_HAND_SIZE:]
+        return retVal
+
+    def addBottom(self, card: Card):
+        self.cards.append(card)
+
+
+def simulateDraws(deckClass, numGames: int, drawsPerGame: int) -> int:
+    """Deals starting hands for a full table, then repeatedly draws cards and
+    plays them straight onto the discard pile, so that the deck is reshuffled
+    from the discard pile roughly every 50 draws.
+
+    :returns: Total number of cards drawn."""
+    totalDrawn: int = 0
+    for _ in range(numGames):
+        deck = deckClass()
+        discard = Discard()
+        for _ in range(MAX_PLAYERS):
+            totalDrawn += len(deck.popStartingHand())
+        discard.addTop(deck.popNonAction())
+        for _ in range(drawsPerGame):
+            discard.addTop(deck.pop(discard))
+        totalDrawn += drawsPerGame
+    return totalDrawn
+
+
+def benchmarkDeckDraws(numGames: int = 200, drawsPerGame: int = 2000, numRounds: int = 5):
+    """Times both decks in alternating rounds, so that they see the same
+    machine load, and reports the best round of each."""
+    decks = (("list front (before)", ListFrontDeck), ("deque stack (after)", Deck))
+    bestRates: dict[str, float] = {name: 0 for name, _ in decks}
+    for _ in range(numRounds):
+        for name, deckClass in decks:
+            start = time.perf_counter()
+            totalDrawn = simulateDraws(deckClass, numGames, drawsPerGame)
+            bestRates[name] = max(bestRates[name], totalDrawn / (time.perf_counter() - start))
+    for name, rate in bestRates.items():
+        print(f"{name}: {rate:,.0f} draws/sec (best of {numRounds} rounds of {totalDrawn} draws)")
+
+
+def benchmarkStateRollouts(seconds: float = 2.0, numPlayers: int = 4, seed: int = 0):
+    """Plays rollouts on clones of the UnoState at the start of a game until
+    seconds have passed. Players play a random playable card, and only draw
+    when they have none, so that games end in a realistic number of moves."""
+    root = UnoState.fromGame(UnoGame(list(range(numPlayers)), None, seed))
+    rng = random.Random(seed)
+    numMoves: int = 0
+    numRollouts: int = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        state = root.clone(rng)
+        while not state.isOver():
+            moves = state.legalMoves()
+            # The last move is drawing, unless a color is being chosen
+            if len(moves) > 1 and moves[-1][0] == "m":
+                moves.pop()
+            state.apply(rng.choice(moves))
+            numMoves += 1
+        numRollouts += 1
+    elapsed = time.perf_counter() - start
+    print(f"UnoState: {numMoves / elapsed:,.0f} moves/sec (legalMoves and apply), "
+          f"{numRollouts / elapsed:,.0f} rollouts/sec")
+
+
+if __name__ == "__main__":
+    logging.getLogger().setLevel(logging.WARNING)
+    benchmarkDeckDraws()
+    benchmarkStateRollouts()
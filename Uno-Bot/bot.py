@@ -1,15 +1,28 @@
 from dotenv import load_dotenv
+from asyncio import Task, create_task
+from discord.webhook.async_ import AsyncWebhookAdapter
 from discord.ui import Button, View
 from typing import Callable, Coroutine
-from asyncio import Lock
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
 import discord
 import os
+import logging
+import time
+
+# Loaded before the project modules, some of which read their settings,
+# such as LOCK_TRACING, from the environment when they are imported
+load_dotenv()
 
 from io_abc import IO
+from computer_player import ComputerPlayerIO, COMPUTER_PLAYER_NAMES, isComputerPlayer, computerDisplayName
+from matchmaking import Matchmaker, partitionPlayers
+from game_store import GameStore
+from player_queue import PlayerQueue
+from tracing import tracer, TracedLock
+from user_resolver import UserResolver
 from game import UnoGame, Player, Card, PlayerMove, Color, Value, MAX_PLAYERS, MIN_PLAYERS, UNO_PENALTY
 
-load_dotenv()
-
 TOKEN =                     os.getenv('TOKEN')
 UNO_SERVER_ID =             int(os.getenv('UNO_SERVER_ID'))
 UNO_CHANNEL_ID =            int(os.getenv('UNO_CHANNEL_ID'))
@@ -17,6 +30,10 @@ UNO_CHANNEL_NAME =          os.getenv('UNO_CHANNEL_NAME')
 LOBBY_CHANNEL_ID =          int(os.getenv('LOBBY_CHANNEL_ID'))
 LOBBY_CHANNEL_NAME =        os.getenv('LOBBY_CHANNEL_NAME')
 ADMIN_ID =                  int(os.getenv('ADMIN_ID'))
+GAME_LOG_DIR =              os.getenv('GAME_LOG_DIR') or "gameLogs"
+MATCHMAKING_DELAY =         float(os.getenv('MATCHMAKING_DELAY') or 30)
+GAME_DB_PATH =              os.getenv('GAME_DB_PATH') or "games.db"
+COMPUTER_MOVE_TIME =        float(os.getenv('COMPUTER_MOVE_TIME') or 2)
 
 intents = discord.Intents.default()
 intents.members = True
@@ -32,15 +49,64 @@ class dClient(discord.Client):
 
 client = dClient()
 tree = discord.app_commands.CommandTree(client)
+userResolver = UserResolver(
+    client, fixedNames = {name: computerDisplayName(name) for name in COMPUTER_PLAYER_NAMES}
+)
+
+
+def traceNetworkCalls():
+    """Makes every Discord API request, including interaction responses, tell
+    the tracer about itself first, so that requests made while holding a
+    TracedLock are flagged."""
+    httpRequest = client.http.request
+
+    async def tracedHttpRequest(route, *args, **kwargs):
+        tracer.networkCall(route.key)
+        return await httpRequest(route, *args, **kwargs)
+
+    webhookRequest = AsyncWebhookAdapter.request
+
+    async def tracedWebhookRequest(adapter, route, *args, **kwargs):
+        tracer.networkCall(route.key)
+        return await webhookRequest(adapter, route, *args, **kwargs)
+
+    client.http.request = tracedHttpRequest
+    AsyncWebhookAdapter.request = tracedWebhookRequest
+
+
+if tracer.enabled:
+    traceNetworkCalls()
+
 EMBED_GAME_COLOR = 0x0000FF
 EMBED_MISC_COLOR = 0x00FF00
 EMBED_ERROR_COLOR = 0xFF0000
 
-playerQueue = []
-playerQueueLock: Lock = Lock()
+playerQueue: PlayerQueue = PlayerQueue()
+playerQueueLock: TracedLock = TracedLock("playerQueueLock")
 """To prevent race conditions, this should be used whenever playerQueue is 
 changed/used."""
 
+games: dict[int, UnoGame] = {}
+"""Games in progress, keyed by the id of the thread that each game is played
+in. Each game's ioManager is the DiscordBotIO for its thread."""
+numGamesStarted: int = 0
+"""Number of games started since the bot logged in, used to name game
+threads."""
+GAME_THREAD_DURATION: int = 1440
+"""Minutes of inactivity after which Discord archives a game thread."""
+startingPlayers: set[int] = set()
+"""Players who have been taken from the queue for a game that is not in games
+yet. Should only be changed while holding playerQueueLock."""
+gameTasks: set[Task] = set()
+"""Tasks running the games in games, kept so that they are not garbage
+collected."""
+gameStore: GameStore = GameStore(GAME_DB_PATH)
+"""Snapshots of the games in games, saved after every turn."""
+computerPlayerExecutor: ProcessPoolExecutor = None
+"""Worker processes that computer players search for their moves in, one per
+CPU. Created when the bot is run, since worker processes import this module
+too under the spawn and forkserver start methods."""
+
 unoCommands = {
     "commands": [LOBBY_CHANNEL_NAME, "View all commands"],
     "rules": [LOBBY_CHANNEL_NAME, "View rules"],
@@ -48,9 +114,9 @@ unoCommands = {
     "joinqueue": [LOBBY_CHANNEL_NAME, "Join the queue"],
     "leavequeue": [LOBBY_CHANNEL_NAME, "Leave the queue"],
     "startgame": [LOBBY_CHANNEL_NAME, "Start a game"],
-    "hand": [UNO_CHANNEL_NAME, "View current hand"],
-    "gamestate": [UNO_CHANNEL_NAME, "View current game state"],
-    "uno": [UNO_CHANNEL_NAME, "Call 'Uno!'"]
+    "hand": [f"game thread in {UNO_CHANNEL_NAME}", "View current hand"],
+    "gamestate": [f"game thread in {UNO_CHANNEL_NAME}", "View current game state"],
+    "uno": [f"game thread in {UNO_CHANNEL_NAME}", "Call 'Uno!'"]
 }
 """All commands currently available for public use. Each is associated with the
 channel that is must be used in and a brief description."""
@@ -58,6 +124,13 @@ channel that is must be used in and a brief description."""
 with open("rules.txt", "r") as file:
     unoRules = file.read()
 
+EMOJI_URL_SIZE: int = 64
+"""Size in pixels of card images shown in embeds."""
+cardEmojis: dict[int, tuple[str, str]] = {}
+"""Expanded emoji and image URL of each card's emoji, keyed by Card.code.
+Built when the bot is ready and rebuilt whenever the server's emojis change,
+so that rendering cards does not search the server's emojis."""
+
 def convertCardToEmojiName(card: Card, addColons: bool = False) -> str:
     """Converts a card to its corresponding emoji name."""
     s = f"{card.color.name}_{card.value.name}"
@@ -66,22 +139,41 @@ def convertCardToEmojiName(card: Card, addColons: bool = False) -> str:
     return s
 
 
-def convertEmojiNameToExpandedEmoji(emojiName: str) -> str:
-    """Converts a emoji to its expanded emoji format: <:EMOJI_NAME:EMOJI_ID>"""
-    emojiId = discord.utils.get(UNO_SERVER.emojis, name = emojiName).id
-    return f"<:{emojiName}:{emojiId}>"
+def buildCardEmojis(emojis: list[discord.Emoji]):
+    """Rebuilds cardEmojis from the emojis of the Uno server. Emojis are
+    matched to cards by name, in the format given by convertCardToEmojiName."""
+    global cardEmojis
+    newCardEmojis: dict[int, tuple[str, str]] = {}
+    for emoji in emojis:
+        try:
+            colorName, valueName = emoji.name.split("_")
+            card = Card(Color[colorName], Value[valueName])
+        except (ValueError, KeyError):
+            continue
+        newCardEmojis[card.code] = (
+            f"<:{emoji.name}:{emoji.id}>",
+            f"https://cdn.discordapp.com/emojis/{emoji.id}.png?size={EMOJI_URL_SIZE}"
+        )
+    cardEmojis = newCardEmojis
 
 
 def convertCardToExpandedEmoji(card: Card) -> str:
     """Converts a card to its expanded emoji format: <:EMOJI_NAME:EMOJI_ID>"""
-    emojiName = convertCardToEmojiName(card)
-    return convertEmojiNameToExpandedEmoji(emojiName)
+    return cardEmojis[card.code][0]
 
 
-def convertEmojiNameToEmojiURL(emojiName: str, size: int = 64) -> str:
-    """Converts an emoji name (without colons) to its corresponding URL image."""
-    emojiId: int = discord.utils.get(UNO_SERVER.emojis, name = emojiName).id
-    return f"https://cdn.discordapp.com/emojis/{str(emojiId)}.png?size={str(size)}"
+def convertCardToEmojiURL(card: Card) -> str:
+    """Converts a card to the URL of its emoji's image."""
+    return cardEmojis[card.code][1]
+
+
+def newGameLogPath(gameThreadId: int) -> str:
+    """
+    :returns: Path of a new file in GAME_LOG_DIR for the game played in the
+        given thread to write its log to. Logs can be replayed with
+        replay.py."""
+    os.makedirs(GAME_LOG_DIR, exist_ok = True)
+    return os.path.join(GAME_LOG_DIR, f"uno-{time.strftime('%Y%m%d-%H%M%S')}-{gameThreadId}.jsonl")
 
 
 def getDefaultGameEmbed(title: str, description: str = None) -> discord.Embed:
@@ -178,28 +270,34 @@ class ConfirmationButtons:
 
 class DiscordBotIO(IO):
     """Defines I/O methods for Uno that is played in Discord."""
+    def __init__(self, channel: discord.abc.Messageable):
+        """
+        :param channel: Channel or thread that the game is played in. Only
+            input given in it is accepted."""
+        self.channel: discord.abc.Messageable = channel
+
     async def displayMessage(self, message: str):
-        await UNO_CHANNEL.send(embed = getDefaultGameEmbed(message))
+        await self.channel.send(embed = getDefaultGameEmbed(message))
 
     async def displayError(self, message: str):
-        await UNO_CHANNEL.send(embed = getDefaultErrorEmbed(message))
+        await self.channel.send(embed = getDefaultErrorEmbed(message))
 
     async def displayStatus(self, message: str):
-        await UNO_CHANNEL.send(embed = getDefaultMiscEmbed(message))
+        await self.channel.send(embed = getDefaultMiscEmbed(message))
 
     async def displayEmbed(self, embed: discord.Embed, view: View = None):
         if view:
-            await UNO_CHANNEL.send(embed = embed, view = view)
+            await self.channel.send(embed = embed, view = view)
         else:
-            await UNO_CHANNEL.send(embed = embed)
+            await self.channel.send(embed = embed)
 
     async def getInput(self, player: Player = None) -> str:
         def check(message: discord.Message):
-            return message.author.id == player.name
+            return message.author.id == player.name and message.channel.id == self.channel.id
         msg: discord.Message = await client.wait_for("message", check = check)
         return msg.content
 
-    async def getPlayerInput(self, player: Player, topDiscard: Card, numDraw) -> (PlayerMove, int):
+    async def getPlayerInput(self, player: Player, topDiscard: Card, numDraw, discardColor: Color) -> (PlayerMove, int):
         """Input for what a player wants to do on a turn.
 
         HANDLES INVALID INPUT - DOES NOT THROW ERROR."""
@@ -207,21 +305,21 @@ class DiscordBotIO(IO):
         command: int
         n: int = 0
 
-        p = await client.fetch_user(player.name)
+        displayName = await userResolver.displayName(player.name)
         embedPlayerInput = discord.Embed(
-            title = f"{p.display_name}, it is your turn.",
+            title = f"{displayName}, it is your turn.",
             description = "Select the move you would like to make. The current top card is:",
             color = EMBED_GAME_COLOR
         )
-        embedPlayerInput.set_image(url = convertEmojiNameToEmojiURL(convertCardToEmojiName(topDiscard)))
+        embedPlayerInput.set_image(url = convertCardToEmojiURL(topDiscard))
         footer: str = ""
         cardValue: str = "+2" if topDiscard.value is Value.drawTwo else "+4"
         if numDraw:
             footer += "This card is active, meaning that you can only chain cards"
             footer += f" of the same value ({cardValue}), or you will draw "
             footer += f"{numDraw} cards if you choose to draw this turn."
-        elif topDiscard.color is Color.black:
-            footer += f"The chosen color of this card is {topDiscard.discardColor.name}."
+        elif topDiscard.isBlack:
+            footer += f"The chosen color of this card is {discardColor.name}."
 
         if footer:
             embedPlayerInput.set_footer(
@@ -269,24 +367,18 @@ class DiscordBotIO(IO):
                 try:
                     chosenCard = (chosenCard.split(":"))[1]
                     chosenColor, chosenValue = chosenCard.split("_")
-                    cardInHand: bool = False
-                    m: int = 0
-                    for card in player.hand:
-                        if card.correctColorValue(chosenColor, chosenValue):
-                            cardInHand = True
-                            break
-                        m += 1
-                    if not cardInHand:
+                    card = Card(Color[chosenColor], Value[chosenValue])
+                    if not player.hasCard(card):
                         await self.displayEmbed(
                             embed = getDefaultErrorEmbed("The card that you selected was not in your hand.")
                         )
                         await resetButtonsAndAskAgain()
                     else:
                         command = 0
-                        n = m
+                        n = player.indexOf(card)
                         s = "Are you sure you want to play the following card:"
                         await self.displayEmbed(
-                            confirmationButtons.makeConfirmationEmbed(s, convertEmojiNameToEmojiURL(chosenCard)),
+                            confirmationButtons.makeConfirmationEmbed(s, convertCardToEmojiURL(card)),
                             confirmationButtons.getConfirmationView()
                         )
                 except:
@@ -323,7 +415,7 @@ class DiscordBotIO(IO):
 
         # Only continue after the confirm button has been pressed
         def confirmButtonPressedCheck(interaction: discord.Interaction):
-            if interaction.user.id != player.name:
+            if interaction.user.id != player.name or interaction.channel_id != self.channel.id:
                 return False
             try:
                 return interaction.data["custom_id"] == "confirmButton"
@@ -341,9 +433,9 @@ class DiscordBotIO(IO):
 
         c: Color = None
 
-        p = await client.fetch_user(player.name)
+        displayName = await userResolver.displayName(player.name)
         embedChooseColor = discord.Embed(
-            title = f"{p.display_name}, what color would you like to choose?",
+            title = f"{displayName}, what color would you like to choose?",
             color = EMBED_GAME_COLOR
         )
 
@@ -429,7 +521,7 @@ class DiscordBotIO(IO):
         await self.displayEmbed(embed = embedChooseColor, view = chooseColorView)
 
         def confirmButtonPressedCheck(interaction: discord.Interaction):
-            if interaction.user.id != player.name:
+            if interaction.user.id != player.name or interaction.channel_id != self.channel.id:
                 return False
             try:
                 return interaction.data["custom_id"] == "confirmButton"
@@ -447,20 +539,20 @@ class DiscordBotIO(IO):
             await self.displayError("No cards remaining in deck.")
             embedDescription = "There are no valid cards remaining in the deck."
 
-        player = await client.fetch_user(playerName)
+        displayName = await userResolver.displayName(playerName)
         embed = discord.Embed(
-            title = f"{player.display_name}, you have drawn {totalDrawn} card(s).",
+            title = f"{displayName}, you have drawn {totalDrawn} card(s).",
             description = embedDescription,
             color = EMBED_GAME_COLOR
         )
         if validCard:
-            embed.set_image(url = convertEmojiNameToEmojiURL(convertCardToEmojiName(validCard)))
+            embed.set_image(url = convertCardToEmojiURL(validCard))
         await self.displayEmbed(embed)
 
     async def playerWon(self, player: Player):
-        p = await client.fetch_user(player.name)
+        displayName = await userResolver.displayName(player.name)
         await self.displayEmbed(
-            embed = getDefaultGameEmbed(f"{p.display_name} has just won the game!")
+            embed = getDefaultGameEmbed(f"{displayName} has just won the game!")
         )
 
 
@@ -474,17 +566,25 @@ async def on_ready():
     UNO_SERVER = client.get_guild(UNO_SERVER_ID)
     UNO_CHANNEL = client.get_channel(UNO_CHANNEL_ID)
     LOBBY_CHANNEL = client.get_channel(LOBBY_CHANNEL_ID)
+    userResolver.guild = UNO_SERVER
+    buildCardEmojis(UNO_SERVER.emojis)
 
     if not client.synced:
         await tree.sync(guild = discord.Object(id = UNO_SERVER_ID))
         client.synced = True
 
-    global currentGame
-    currentGame = None
+    await resumeGames()
+    matchmaker.start()
 
     print(f"Uno Bot has logged in.")
 
 
+@client.event
+async def on_guild_emojis_update(guild: discord.Guild, before, after):
+    if guild.id == UNO_SERVER_ID:
+        buildCardEmojis(after)
+
+
 @client.event
 async def on_message(message):
     if message.author == client.user:
@@ -520,129 +620,234 @@ async def usedInAcceptedChannel(interaction: discord.Interaction,
     return True
 
 
+async def getChannelGame(interaction: discord.Interaction) -> UnoGame:
+    """Call within a slash command. Responds to interaction if there is no
+    game in progress in the channel or thread that it is called from.
+
+    :returns: The game played where the interaction was called from, or None
+        if there is not one."""
+    game = games.get(interaction.channel_id)
+    if game is None:
+        await interaction.response.send_message(
+            embed = getDefaultErrorEmbed(
+                f"This command can only be used in the thread of an active game in the `{UNO_CHANNEL_NAME}` channel."
+            ),
+            ephemeral = True
+        )
+    return game
+
+
+async def isInGame(player: int) -> bool:
+    """
+    :returns: Whether player is in any game in progress or about to start."""
+    if player in startingPlayers:
+        return True
+    for game in list(games.values()):
+        await game.acquirePlayerLock("Checking if player %s is in the game.", player)
+        inGame = player in game.playerNames
+        game.releasePlayerLock("Finished checking if player %s is in the game.", player)
+        if inGame:
+            return True
+    return False
+
+
 @tree.command(name = "hand", description = "Shows current hand.", guild = discord.Object(id = UNO_SERVER_ID))
 async def self(interaction: discord.Interaction):
-    global currentGame
-    if await usedInAcceptedChannel(interaction, UNO_CHANNEL_ID, UNO_CHANNEL_NAME):
+    game = await getChannelGame(interaction)
+    if game:
         player: int = interaction.user.id
-        if currentGame:
-            await currentGame.acquirePlayerLock(f"Viewing player {player}'s hand.")
-            try:
-                s: str = "   "
-                hand: list[Card] = currentGame.getPlayerHand(player)
-                for card in hand:
-                    s += convertCardToExpandedEmoji(card) + "   "
-                await interaction.response.send_message(s, ephemeral = True)
-            except Exception as e:
-                await interaction.response.send_message(
-                    embed = getDefaultErrorEmbed("There is not an active game/you aren't in the active game."),
-                    ephemeral = True
-                )
-            finally:
-                currentGame.releasePlayerLock(f"Finished viewing player {player}'s hand")
-        else:
+        await game.acquirePlayerLock("Viewing player %s's hand.", player)
+        try:
+            s: str = "   "
+            hand: list[Card] = game.getPlayerHand(player)
+            for card in hand:
+                s += convertCardToExpandedEmoji(card) + "   "
+            await interaction.response.send_message(s, ephemeral = True)
+        except Exception as e:
             await interaction.response.send_message(
-                embed = getDefaultErrorEmbed("There is not an active game/you aren't in the active game."),
+                embed = getDefaultErrorEmbed("You aren't in this game."),
                 ephemeral = True
             )
+        finally:
+            game.releasePlayerLock("Finished viewing player %s's hand", player)
 
 
 @tree.command(name = "gamestate", description = "Shows the number of cards in each player's hand.", guild = discord.Object(id = UNO_SERVER_ID))
 async def self(interaction: discord.Interaction):
-    global currentGame
-    if await usedInAcceptedChannel(interaction, UNO_CHANNEL_ID, UNO_CHANNEL_NAME):
-        if currentGame:
-            await currentGame.acquirePlayerLock("Viewing cards in each player's hands.")
-            players: str = ""
-            numCards: str = ""
-            for player in currentGame.players:
-                p = await client.fetch_user(player.name)
-                players += p.display_name + "\n"
-                numCards += str(player.handSize()) + "\n"
-            currentGame.releasePlayerLock("Finished viewing cards in each player's hands.")
-
-            turnOrder: int = currentGame.turnOrder
-            arrowEmojiName: str
-            if turnOrder == 1:
-                arrowEmojiName = ":arrow_down:"
-            else:
-                arrowEmojiName = ":arrow_up:"
-
-            embedGameState = discord.Embed(
-                title = "Current Game State",
-                color = EMBED_MISC_COLOR
-            )
-            embedGameState.add_field(name = "Player Name", value = players, inline = True)
-            embedGameState.add_field(name = "Number of Cards", value = numCards, inline = True)
-            embedGameState.add_field(name = "Turn Order", value = arrowEmojiName, inline = True)
-            await interaction.response.send_message(embed = embedGameState)
+    game = await getChannelGame(interaction)
+    if game:
+        await game.acquirePlayerLock("Viewing cards in each player's hands.")
+        playerNames: list[int] = [player.name for player in game.players]
+        numCards: str = ""
+        for player in game.players:
+            numCards += str(player.handSize()) + "\n"
+        game.releasePlayerLock("Finished viewing cards in each player's hands.")
+        players: str = "\n".join(await userResolver.displayNames(playerNames)) + "\n"
+
+        turnOrder: int = game.turnOrder
+        arrowEmojiName: str
+        if turnOrder == 1:
+            arrowEmojiName = ":arrow_down:"
         else:
-            await interaction.response.send_message(
-                embed = getDefaultErrorEmbed("There is not an active game.")
-            )
+            arrowEmojiName = ":arrow_up:"
+
+        embedGameState = discord.Embed(
+            title = "Current Game State",
+            color = EMBED_MISC_COLOR
+        )
+        embedGameState.add_field(name = "Player Name", value = players, inline = True)
+        embedGameState.add_field(name = "Number of Cards", value = numCards, inline = True)
+        embedGameState.add_field(name = "Turn Order", value = arrowEmojiName, inline = True)
+        await interaction.response.send_message(embed = embedGameState)
 
 
-@tree.command(name = "startgame", description = "Starts the Uno game.", guild = discord.Object(id = UNO_SERVER_ID))
+def newGameIO(gameThread: discord.Thread) -> ComputerPlayerIO:
+    """
+    :returns: IO for a game in gameThread, which makes the moves of any
+        computer players in the game. Its game has to be set once the game
+        has been created."""
+    return ComputerPlayerIO(DiscordBotIO(gameThread), COMPUTER_MOVE_TIME, computerPlayerExecutor)
+
+
+async def runGame(players: list[int]):
+    """Plays a game with the given players, which have been added to
+    startingPlayers, in a new thread of the game channel."""
+    global numGamesStarted
+    numGamesStarted += 1
+    try:
+        gameThread: discord.Thread = await UNO_CHANNEL.create_thread(
+            name = f"Uno game {numGamesStarted}",
+            type = discord.ChannelType.public_thread,
+            auto_archive_duration = GAME_THREAD_DURATION
+        )
+        await LOBBY_CHANNEL.send(embed = getDefaultMiscEmbed(
+            f"Starting Uno game with {len(players)} players in {gameThread.mention}."
+        ))
+        # Mentioning the players adds them to the thread
+        await gameThread.send(" ".join(f"<@{player}>" for player in players if not isComputerPlayer(player)))
+        ioManager = newGameIO(gameThread)
+        game = UnoGame(players, ioManager, logFile = newGameLogPath(gameThread.id))
+        ioManager.game = game
+        games[gameThread.id] = game
+    finally:
+        async with playerQueueLock:
+            startingPlayers.difference_update(players)
+    await playGame(gameThread.id, game)
+
+
+async def playGame(gameThreadId: int, game: UnoGame):
+    """Plays game, which has been added to games, to the end, saving it to
+    gameStore after every turn. If the bot shuts down and cancels the game,
+    the game stays saved so that it is resumed when the bot restarts."""
+    try:
+        await gameStore.save(gameThreadId, game)
+        await game.startGame(lambda: gameStore.save(gameThreadId, game))
+        await gameStore.delete(gameThreadId)
+    except Exception:
+        await gameStore.delete(gameThreadId)
+        raise
+    finally:
+        del games[gameThreadId]
+
+
+def startGameTask(gameCoroutine: Coroutine):
+    """Runs a game in the background, keeping a reference to it in
+    gameTasks."""
+    task = create_task(gameCoroutine)
+    gameTasks.add(task)
+    task.add_done_callback(gameTasks.discard)
+
+
+async def resumeGames():
+    """Resumes the games in gameStore, which were in progress when the bot
+    last stopped, from the start of the turn that was interrupted."""
+    for gameThreadId, state in await gameStore.loadAll():
+        if gameThreadId in games:
+            continue
+        try:
+            gameThread = client.get_channel(gameThreadId) or await client.fetch_channel(gameThreadId)
+            await gameThread.send(embed = getDefaultMiscEmbed(
+                "The bot has restarted, so this game has been resumed from the start of the current turn."
+            ))
+        except discord.DiscordException:
+            logging.exception("Unable to resume the game in thread %s.", gameThreadId)
+            await gameStore.delete(gameThreadId)
+            continue
+        ioManager = newGameIO(gameThread)
+        game = UnoGame.fromState(state, ioManager)
+        ioManager.game = game
+        games[gameThreadId] = game
+        startGameTask(playGame(gameThreadId, game))
+
+
+async def startQueuedGames(fillWithComputers: bool = False) -> list[int]:
+    """Takes as many players as possible from the front of the queue and
+    starts games for them, split by partitionPlayers.
+
+    :param fillWithComputers: If there are too few players in the queue for a
+        game, start one anyway with computer players in the empty seats.
+    :returns: Number of players in each game that was started, including
+        computer players."""
+    async with playerQueueLock:
+        gameSizes: list[int] = partitionPlayers(len(playerQueue), MIN_PLAYERS, MAX_PLAYERS)
+        if not gameSizes and fillWithComputers and len(playerQueue):
+            gameSizes = [len(playerQueue)]
+        gamePlayers: list[list[int]] = []
+        for gameSize in gameSizes:
+            gamePlayers.append(list(playerQueue.popFront(gameSize)))
+            startingPlayers.update(gamePlayers[-1])
+    for players in gamePlayers:
+        if fillWithComputers:
+            players += COMPUTER_PLAYER_NAMES[:max(0, MIN_PLAYERS - len(players))]
+        startGameTask(runGame(players))
+    return [len(players) for players in gamePlayers]
+
+
+matchmaker: Matchmaker = Matchmaker(startQueuedGames, MATCHMAKING_DELAY)
+"""Starts games MATCHMAKING_DELAY seconds after players join the queue."""
+
+
+@tree.command(name = "startgame", description = "Starts Uno games for the players in queue.", guild = discord.Object(id = UNO_SERVER_ID))
 async def self(interaction: discord.Interaction):
-    global currentGame
-    global playerQueue
     if await usedInAcceptedChannel(interaction, LOBBY_CHANNEL_ID, LOBBY_CHANNEL_NAME):
-        if not currentGame:
-            await playerQueueLock.acquire()
-            if len(playerQueue) < MIN_PLAYERS:
-                errorMessage = f"Unable to start game. {len(playerQueue)} out of a "
-                errorMessage += f"minimum of {MIN_PLAYERS} players are in queue."
-                await interaction.response.send_message(
-                    embed = getDefaultErrorEmbed(errorMessage)
-                )
-                playerQueueLock.release()
-                return
-            frontQueue: list[int] = playerQueue[:MAX_PLAYERS]
+        gameSizes = await startQueuedGames(fillWithComputers = True)
+        if not gameSizes:
+            errorMessage = "Unable to start game. There are no players in queue."
             await interaction.response.send_message(
-                embed = getDefaultMiscEmbed(
-                    f"Starting Uno game with {len(frontQueue)} players.",
-                    f"The maximum number of players in a game is {MAX_PLAYERS}."
-                )
+                embed = getDefaultErrorEmbed(errorMessage)
             )
-            currentGame = UnoGame(playerQueue[:MAX_PLAYERS], DiscordBotIO())
-            playerQueue = playerQueue[MAX_PLAYERS:]
-            playerQueueLock.release()
-            await currentGame.startGame()
-            currentGame = None
-        else:
-            await interaction.response.send_message(
-                embed = getDefaultErrorEmbed("There is already a game in progress.")
+            return
+        await interaction.response.send_message(
+            embed = getDefaultMiscEmbed(
+                f"Starting {len(gameSizes)} Uno game(s) with {', '.join(map(str, gameSizes))} players.",
+                f"The maximum number of players in a game is {MAX_PLAYERS}."
             )
+        )
 
 
 @tree.command(name = "joinqueue", description = "Joins queue for Uno.", guild = discord.Object(id = UNO_SERVER_ID))
 async def self(interaction: discord.Interaction):
-    global currentGame
-    global playerQueue
     if await usedInAcceptedChannel(interaction, LOBBY_CHANNEL_ID, LOBBY_CHANNEL_NAME):
         async with playerQueueLock:
             player = interaction.user.id
 
-            # Check that the user isn't in the current game.
-            if currentGame:
-                await currentGame.acquirePlayerLock(f"Checking if player {player} is in the current game.")
-                if player in currentGame.playerNames:
-                    await interaction.response.send_message(
-                        embed = getDefaultErrorEmbed("You are already in the active game.")
-                    )
-                    currentGame.releasePlayerLock(f"Finished checking if player {player} is in the current game.")
-                    return
-                currentGame.releasePlayerLock(f"Finished checking if player {player} is in the current game.")
+            # Check that the user isn't in a game in progress.
+            if await isInGame(player):
+                await interaction.response.send_message(
+                    embed = getDefaultErrorEmbed("You are already in an active game.")
+                )
+                return
 
-            if player in playerQueue:
+            if not playerQueue.join(player, interaction.user.display_name):
                 await interaction.response.send_message(
                     embed = getDefaultErrorEmbed("You are already in the queue.")
                 )
             else:
-                playerQueue.append(player)
+                matchmaker.notify()
                 embedQueue = discord.Embed(
                     title = "You have been added to the queue for the next game of Uno.",
-                    description = "Use `/queue` to view your position in queue.\nUse `/leavequeue` to leave the queue.",
+                    description = f"You are number {playerQueue.position(player) + 1} in queue.\n"
+                                  "Use `/queue` to view the queue.\nUse `/leavequeue` to leave the queue.",
                     color = EMBED_MISC_COLOR
                 )
                 await interaction.response.send_message(
@@ -652,12 +857,10 @@ async def self(interaction: discord.Interaction):
 
 @tree.command(name = "leavequeue", description = "Leaves queue for Uno.", guild = discord.Object(id = UNO_SERVER_ID))
 async def self(interaction: discord.Interaction):
-    global playerQueue
     if await usedInAcceptedChannel(interaction, LOBBY_CHANNEL_ID, LOBBY_CHANNEL_NAME):
         async with playerQueueLock:
             player = interaction.user.id
-            if player in playerQueue:
-                playerQueue.remove(player)
+            if playerQueue.leave(player):
                 await interaction.response.send_message(
                     embed = getDefaultMiscEmbed("You have been removed from the queue for Uno.")
                 )
@@ -669,70 +872,78 @@ async def self(interaction: discord.Interaction):
 
 @tree.command(name = "queue", description = "View current queue for Uno.", guild = discord.Object(id = UNO_SERVER_ID))
 async def self(interaction: discord.Interaction):
-    global playerQueue
     if await usedInAcceptedChannel(interaction, LOBBY_CHANNEL_ID, LOBBY_CHANNEL_NAME):
         async with playerQueueLock:
-            players: str = ""
-            for player in playerQueue:
-                p = await client.fetch_user(player)
-                players += p.display_name + "\n"
-
-            if not players:
-                players = "There are no players in queue currently."
-
-            embedQueue = discord.Embed(
-                title = "Queue for Uno (in order)",
-                description = players,
-                color = EMBED_MISC_COLOR
-            )
-            await interaction.response.send_message(
-                embed = embedQueue
-            )
+            players: str = "\n".join(playerQueue.displayNames())
 
+        if not players:
+            players = "There are no players in queue currently."
 
-@tree.command(name = "uno", description = "Calls 'Uno!' in the current game of Uno.", guild = discord.Object(id = UNO_SERVER_ID))
+        embedQueue = discord.Embed(
+            title = "Queue for Uno (in order)",
+            description = players,
+            color = EMBED_MISC_COLOR
+        )
+        await interaction.response.send_message(
+            embed = embedQueue
+        )
+
+
+@tree.command(name = "uno", description = "Calls 'Uno!' in the game of Uno in this thread.", guild = discord.Object(id = UNO_SERVER_ID))
 async def self(interaction: discord.Interaction):
-    global currentGame
-    if await usedInAcceptedChannel(interaction, UNO_CHANNEL_ID, UNO_CHANNEL_NAME):
-        if currentGame:
-            curPlayerId = interaction.user.id
-            curPlayer = await client.fetch_user(curPlayerId)
-            curPlayerDisplayName = curPlayer.display_name
-            response, playerNames = await currentGame.playerCallUno(curPlayerId)
-            embedResponse: discord.Embed
-            if response == 0:
-                await interaction.response.send_message(
-                    embed = getDefaultErrorEmbed("You cannot call Uno if you are not in the current game"),
-                    ephemeral = True
-                )
-                return
-            elif response == 1:
-                s = f"{curPlayerDisplayName}, you are now safe from Uno calls."
-                embedResponse = getDefaultGameEmbed(s)
-            elif response == 2:
-                s = "There are no players with one card that have not called Uno."
-                s2 = "Because the zprevious player had one card, you do not need to draw cards."
-                embedResponse = getDefaultGameEmbed(s, s2)
-            elif response == 3:
-                s = "There are no players with one card that have not called Uno."
-                s2 = "Because the previous player did not have one card, you will "
-                s2 += f"be penalized. {UNO_PENALTY} cards have been drawn for you."
-                embedResponse = getDefaultGameEmbed(s, s2)
-            else:
-                s = "There are players with one card that have not yet called Uno."
-                s2 = f"The following players have been penalized and {UNO_PENALTY} "
-                s2 += "cards have been drawn for each of them: "
-                for playerName in playerNames:
-                    p = await client.fetch_user(playerName)
-                    s2 += f"{p.display_name}, "
-                embedResponse = getDefaultGameEmbed(s, s2[:-2])
+    game = await getChannelGame(interaction)
+    if game:
+        curPlayerId = interaction.user.id
+        curPlayerDisplayName = await userResolver.displayName(curPlayerId)
+        response, playerNames = await game.playerCallUno(curPlayerId)
+        embedResponse: discord.Embed
+        if response == 0:
             await interaction.response.send_message(
-                embed = embedResponse
+                embed = getDefaultErrorEmbed("You cannot call Uno if you are not in this game"),
+                ephemeral = True
             )
+            return
+        elif response == 1:
+            s = f"{curPlayerDisplayName}, you are now safe from Uno calls."
+            embedResponse = getDefaultGameEmbed(s)
+        elif response == 2:
+            s = "There are no players with one card that have not called Uno."
+            s2 = "Because the zprevious player had one card, you do not need to draw cards."
+            embedResponse = getDefaultGameEmbed(s, s2)
+        elif response == 3:
+            s = "There are no players with one card that have not called Uno."
+            s2 = "Because the previous player did not have one card, you will "
+            s2 += f"be penalized. {UNO_PENALTY} cards have been drawn for you."
+            embedResponse = getDefaultGameEmbed(s, s2)
         else:
-            await interaction.response.send_message(
-                embed = getDefaultErrorEmbed("There is no active game.")
-            )
+            s = "There are players with one card that have not yet called Uno."
+            s2 = f"The following players have been penalized and {UNO_PENALTY} "
+            s2 += "cards have been drawn for each of them: "
+            s2 += ", ".join(await userResolver.displayNames(playerNames))
+            embedResponse = getDefaultGameEmbed(s, s2)
+        await interaction.response.send_message(
+            embed = embedResponse
+        )
+
+
+@tree.command(name = "locks", description = "Shows lock contention, hold times and recent lock events.", guild = discord.Object(id = UNO_SERVER_ID))
+async def self(interaction: discord.Interaction):
+    if interaction.user.id != ADMIN_ID:
+        await interaction.response.send_message(
+            embed = getDefaultErrorEmbed("Only the admin can use this command."),
+            ephemeral = True
+        )
+        return
+    # Discord messages are limited to 2000 characters, so the full list of
+    # events is attached as a file.
+    await interaction.response.send_message(
+        f"```\n{tracer.contentionReport()[:1900]}```",
+        file = discord.File(
+            BytesIO((tracer.holdTimeReport() + "\n" + tracer.contentionReport() + "\n" + tracer.dump()).encode()),
+            filename = "locks.txt"
+        ),
+        ephemeral = True
+    )
 
 
 @tree.command(name = "commands", description = "Lists all commands.", guild = discord.Object(id = UNO_SERVER_ID))
@@ -760,4 +971,6 @@ async def self(interaction: discord.Interaction):
         )
 
 
-client.run(TOKEN)
+if __name__ == "__main__":
+    computerPlayerExecutor = ProcessPoolExecutor()
+    client.run(TOKEN)
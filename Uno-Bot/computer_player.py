@@ -0,0 +1,215 @@
+from asyncio import get_running_loop
+from concurrent.futures import Executor
+import random
+import time
+
+from io_abc import IO
+from game import UnoGame, Player, Card, Color, PlayerMove, MAX_PLAYERS
+from state import UnoState, COLORS, DRAW_CARD
+
+COMPUTER_PLAYER_NAMES: list[int] = list(range(1, MAX_PLAYERS + 1))
+"""Names of computer players. Discord user ids are far larger than these, so
+they never clash with a real player."""
+MOVE_TIME: float = 2
+"""Default seconds that a computer player spends searching for each move."""
+MAX_ROLLOUT_MOVES: int = 400
+"""Moves after which a rollout is abandoned and counted as a loss."""
+
+
+def isComputerPlayer(playerName: int) -> bool:
+    return 0 < playerName <= MAX_PLAYERS
+
+
+def computerDisplayName(playerName: int) -> str:
+    return f"Computer {playerName}"
+
+
+def determinize(state: UnoState, playerName: int, rng: random.Random) -> UnoState:
+    """Deals the cards that playerName cannot see at random, keeping the size
+    of every hand and of the deck.
+
+    :returns: A clone of state, as it could be from the point of view of
+        playerName."""
+    state = state.clone(rng)
+    unseen: list[Card] = list(state.deck)
+    for i, hand in enumerate(state.hands):
+        if state.playerNames[i] != playerName:
+            unseen += hand
+    rng.shuffle(unseen)
+    for i, hand in enumerate(state.hands):
+        if state.playerNames[i] != playerName:
+            state.hands[i] = unseen[-len(hand):]
+            del unseen[-len(hand):]
+    state.deck = unseen
+    return state
+
+
+def mostCommonColor(hand: list[Card], rng: random.Random) -> Color:
+    """
+    :returns: The color that hand has the most non-black cards of, or a random
+        color if it has none."""
+    counts: dict[Color, int] = {}
+    for card in hand:
+        if not card.isBlack:
+            counts[card.color] = counts.get(card.color, 0) + 1
+    return max(counts, key = counts.get) if counts else rng.choice(COLORS)
+
+
+def rollout(state: UnoState, playerName: int, rng: random.Random) -> int:
+    """Plays state to the end with a fast default policy: play a random
+    playable card, draw only when there are none, and choose the most common
+    color in hand.
+
+    :returns: 1 if playerName wins, otherwise 0."""
+    for _ in range(MAX_ROLLOUT_MOVES):
+        if state.winner is not None:
+            return int(state.winner == playerName)
+        if state.pendingCard:
+            move = ("c", state.currentPlayer(), mostCommonColor(state.hands[state.nextPlayer], rng).value)
+        else:
+            moves = state.legalMoves()
+            # Drawing is always the last move
+            move = rng.choice(moves[:-1]) if len(moves) > 1 else moves[0]
+        state.apply(move)
+    return int(state.winner == playerName)
+
+
+def candidateMoves(state: UnoState) -> list[tuple[tuple, ...]]:
+    """Drawing is only a candidate when no card can be played, since drawing
+    anyway is almost never better and searching it wastes rollouts.
+
+    :returns: Every choice that the current player can make, as the moves to
+        apply for it. Playing a black card is paired with each color, so that
+        the color is searched along with the card."""
+    candidates: list[tuple[tuple, ...]] = []
+    playerName: int = state.currentPlayer()
+    hand: list[Card] = state.hands[state.nextPlayer]
+    moves: list[tuple] = state.legalMoves()
+    if len(moves) > 1:
+        # Drawing is always the last move
+        moves.pop()
+    for move in moves:
+        if move[2] != DRAW_CARD and hand[move[3]].isBlack:
+            candidates += [(move, ("c", playerName, color.value)) for color in COLORS]
+        else:
+            candidates.append((move,))
+    return candidates
+
+
+def searchMove(state: UnoState, candidates: list[tuple[tuple, ...]], moveTime: float, seed: int) -> tuple[tuple, ...]:
+    """Determinized Monte Carlo search: deals the unseen cards at random, plays
+    every candidate on a clone of the deal followed by a rollout, and repeats
+    with new deals until moveTime seconds have passed. Comparing candidates on
+    the same deals cuts the rollouts needed to tell them apart. Runs in a
+    worker, so it takes and returns only picklable values.
+
+    :returns: The candidate that won the largest share of its rollouts."""
+    if len(candidates) == 1:
+        return candidates[0]
+    rng = random.Random(seed)
+    playerName: int = state.currentPlayer()
+    wins: list[int] = [0] * len(candidates)
+    deadline: float = time.perf_counter() + moveTime
+    numRounds: int = 0
+    while not numRounds or time.perf_counter() < deadline:
+        deal = determinize(state, playerName, rng)
+        for i, candidate in enumerate(candidates):
+            determinized = deal.clone(rng)
+            for move in candidate:
+                determinized.apply(move)
+            wins[i] += rollout(determinized, playerName, rng)
+        numRounds += 1
+    return candidates[max(range(len(candidates)), key = wins.__getitem__)]
+
+
+class ComputerPlayerIO(IO):
+    """Passes all I/O through to another IO, except for the decisions of
+    computer players, which are searched for in executor so that the event
+    loop is never blocked. Computer players also call 'Uno!' for themselves.
+
+    game has to be set once the game has been created."""
+    def __init__(self, ioManager: IO, moveTime: float = MOVE_TIME, executor: Executor = None):
+        """
+        :param moveTime: Seconds that a computer player searches for each
+            decision.
+        :param executor: Pool that searches run in. Defaults to the event
+            loop's default thread pool, but a process pool lets searches from
+            several games run in parallel."""
+        self.ioManager: IO = ioManager
+        self.moveTime: float = moveTime
+        self.executor: Executor = executor
+        self.game: UnoGame = None
+        self.rng: random.Random = random.Random()
+        self.chosenColor: Color = None
+        """Color that was searched for along with the black card that a
+        computer player has just played."""
+        self.drawnCard: Card = None
+        """Card that a computer player has just drawn and is playing."""
+        self.unoCaller: int = None
+        """Computer player who has just played their second last card and
+        calls 'Uno!' once the move has been made."""
+
+    async def search(self, state: UnoState, candidates: list[tuple[tuple, ...]]) -> tuple[tuple, ...]:
+        return await get_running_loop().run_in_executor(
+            self.executor, searchMove, state, candidates, self.moveTime, self.rng.getrandbits(64)
+        )
+
+    async def callUno(self):
+        """Calls 'Uno!' for a computer player whose move has been made."""
+        if self.unoCaller is not None:
+            playerName, self.unoCaller = self.unoCaller, None
+            await self.game.playerCallUno(playerName)
+            await self.ioManager.displayStatus(f"{computerDisplayName(playerName)} called 'Uno!'.")
+
+    async def displayMessage(self, message: str):
+        await self.ioManager.displayMessage(message)
+
+    async def displayError(self, message: str):
+        await self.ioManager.displayError(message)
+
+    async def displayStatus(self, message: str):
+        await self.ioManager.displayStatus(message)
+
+    async def getInput(self, player: Player = None) -> str:
+        return await self.ioManager.getInput(player)
+
+    async def getPlayerInput(self, player: Player, topDiscard: Card, numDraw, discardColor: Color) -> (PlayerMove, int):
+        await self.callUno()
+        if not isComputerPlayer(player.name):
+            return await self.ioManager.getPlayerInput(player, topDiscard, numDraw, discardColor)
+        state = UnoState.fromGame(self.game)
+        moves = await self.search(state, candidateMoves(state))
+        pm = PlayerMove(moves[0][2])
+        if pm is PlayerMove.drawCard:
+            await self.ioManager.displayStatus(f"{computerDisplayName(player.name)} is drawing.")
+            return pm, 0
+        card: Card = player.seeCard(moves[0][3])
+        if len(moves) > 1:
+            self.chosenColor = Color(moves[1][2])
+        if player.handSize() == 2:
+            self.unoCaller = player.name
+        await self.ioManager.displayStatus(
+            f"{computerDisplayName(player.name)} played {card.color.name} {card.value.name}."
+        )
+        return pm, moves[0][3]
+
+    async def getPlayerColorChoice(self, player: Player) -> Color:
+        await self.callUno()
+        if not isComputerPlayer(player.name):
+            return await self.ioManager.getPlayerColorChoice(player)
+        color: Color = self.chosenColor
+        self.chosenColor = None
+        if color is None:
+            state = UnoState.fromGame(self.game)
+            state.pendingCard = self.drawnCard
+            color = Color((await self.search(state, [(move,) for move in state.legalMoves()]))[0][2])
+        await self.ioManager.displayStatus(f"{computerDisplayName(player.name)} chose {color.name}.")
+        return color
+
+    async def displayFirstValidDrawnCard(self, playerName, validCard, totalDrawn):
+        if isComputerPlayer(playerName):
+            self.drawnCard = validCard
+        await self.ioManager.displayFirstValidDrawnCard(playerName, validCard, totalDrawn)
+
+    async def playerWon(self, player: Player):
+        await self.ioManager.playerWon(player)
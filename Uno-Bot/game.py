@@ -1,10 +1,16 @@
 from enum import Enum
-from asyncio import Lock
+from asyncio import run
+from collections import deque
+from typing import Awaitable, Callable
 import random
+import base64
+import struct
 import traceback
 import logging
+import json
 
 from io_abc import IO
+from tracing import TracedLock
 
 
 class Color(Enum):
@@ -63,6 +69,21 @@ logging.basicConfig(
 )
 
 
+def packRngState(rng: random.Random) -> list:
+    """
+    :returns: JSON serializable state of rng, with the Mersenne Twister state
+        packed into base64 so that it takes up about 3 KB instead of 7."""
+    version, internalState, gauss = rng.getstate()
+    return [version, base64.b64encode(struct.pack(f"<{len(internalState)}I", *internalState)).decode(), gauss]
+
+
+def unpackRngState(rng: random.Random, packedState: list):
+    """Restores the state of rng from packRngState."""
+    version, internalState, gauss = packedState
+    internalState = base64.b64decode(internalState)
+    rng.setstate((version, struct.unpack(f"<{len(internalState) // 4}I", internalState), gauss))
+
+
 class UnoError(Exception):
     def __init__(self, message: str):
         super().__init__(message)
@@ -70,33 +91,70 @@ class UnoError(Exception):
 
 
 class Card:
-    def __init__(self, color: Color, value: Value):
-        self.color: Color = color
-        self.value: Value = value
-        self.isActionCard: bool = value in ACTION_CARD_VALUES
-        self.discardColor: Color = color
-        """Represents chosen color of black cards."""
+    """A card's color and value. Cards are immutable and interned, so there is
+    exactly one Card object for each color and value, which is shared between
+    decks, hands and games, and cards are compared by identity. The color
+    chosen for a black card is stored by the Discard pile instead of on the
+    card."""
+
+    __slots__ = ("color", "value", "code", "isActionCard", "isBlack")
+
+    _interned: dict = {}
+    """Interned cards, keyed by code."""
+
+    def __new__(cls, color: Color, value: Value):
+        code: int = Card.encode(color, value)
+        card = Card._interned.get(code)
+        if card is None:
+            card = object.__new__(cls)
+            object.__setattr__(card, "color", color)
+            object.__setattr__(card, "value", value)
+            object.__setattr__(card, "code", code)
+            object.__setattr__(card, "isActionCard", value in ACTION_CARD_VALUES)
+            object.__setattr__(card, "isBlack", color is Color.black)
+            Card._interned[code] = card
+        return card
+
+    @staticmethod
+    def encode(color: Color, value: Value) -> int:
+        """
+        :returns: Small int identifying a color and value, with the color in
+            the high 3 bits and the value in the low 4 bits."""
+        return ((color.value + 1) << 4) | (value.value + 2)
 
-    def __str__(self) -> str:
-        return "(" + str(self.color) + ", " + str(self.value) + ")"
+    @staticmethod
+    def fromCode(code: int):
+        """
+        :returns: The card with the given code.
+        :raises UnoError: If code does not correspond to a card."""
+        try:
+            return Card(Color((code >> 4) - 1), Value((code & 0xF) - 2))
+        except ValueError:
+            raise UnoError(f"Invalid card code: {code}")
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Cards are immutable.")
 
-    def __eq__(self, other):
-        return self.color == other.color and self.value == other.value
+    def __reduce__(self):
+        # Keeps cards interned when they are pickled or copied.
+        return Card, (self.color, self.value)
 
-    def __ne__(self, other):
-        return self.color != other.color or self.value != other.value
+    def __str__(self) -> str:
+        return "(" + str(self.color) + ", " + str(self.value) + ")"
 
-    def matches(self, playedCard, topDrawAndActive: bool) -> bool:
+    def matches(self, playedCard, topDrawAndActive: bool, discardColor: Color = None) -> bool:
         """
         :param topDrawAndActive: Denotes that the top card is either a drawTwo
             or drawFour and the only cards that would match are cards of the same
             value.
+        :param discardColor: Color chosen for self if it is a black card.
+            Defaults to the color of self.
         :returns: Given self is the card on the top of the discard, determines
             whether playedCard is a valid move."""
         if (self.value is playedCard.value or
                 (not topDrawAndActive and
-                 (playedCard.color is Color.black or
-                  self.discardColor is playedCard.color))):
+                 (playedCard.isBlack or
+                  (discardColor or self.color) is playedCard.color))):
             return True
         return False
 
@@ -112,6 +170,8 @@ class Discard:
 
     def __init__(self):
         self.topCard: Card = None
+        self.topColor: Color = None
+        """Color of the top card, or the chosen color if it is a black card."""
         self.bottomCards: list[Card] = []
 
     def __str__(self) -> str:
@@ -120,11 +180,14 @@ class Discard:
             s += str(card) + "\n"
         return s
 
-    def addTop(self, card: Card):
-        """Put a card to the top of the discard pile"""
+    def addTop(self, card: Card, color: Color = None):
+        """Put a card to the top of the discard pile
+
+        :param color: Chosen color if card is a black card."""
         if self.topCard:
             self.bottomCards.append(self.topCard)
         self.topCard = card
+        self.topColor = color or card.color
 
     def addCardBottom(self, card: Card):
         """Put a card to the bottom of the discard pile"""
@@ -138,6 +201,12 @@ class Discard:
         """See the top card on the Discard pile"""
         return self.topCard
 
+    def matches(self, playedCard: Card, topDrawAndActive: bool) -> bool:
+        """
+        :returns: Whether playedCard can be played on top of the discard pile.
+            See Card.matches."""
+        return self.topCard.matches(playedCard, topDrawAndActive, self.topColor)
+
     def shuffleBack(self) -> list[Card]:
         """
         :returns: Unshuffled cards from discard, except for top card"""
@@ -147,8 +216,14 @@ class Discard:
 
 
 class Deck:
-    def __init__(self):
-        self.cards: list[Card] = []
+    def __init__(self, rng: random.Random = None):
+        """
+        :param rng: Random number generator used to shuffle the deck. Defaults
+            to the global random module."""
+        self.rng = rng or random
+        self.cards: deque[Card] = deque()
+        """Cards in the deck. The top of the deck is the right end, so that
+        drawing from the top and adding to the bottom are both O(1)."""
         # Add colored cards
         for color in range(0, 4):
             for value in range(1, 13):
@@ -166,34 +241,36 @@ class Deck:
 
     def __str__(self) -> str:
         s = "Cards:\n"
-        for card in self.cards:
+        for card in reversed(self.cards):
             s += str(card) + "\n"
         return s
 
     def shuffle(self):
-        random.shuffle(self.cards)
+        self.rng.shuffle(self.cards)
 
     def pop(self, discard: Discard) -> Card:
         """
         :returns: Top card from the deck.
         :raises UnoError: If there isn't a card in the deck and the discard pile
             only has one card."""
-        if len(self.cards) == 0:
-            self.cards = discard.shuffleBack()
-            if len(self.cards) == 0:
+        if not self.cards:
+            self.cards = deque(discard.shuffleBack())
+            if not self.cards:
                 raise UnoError("No cards remaining in deck.")
             self.shuffle()
-        return self.cards.pop(0)
+        return self.cards.pop()
 
     def popNonAction(self) -> Card:
         """THIS SHOULD ONLY BE CALLED AT THE BEGINNING OF THE GAME TO INITALIZE
         DISCARD PILE. ASSUMES >0 NON-ACTION CARDS IN DECK.
 
         :returns: The first card in the deck that isn't an action card."""
-        count: int = 0
+        count: int = len(self.cards) - 1
         while self.cards[count].isActionCard:
-            count += 1
-        return self.cards.pop(count)
+            count -= 1
+        card: Card = self.cards[count]
+        del self.cards[count]
+        return card
 
     def popStartingHand(self) -> list[Card]:
         """This should be used ONLY TO INITIALIZE A PLAYER'S HAND.
@@ -203,29 +280,77 @@ class Deck:
             incorrectly)."""
         if STARTING_HAND_SIZE > len(self.cards):
             raise UnoError("Invalid usage of popStartingHand.")
-        retVal, self.cards = self.cards[:STARTING_HAND_SIZE], self.cards[STARTING_HAND_SIZE:]
-        return retVal
+        return [self.cards.pop() for _ in range(STARTING_HAND_SIZE)]
 
     def addBottom(self, card: Card):
         """Adds card to the bottom of the deck."""
-        self.cards.append(card)
+        self.cards.appendleft(card)
 
 
 class Player:
     def __init__(self, name: int, startingHand: list[Card]):
         self.hand: list[Card] = startingHand
+        """Should only be changed using add and discard, which keep the hand
+        index up to date."""
         self.name: int = name
 
         self.unoSafe: bool = True
 
+        # Hand index: the number of copies of each card in hand, bucketed by
+        # color and by value, so that playable cards can be found without
+        # scanning the whole hand. Buckets are indexed by the color and value
+        # parts of Card.code, and cards are removed from their buckets when
+        # their count reaches 0.
+        self.cardsByColor: list[dict[Card, int]] = [{} for _ in Color]
+        self.cardsByValue: list[dict[Card, int]] = [{} for _ in Value]
+        for card in startingHand:
+            self.indexCard(card)
+
     def __str__(self) -> str:
         s = "Player name: " + str(self.name) + "\nCards in hand:\n"
         for card in self.hand:
             s += str(card) + "\n"
         return s
 
+    def indexCard(self, card: Card):
+        for bucket in (self.cardsByColor[card.code >> 4], self.cardsByValue[card.code & 0xF]):
+            bucket[card] = bucket.get(card, 0) + 1
+
+    def unindexCard(self, card: Card):
+        for bucket in (self.cardsByColor[card.code >> 4], self.cardsByValue[card.code & 0xF]):
+            if bucket[card] == 1:
+                del bucket[card]
+            else:
+                bucket[card] -= 1
+
     def add(self, card: Card):
         self.hand.append(card)
+        self.indexCard(card)
+
+    def hasCard(self, card: Card) -> bool:
+        return card in self.cardsByValue[card.code & 0xF]
+
+    def indexOf(self, card: Card) -> int:
+        """
+        :returns: Index of the first copy of card in hand.
+        :raises UnoError: If card is not in hand."""
+        if not self.hasCard(card):
+            raise UnoError("The card that you selected was not in your hand.")
+        return self.hand.index(card)
+
+    def playableCards(self, topCard: Card, topDrawAndActive: bool, topColor: Color = None) -> list[Card]:
+        """Uses the hand index, so only the buckets for the top card's value and
+        color and for black cards are looked at.
+
+        :param topColor: Color chosen for topCard if it is a black card.
+            Defaults to the color of topCard.
+        :returns: Each distinct card in hand that can be played on topCard. See
+            Card.matches."""
+        playable: dict[Card, int] = self.cardsByValue[topCard.code & 0xF]
+        if not topDrawAndActive:
+            playable = (playable | self.cardsByColor[(topColor or topCard.color).value + 1]
+                        | self.cardsByColor[Color.black.value + 1])
+        return list(playable)
 
     def seeCard(self, n: int) -> Card:
         """Returns the nth card from hand but does not discard it.
@@ -247,9 +372,11 @@ class Player:
         :returns: discarded nth card from hand.
         :raises UnoError: n is an invalid index"""
         try:
-            return self.hand.pop(n)
+            card: Card = self.hand.pop(n)
         except IndexError:
             raise UnoError('Invalid card selected from hand.')
+        self.unindexCard(card)
+        return card
 
     def handSize(self) -> int:
         return len(self.hand)
@@ -278,8 +405,10 @@ class TextBasedIO(IO):
         else:
             return input(f"{str(player.name)} input: ")
 
-    async def getPlayerInput(self, player: Player, topDiscard: Card, numDraw) -> (PlayerMove, int):
+    async def getPlayerInput(self, player: Player, topDiscard: Card, numDraw, discardColor: Color) -> (PlayerMove, int):
         s = f"\n{str(player.name)} it is your turn.\n{str(player)}\nTop Card: {str(topDiscard)}\n"
+        if topDiscard.isBlack:
+            s += f"Chosen color: {discardColor.name}\n"
         s += f"What move would you like to make?\n1: Play a Card\n"
         s += "2: Draw Cards\n3: Quit Game"
         await self.displayMessage(s)
@@ -318,27 +447,51 @@ class TextBasedIO(IO):
 class UnoGame:
     """Provides all logic and manages all classes to run a game of Uno."""
 
-    def __init__(self, playerNames: list[int], ioManager: IO):
+    def __init__(self, playerNames: list[int], ioManager: IO, seed: int = None, logFile: str = None):
+        """
+        :param seed: Seed for shuffling the deck and the player order. A game
+            with the same players, seed and moves always plays out the same. A
+            random seed is chosen if it is not given.
+        :param logFile: Path of a file that the seed, players and moveLog are
+            appended to as the game is played, one JSON value per line. See
+            replay.py."""
         # If there are no players, raise an error
         if not playerNames:
             raise UnoError("No players playing the game.")
 
         self.ioManager = ioManager
-
-        self.deck: Deck = Deck()
+        if seed is None:
+            seed = random.getrandbits(64)
+        self.seed: int = seed
+        self.rng: random.Random = random.Random(seed)
+        self.logFile: str = logFile
+        self.logHandle = None
+        """logFile, kept open while the game is played so that each entry
+        is only buffered rather than written with its own open and close."""
+        self.moveLog: list[tuple] = []
+        """Append-only log of every move and choice that changed the game, in
+        the order they were made. Entries are ("m", playerName, PlayerMove
+        value, card index) for a confirmed move, ("c", playerName, Color value)
+        for a chosen color and ("u", playerName) for a call of 'Uno!'."""
+        self.logHeader: dict = {"seed": seed, "players": list(playerNames)}
+        """Seed and players, in the order they were given, that the game was
+        created with."""
+        self.writeLog(self.logHeader)
+
+        self.deck: Deck = Deck(self.rng)
         self.discard: Discard = Discard()
 
         self.playerNames: list[int] = []
         """Direct access to playerNames requires managing playerLock."""
         self.players: list[Player] = []
         """Direct access to players requires managing playerLock."""
-        self.playerLock: Lock = Lock()
+        self.playerLock: TracedLock = TracedLock("playerLock")
         """To prevent race conditions, this lock should be used whenever 
         playerNames or players is changed/used. Use the corresponding custom
         acquire/release methods."""
 
         # Randomize player order
-        random.shuffle(playerNames)
+        self.rng.shuffle(playerNames)
         for playerName in playerNames:
             self.addPlayer(playerName)
 
@@ -385,7 +538,7 @@ class UnoGame:
         # must say 'Uno!' right after even if they still have to choose a color
         # to be 100% safe.
         self.unoSafeguard: bool = False
-        self.unoSafeguardLock: Lock = Lock()
+        self.unoSafeguardLock: TracedLock = TracedLock("unoSafeguardLock")
         """To prevent race conditions, this lock should be used whenever 
         unoSafeguard is changed/used. Use the corresponding custom acquire/release 
         methods."""
@@ -408,21 +561,119 @@ class UnoGame:
         """Initializes discard pile with a non-action card from the deck."""
         self.discard.addTop(self.deck.popNonAction())
 
-    async def acquireUnoSafeguardLock(self, logMessage: str):
-        await self.unoSafeguardLock.acquire()
-        self.rootLogger.info(f"unoSafeguardLock acquired: {logMessage}")
+    def writeLog(self, value):
+        """Appends a JSON value as a line to logFile, if there is one. The line
+        may stay buffered until flushLog is called."""
+        if self.logFile:
+            if self.logHandle is None:
+                self.logHandle = open(self.logFile, "a")
+            self.logHandle.write(json.dumps(value) + "\n")
+
+    def flushLog(self):
+        """Writes any buffered lines to logFile."""
+        if self.logHandle is not None:
+            self.logHandle.flush()
+
+    def closeLog(self):
+        """Flushes and closes logFile. It is reopened if anything else is
+        logged."""
+        if self.logHandle is not None:
+            self.logHandle.close()
+            self.logHandle = None
+
+    def recordMove(self, *entry):
+        """Adds an entry to moveLog and logFile."""
+        self.moveLog.append(entry)
+        self.writeLog(entry)
+
+    def rewriteLog(self):
+        """Replaces the contents of logFile, if there is one, with logHeader
+        and moveLog."""
+        if self.logFile:
+            self.closeLog()
+            self.logHandle = open(self.logFile, "w")
+            for value in [self.logHeader] + self.moveLog:
+                self.logHandle.write(json.dumps(value) + "\n")
+            self.flushLog()
+
+    def toState(self, savedLengths: dict[str, int] = None) -> dict:
+        """Should only be called between turns.
+
+        :param savedLengths: Number of entries at the start of each
+            append-only log (moveLog) that are already saved elsewhere
+            and are left out of the snapshot. See GameStore.
+        :returns: JSON serializable snapshot of the whole game, with cards
+            stored as their codes. See fromState."""
+        savedLengths = savedLengths or {}
+        return {
+            "header": self.logHeader,
+            "logFile": self.logFile,
+            "moveLog": self.moveLog[savedLengths.get("moveLog", 0):],
+            "rng": packRngState(self.rng),
+            "deck": [card.code for card in self.deck.cards],
+            "discardTop": self.discard.topCard.code,
+            "discardColor": self.discard.topColor.value,
+            "discardBottom": [card.code for card in self.discard.bottomCards],
+            "playerNames": list(self.playerNames),
+            "players": [
+                [player.name, [card.code for card in player.hand], player.unoSafe] for player in self.players
+            ],
+            "nextPlayer": self.nextPlayer,
+            "turnOrder": self.turnOrder,
+            "numDraw": self.numDraw,
+            "skipNextPlayer": self.skipNextPlayer,
+            "unoSafeguard": self.unoSafeguard,
+            "logLengths": {"moveLog": len(self.moveLog)}
+        }
+
+    @classmethod
+    def fromState(cls, state: dict, ioManager: IO):
+        """Rebuilds a game from a snapshot taken by toState, at the start of the
+        turn after the snapshot was taken. logFile is rewritten to match the
+        snapshot, dropping any input that was logged after it.
+
+        :returns: The rebuilt UnoGame.
+        :raises UnoError: If the snapshot contains an invalid card."""
+        header: dict = state["header"]
+        game = cls(list(header["players"]), ioManager, header["seed"])
+        game.logFile = state["logFile"]
+        game.moveLog = [tuple(entry) for entry in state["moveLog"]]
+        unpackRngState(game.rng, state["rng"])
+        game.deck.cards = deque(Card.fromCode(code) for code in state["deck"])
+        game.discard.topCard = Card.fromCode(state["discardTop"])
+        game.discard.topColor = Color(state["discardColor"])
+        game.discard.bottomCards = [Card.fromCode(code) for code in state["discardBottom"]]
+        game.playerNames = list(state["playerNames"])
+        game.players = []
+        for playerName, hand, unoSafe in state["players"]:
+            player = Player(playerName, [Card.fromCode(code) for code in hand])
+            player.unoSafe = unoSafe
+            game.players.append(player)
+        game.nextPlayer = state["nextPlayer"]
+        game.turnOrder = state["turnOrder"]
+        game.numDraw = state["numDraw"]
+        game.skipNextPlayer = state["skipNextPlayer"]
+        game.unoSafeguard = state["unoSafeguard"]
+        game.rewriteLog()
+        return game
+
+    async def acquireUnoSafeguardLock(self, logMessage: str, *args):
+        """
+        :param logMessage: %-style template for the message that is traced
+            with the lock event, formatted with args only if it is dumped."""
+        await self.unoSafeguardLock.acquire(logMessage, *args)
 
-    def releaseUnoSafeguardLock(self, logMessage: str):
-        self.unoSafeguardLock.release()
-        self.rootLogger.info(f"unoSafeguardLock released: {logMessage}")
+    def releaseUnoSafeguardLock(self, logMessage: str, *args):
+        self.unoSafeguardLock.release(logMessage, *args)
 
-    async def acquirePlayerLock(self, logMessage: str):
-        await self.playerLock.acquire()
-        self.rootLogger.info(f"playerLock acquired: {logMessage}")
+    async def acquirePlayerLock(self, logMessage: str, *args):
+        """
+        :param logMessage: %-style template for the message that is traced
+            with the lock event, formatted with args only if it is dumped."""
+        await self.playerLock.acquire(logMessage, *args)
 
-    def releasePlayerLock(self, logMessage: str):
-        self.playerLock.release()
-        self.rootLogger.info(f"playerLock released: {logMessage}")
+    def releasePlayerLock(self, logMessage: str, *args):
+        self.playerLock.release(logMessage, *args)
 
     def addPlayer(self, playerName: int):
         """Adds a player into the game, if the max number of players has not
@@ -474,24 +725,27 @@ class UnoGame:
 
         while not validMoveMade:
             try:
-                pm, n = await self.ioManager.getPlayerInput(curPlayer, self.discard.topCard, self.numDraw)
-                await self.acquirePlayerLock(f"Player {curPlayer.name} has confirmed a move.")
-                await self.acquireUnoSafeguardLock(f"Player {curPlayer.name} has confirmed a move.")
+                pm, n = await self.ioManager.getPlayerInput(
+                    curPlayer, self.discard.topCard, self.numDraw, self.discard.topColor
+                )
+                await self.acquirePlayerLock("Player %s has confirmed a move.", curPlayer.name)
+                await self.acquireUnoSafeguardLock("Player %s has confirmed a move.", curPlayer.name)
                 if pm is PlayerMove.playCard:
                     playedCard: Card = curPlayer.seeCard(n)
-                    if not self.discard.topCard.matches(playedCard, topDrawAndActive):
+                    if not self.discard.matches(playedCard, topDrawAndActive):
                         raise UnoError("Card cannot be played here.")
                 validMoveMade = True
+                self.recordMove("m", curPlayer.name, pm.value, n)
             except UnoError as e:
                 await self.ioManager.displayError(e.message)
-                self.releasePlayerLock(f"Error executing player {curPlayer.name}'s move.")
-                self.releaseUnoSafeguardLock(f"Error executing player {curPlayer.name}'s move.")
+                self.releasePlayerLock("Error executing player %s's move.", curPlayer.name)
+                self.releaseUnoSafeguardLock("Error executing player %s's move.", curPlayer.name)
             except Exception as e:
                 print(e)
                 traceback.print_exc()
                 await self.ioManager.displayError("Invalid input given.")
-                self.releasePlayerLock(f"Error executing player {curPlayer.name}'s move.")
-                self.releaseUnoSafeguardLock(f"Error executing player {curPlayer.name}'s move.")
+                self.releasePlayerLock("Error executing player %s's move.", curPlayer.name)
+                self.releaseUnoSafeguardLock("Error executing player %s's move.", curPlayer.name)
 
         # Move is verified to be valid, so now execute it
         if pm is PlayerMove.playCard:
@@ -504,9 +758,11 @@ class UnoGame:
                 self.unoSafeguard = False
             self.releaseUnoSafeguardLock("Finished updating unoSafeguard after player has made a move.")
             self.releasePlayerLock("Player has finished playing a card (may need to choose color still).")
-            if playedCard.color is Color.black:
-                playedCard.discardColor = await self.ioManager.getPlayerColorChoice(curPlayer)
-            self.discard.addTop(playedCard)
+            chosenColor: Color = None
+            if playedCard.isBlack:
+                chosenColor = await self.ioManager.getPlayerColorChoice(curPlayer)
+                self.recordMove("c", curPlayer.name, chosenColor.value)
+            self.discard.addTop(playedCard, chosenColor)
 
             self.updateActions(playedCard)
 
@@ -535,7 +791,7 @@ class UnoGame:
                 validCard: Card = None
                 try:
                     validCard = self.deck.pop(self.discard)
-                    while not self.discard.topCard.matches(validCard, topDrawAndActive):
+                    while not self.discard.matches(validCard, topDrawAndActive):
                         numDrawn += 1
                         curPlayer.add(validCard)
                         validCard = self.deck.pop(self.discard)
@@ -545,9 +801,11 @@ class UnoGame:
                 self.releasePlayerLock("Player has finished drawing cards.")
                 await self.ioManager.displayFirstValidDrawnCard(curPlayer.name, validCard, numDrawn)
                 if validCard:
-                    if validCard.color is Color.black:
-                        validCard.discardColor = await self.ioManager.getPlayerColorChoice(curPlayer)
-                    self.discard.addTop(validCard)
+                    chosenColor: Color = None
+                    if validCard.isBlack:
+                        chosenColor = await self.ioManager.getPlayerColorChoice(curPlayer)
+                        self.recordMove("c", curPlayer.name, chosenColor.value)
+                    self.discard.addTop(validCard, chosenColor)
                     self.updateActions(validCard)
         else:
             self.unoSafeguard = False
@@ -624,8 +882,8 @@ class UnoGame:
                 without safeguard up, and there are 0 players not safe.
             (4, x), x != None if player playerName has called Uno not for
                 themselves and x are the names of players that are not safe."""
-        await self.acquirePlayerLock(f"Executing player {playerName} calling 'Uno!'.")
-        await self.acquireUnoSafeguardLock(f"Executing player {playerName} calling 'Uno!'.")
+        await self.acquirePlayerLock("Executing player %s calling 'Uno!'.", playerName)
+        await self.acquireUnoSafeguardLock("Executing player %s calling 'Uno!'.", playerName)
 
         unsafePlayersWithOneCard = []
         unsafePlayerNamesWithOneCard = []
@@ -646,6 +904,8 @@ class UnoGame:
                 unsafePlayerNamesWithOneCard.append(player.name)
 
         retVal: (int, list[int])
+        if callingPlayer:
+            self.recordMove("u", playerName)
         if not callingPlayer:
             retVal = (0, None)
         elif selfUno:
@@ -672,16 +932,25 @@ class UnoGame:
                 self.ioManager.displayError(e.message)
             retVal = (4, unsafePlayerNamesWithOneCard)
 
-        self.releaseUnoSafeguardLock(f"Finished executing player {playerName} calling 'Uno!'")
-        self.releasePlayerLock(f"Finished executing player {playerName} calling 'Uno!'")
+        self.releaseUnoSafeguardLock("Finished executing player %s calling 'Uno!'", playerName)
+        self.releasePlayerLock("Finished executing player %s calling 'Uno!'", playerName)
         return retVal
 
-    async def startGame(self):
-        """Locks: does not check playerLock"""
+    async def startGame(self, onTurnEnd: Callable[[], Awaitable[None]] = None):
+        """Locks: does not check playerLock
+
+        :param onTurnEnd: Called and awaited after every turn except the last
+            one, when the game can be saved with toState. logFile is flushed before
+            each call and closed once the game ends."""
         self.rootLogger.info(f"Starting game with {len(self.playerNames)} players.")
-        while not await self.executeTurn():
-            pass
-        await self.ioManager.playerWon(self.players[self.nextPlayer])
+        try:
+            while not await self.executeTurn():
+                self.flushLog()
+                if onTurnEnd:
+                    await onTurnEnd()
+            await self.ioManager.playerWon(self.players[self.nextPlayer])
+        finally:
+            self.closeLog()
 
 
 async def startGame():
@@ -692,4 +961,4 @@ async def startGame():
 
 
 if __name__ == "__main__":
-    startGame()
+    run(startGame())
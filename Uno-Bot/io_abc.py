@@ -27,13 +27,15 @@ class IO(ABC):
         pass
 
     @abstractmethod
-    async def getPlayerInput(self, player, topDiscard, numDraw):
+    async def getPlayerInput(self, player, topDiscard, numDraw, discardColor):
         """Input for what a player wants to do on a turn.
 
         DOES NOT HANDLE INVALID INPUT BY DEFAULT - JUST THROWS ERROR.
 
         :param numDraw: The amount of cards that would be drawn from the top
             action card.
+        :param discardColor: The color of the top card, or the color that was
+            chosen for it if it is a black card.
         :raises UnoError: On invalid input"""
         pass
 
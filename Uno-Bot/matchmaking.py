@@ -0,0 +1,53 @@
+from asyncio import Event, Task, create_task, sleep
+from typing import Callable, Coroutine
+import logging
+
+
+def partitionPlayers(numPlayers: int, minPlayers: int, maxPlayers: int) -> list[int]:
+    """Splits queued players into as few games as possible while seating as
+    many players as possible, with game sizes that differ by at most one.
+
+    :returns: Number of players in each game, largest first. Players beyond
+        the sum are left in the queue."""
+    numGames = -(-numPlayers // maxPlayers)
+    while numGames and numPlayers // numGames < minPlayers:
+        numGames -= 1
+    if not numGames:
+        return []
+    seated = min(numPlayers, numGames * maxPlayers)
+    return [seated // numGames + (i < seated % numGames) for i in range(numGames)]
+
+
+class Matchmaker:
+    """Background task that starts games whenever the queue changes. Each
+    change waits delay seconds before games are started, so that players who
+    join around the same time are spread over fewer, fuller games."""
+
+    def __init__(self, startGames: Callable[[], Coroutine], delay: float):
+        """
+        :param startGames: async function that starts as many games as
+            possible from the queue."""
+        self.startGames: Callable[[], Coroutine] = startGames
+        self.delay: float = delay
+        self.queueChanged: Event = Event()
+        self.task: Task = None
+
+    def start(self):
+        """Starts the background task if it is not already running."""
+        if self.task is None:
+            self.task = create_task(self.run())
+
+    def notify(self):
+        """Call whenever players are added to the queue."""
+        self.queueChanged.set()
+
+    async def run(self):
+        while True:
+            await self.queueChanged.wait()
+            await sleep(self.delay)
+            # Players who join after this are picked up by the next pass
+            self.queueChanged.clear()
+            try:
+                await self.startGames()
+            except Exception:
+                logging.exception("Failed to start games from the queue.")
@@ -0,0 +1,96 @@
+from collections import OrderedDict
+
+
+class PlayerQueue:
+    """Players waiting for a game, in the order that they joined. Stored as an
+    OrderedDict from user id to display name, so that checking membership is
+    O(1) and taking k players from the front is O(k log n). Positions are
+    counted in a Fenwick tree over join numbers, so that joining, leaving and
+    finding a player's position are O(log n) rather than scans of the
+    queue."""
+
+    def __init__(self):
+        self.players: OrderedDict[int, str] = OrderedDict()
+        """Display name of each queued player, keyed by user id, in the order
+        that they joined."""
+        self.joinNumbers: dict[int, int] = {}
+        """1-based order in which each queued player joined, counted since
+        the queue was last empty."""
+        self.queuedCounts: list[int] = [0]
+        """Fenwick tree, indexed by join number, of how many of the players
+        who joined are still queued. Index 0 is unused."""
+
+    def __len__(self) -> int:
+        return len(self.players)
+
+    def __contains__(self, player: int) -> bool:
+        return player in self.players
+
+    def join(self, player: int, displayName: str) -> bool:
+        """Adds player to the back of the queue.
+
+        :returns: Whether player was added, which is False if they were
+            already in the queue."""
+        if player in self.players:
+            return False
+        self.players[player] = displayName
+        joinNumber = len(self.queuedCounts)
+        self.joinNumbers[player] = joinNumber
+        # The new node covers the joins after joinNumber - lowest set bit
+        self.queuedCounts.append(
+            self.numQueuedBefore(joinNumber) - self.numQueuedBefore(joinNumber - (joinNumber & -joinNumber) + 1) + 1
+        )
+        return True
+
+    def leave(self, player: int) -> bool:
+        """
+        :returns: Whether player was in the queue."""
+        if player not in self.players:
+            return False
+        del self.players[player]
+        self.removeJoinNumber(player)
+        return True
+
+    def position(self, player: int) -> int:
+        """
+        :returns: Index of player in the queue, with 0 being the front.
+        :raises KeyError: If player is not in the queue."""
+        return self.numQueuedBefore(self.joinNumbers[player])
+
+    def numQueuedBefore(self, joinNumber: int) -> int:
+        """
+        :returns: Number of players who joined before joinNumber and are
+            still queued."""
+        count: int = 0
+        i: int = joinNumber - 1
+        while i > 0:
+            count += self.queuedCounts[i]
+            i -= i & -i
+        return count
+
+    def removeJoinNumber(self, player: int):
+        """Stops counting player, who has left the queue, in queuedCounts."""
+        i: int = self.joinNumbers.pop(player)
+        while i < len(self.queuedCounts):
+            self.queuedCounts[i] -= 1
+            i += i & -i
+        if not self.players:
+            # Join numbers restart so that queuedCounts does not keep growing
+            self.queuedCounts = [0]
+
+    def popFront(self, numPlayers: int) -> OrderedDict[int, str]:
+        """Removes up to numPlayers players from the front of the queue.
+
+        :returns: Display names of the removed players, keyed by user id, in
+            queue order."""
+        front: OrderedDict[int, str] = OrderedDict()
+        for _ in range(min(numPlayers, len(self.players))):
+            player, displayName = self.players.popitem(last = False)
+            self.removeJoinNumber(player)
+            front[player] = displayName
+        return front
+
+    def displayNames(self) -> list[str]:
+        """
+        :returns: Display names of all queued players, in queue order."""
+        return list(self.players.values())
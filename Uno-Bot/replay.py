@@ -0,0 +1,144 @@
+from asyncio import run
+import argparse
+import json
+import logging
+import time
+
+from io_abc import IO
+from game import UnoGame, UnoError, Player, Card, Color, PlayerMove
+
+
+class ReplayError(UnoError):
+    """Raised when a game does not follow the log that it is replayed from."""
+
+
+def loadLog(path: str) -> (dict, list[tuple]):
+    """Reads a log written by UnoGame.
+
+    :returns: The log header, with the seed and players of the game, and the
+        moveLog of the game."""
+    with open(path, "r") as file:
+        header = json.loads(file.readline())
+        moves = [tuple(json.loads(line)) for line in file if line.strip()]
+    return header, moves
+
+
+class ReplayIO(IO):
+    """Defines silent I/O methods for Uno where every player's input is taken
+    from a moveLog. Calls of 'Uno!' in the log are made on the game right
+    before the next input is given, which is the first point at which the
+    original call could have acquired the game's locks."""
+    def __init__(self, moves: list[tuple]):
+        self.moves: list[tuple] = moves
+        self.nextMove: int = 0
+        """Index of the next entry of moves to replay."""
+        self.game: UnoGame = None
+        self.error: ReplayError = None
+        """Error raised while getting a player's move. The game catches these
+        and displays them, so it is raised again by displayError."""
+
+    def movesRemaining(self) -> bool:
+        return self.nextMove < len(self.moves)
+
+    async def applyUnoCalls(self):
+        """Makes the calls of 'Uno!' that are next in the log."""
+        while self.movesRemaining() and self.moves[self.nextMove][0] == "u":
+            playerName = self.moves[self.nextMove][1]
+            self.nextMove += 1
+            await self.game.playerCallUno(playerName)
+
+    async def takeMove(self, kind: str, player: Player) -> tuple:
+        """
+        :returns: The next entry in the log, which should be of the given kind
+            and made by the given player.
+        :raises ReplayError: If the next entry in the log is not the expected
+            one."""
+        await self.applyUnoCalls()
+        if not self.movesRemaining():
+            raise ReplayError(f"The log ended while waiting for input from player {player.name}.")
+        entry = self.moves[self.nextMove]
+        if entry[0] != kind or entry[1] != player.name:
+            raise ReplayError(
+                f"Log entry {self.nextMove} is {entry}, but an entry of type {kind} "
+                f"from player {player.name} was expected."
+            )
+        self.nextMove += 1
+        return entry
+
+    async def displayMessage(self, message: str):
+        pass
+
+    async def displayError(self, message: str):
+        if self.error:
+            error, self.error = self.error, None
+            raise error
+
+    async def displayStatus(self, message: str):
+        pass
+
+    async def getInput(self, player: Player = None) -> str:
+        return ""
+
+    async def getPlayerInput(self, player: Player, topDiscard: Card, numDraw, discardColor: Color) -> (PlayerMove, int):
+        try:
+            _, _, move, n = await self.takeMove("m", player)
+        except ReplayError as e:
+            self.error = e
+            raise
+        return PlayerMove(move), n
+
+    async def getPlayerColorChoice(self, player: Player) -> Color:
+        return Color((await self.takeMove("c", player))[2])
+
+    async def displayFirstValidDrawnCard(self, playerName, validCard, totalDrawn):
+        pass
+
+    async def playerWon(self, player: Player):
+        pass
+
+
+async def replayGame(header: dict, moves: list[tuple], turns: int = None) -> (UnoGame, int):
+    """Rebuilds a game from its log without any I/O, by replaying its moves on
+    a game with the same seed and players.
+
+    :param header: UnoGame.logHeader of the game.
+    :param moves: UnoGame.moveLog of the game.
+    :param turns: Number of turns to replay. Defaults to replaying the whole
+        log.
+    :returns: The game after the replayed turns and the number of turns that
+        were replayed.
+    :raises ReplayError: If the game does not follow the log."""
+    ioManager = ReplayIO(moves)
+    game = UnoGame(list(header["players"]), ioManager, header["seed"])
+    ioManager.game = game
+    turn: int = 0
+    while turns is None or turn < turns:
+        await ioManager.applyUnoCalls()
+        if not ioManager.movesRemaining():
+            break
+        turn += 1
+        if await game.executeTurn():
+            break
+    if game.moveLog != moves[:ioManager.nextMove]:
+        raise ReplayError("The replayed game did not record the same moves as the log.")
+    return game, turn
+
+
+def parseArgs():
+    parser = argparse.ArgumentParser(description = "Rebuilds the state of a game of Uno from its log.")
+    parser.add_argument("log", help = "Path of a log written by UnoGame.")
+    parser.add_argument("--turn", type = int, help = "Number of turns to replay. Defaults to the whole game.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parseArgs()
+    header, moves = loadLog(args.log)
+    logging.getLogger().setLevel(logging.WARNING)
+    start = time.perf_counter()
+    game, turn = run(replayGame(header, moves, args.turn))
+    elapsed = time.perf_counter() - start
+    print(game)
+    print(f"State after turn {turn}, replayed in {elapsed * 1000:.1f} ms.")
+    print(f"Player {game.players[game.nextPlayer].name} is next, turn order is {game.turnOrder}, "
+          f"{game.numDraw} cards to draw, skipNextPlayer is {game.skipNextPlayer}.")
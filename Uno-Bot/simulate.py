@@ -0,0 +1,305 @@
+from abc import ABC, abstractmethod
+from asyncio import run
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import logging
+import os
+import random
+import statistics
+import time
+
+from io_abc import IO
+from game import UnoGame, Player, Card, Color, PlayerMove, MAX_PLAYERS, MIN_PLAYERS
+
+MAX_TURNS: int = 2000
+"""Number of turns after which a simulated game is abandoned."""
+
+
+class Policy(ABC):
+    """Decides the moves of a scripted player."""
+    def __init__(self, rng: random.Random = None):
+        """
+        :param rng: Random number generator for any choices the policy makes
+            at random."""
+        self.rng = rng or random.Random()
+
+    @abstractmethod
+    def chooseMove(self, player: Player, topDiscard: Card, numDraw: int, discardColor: Color) -> (PlayerMove, int):
+        """
+        :param numDraw: The amount of cards that would be drawn from the top
+            action card. If non-zero, only cards of the same value can be played.
+        :param discardColor: Color of the top card, or its chosen color if it is
+            a black card.
+        :returns: The move to make and the index of the card to play, in the
+            same format as IO.getPlayerInput."""
+        pass
+
+    @abstractmethod
+    def chooseColor(self, player: Player) -> Color:
+        """
+        :returns: Color chosen for a black card that the player has played."""
+        pass
+
+    def playableCards(self, player: Player, topDiscard: Card, numDraw: int, discardColor: Color) -> list[int]:
+        """
+        :returns: Indices of the cards in the player's hand that can be played."""
+        return [player.indexOf(card) for card in player.playableCards(topDiscard, bool(numDraw), discardColor)]
+
+    def mostCommonColor(self, player: Player) -> Color:
+        """
+        :returns: The non-black color that the player has the most cards of,
+            with ties broken in Color order."""
+        counts = Counter(card.color for card in player.hand)
+        return max((Color.red, Color.blue, Color.green, Color.yellow), key = lambda c: counts[c])
+
+
+class FirstPlayablePolicy(Policy):
+    """Plays the first playable card in hand and picks the most common color."""
+    def chooseMove(self, player: Player, topDiscard: Card, numDraw: int, discardColor: Color) -> (PlayerMove, int):
+        playable = self.playableCards(player, topDiscard, numDraw, discardColor)
+        if not playable:
+            return PlayerMove.drawCard, 0
+        return PlayerMove.playCard, min(playable)
+
+    def chooseColor(self, player: Player) -> Color:
+        return self.mostCommonColor(player)
+
+
+class RandomPolicy(Policy):
+    """Plays a random playable card and picks a random color."""
+    def chooseMove(self, player: Player, topDiscard: Card, numDraw: int, discardColor: Color) -> (PlayerMove, int):
+        playable = self.playableCards(player, topDiscard, numDraw, discardColor)
+        if not playable:
+            return PlayerMove.drawCard, 0
+        return PlayerMove.playCard, self.rng.choice(playable)
+
+    def chooseColor(self, player: Player) -> Color:
+        return Color(self.rng.randrange(4))
+
+
+class LowestCodePolicy(Policy):
+    """Plays the playable card with the lowest Card.code and picks the most
+    common color. This is the policy implemented by BatchUnoGame."""
+    def chooseMove(self, player: Player, topDiscard: Card, numDraw: int, discardColor: Color) -> (PlayerMove, int):
+        playable = player.playableCards(topDiscard, bool(numDraw), discardColor)
+        if not playable:
+            return PlayerMove.drawCard, 0
+        return PlayerMove.playCard, player.indexOf(min(playable, key = lambda card: card.code))
+
+    def chooseColor(self, player: Player) -> Color:
+        return self.mostCommonColor(player)
+
+
+POLICIES = {
+    "first": FirstPlayablePolicy,
+    "random": RandomPolicy,
+    "lowest": LowestCodePolicy
+}
+"""Policies that can be chosen from the command line."""
+
+
+class ScriptedIO(IO):
+    """Defines synchronous, non-printing I/O methods for Uno where every
+    player's input comes from a policy. Used for headless simulation."""
+    def __init__(self, policies: dict[int, Policy]):
+        """
+        :param policies: Policy used for each player, keyed by player name."""
+        self.policies = policies
+
+    async def displayMessage(self, message: str):
+        pass
+
+    async def displayError(self, message: str):
+        pass
+
+    async def displayStatus(self, message: str):
+        pass
+
+    async def getInput(self, player: Player = None) -> str:
+        return ""
+
+    async def getPlayerInput(self, player: Player, topDiscard: Card, numDraw, discardColor: Color) -> (PlayerMove, int):
+        return self.policies[player.name].chooseMove(player, topDiscard, numDraw, discardColor)
+
+    async def getPlayerColorChoice(self, player: Player) -> Color:
+        return self.policies[player.name].chooseColor(player)
+
+    async def displayFirstValidDrawnCard(self, playerName, validCard, totalDrawn):
+        pass
+
+    async def playerWon(self, player: Player):
+        pass
+
+
+class SimulationStats:
+    """Results of a batch of simulated games."""
+
+    def __init__(self):
+        self.numGames: int = 0
+        self.totalTurns: int = 0
+        self.unfinished: int = 0
+        """Number of games abandoned after MAX_TURNS turns."""
+        self.wins: Counter = Counter()
+        """Number of wins for each player name."""
+        self.gameLengths: Counter = Counter()
+        """Number of finished games for each game length, in turns."""
+        self.elapsed: float = 0
+
+    def merge(self, other):
+        """Adds the results of another batch of games to these results. Elapsed
+        time is not merged, since batches may have run in parallel."""
+        self.numGames += other.numGames
+        self.totalTurns += other.totalTurns
+        self.unfinished += other.unfinished
+        self.wins.update(other.wins)
+        self.gameLengths.update(other.gameLengths)
+
+    def addGame(self, turns: int, winner: int):
+        """
+        :param winner: Name of the player who won, or None if the game was
+            abandoned."""
+        self.numGames += 1
+        self.totalTurns += turns
+        if winner is None:
+            self.unfinished += 1
+        else:
+            self.wins[winner] += 1
+            self.gameLengths[turns] += 1
+
+    def report(self) -> str:
+        """
+        :returns: Human readable summary of throughput and game lengths."""
+        s = f"Games: {self.numGames} ({self.unfinished} abandoned after {MAX_TURNS} turns)\n"
+        s += f"Turns: {self.totalTurns}\n"
+        if self.elapsed:
+            s += f"Games/sec: {self.numGames / self.elapsed:,.1f}\n"
+            s += f"Turns/sec: {self.totalTurns / self.elapsed:,.1f}\n"
+        lengths = sorted(self.gameLengths.elements())
+        if lengths:
+            s += "Game length (turns): "
+            s += f"min {lengths[0]}, median {statistics.median(lengths)}, "
+            s += f"mean {statistics.mean(lengths):.1f}, "
+            s += f"p90 {lengths[int(len(lengths) * 0.9)]}, max {lengths[-1]}\n"
+            bucketSize = max(1, (lengths[-1] - lengths[0]) // 10 + 1)
+            buckets = Counter((length - lengths[0]) // bucketSize for length in lengths)
+            for bucket in range(max(buckets) + 1):
+                low = lengths[0] + bucket * bucketSize
+                s += f"  {low:>5}-{low + bucketSize - 1:<5} {'#' * (60 * buckets[bucket] // len(lengths))} {buckets[bucket]}\n"
+        s += "Wins: " + ", ".join(
+            f"{name}: {self.wins[name]} ({100 * self.wins[name] / self.numGames:.1f}%)" for name in sorted(self.wins)
+        ) + "\n"
+        return s
+
+
+async def playGame(playerNames: list[int], ioManager: IO, seed: int = None) -> (int, int):
+    """Plays a game of Uno until a player wins or MAX_TURNS turns have passed.
+
+    :returns: Number of turns played and the name of the winner, or None if
+        the game was abandoned."""
+    game = UnoGame(list(playerNames), ioManager, seed)
+    turns: int = 0
+    while turns < MAX_TURNS:
+        turns += 1
+        if await game.executeTurn():
+            return turns, game.players[game.nextPlayer].name
+    return turns, None
+
+
+def makePolicies(policyNames: list[str], rng: random.Random) -> dict[int, Policy]:
+    """
+    :returns: Policies for players 0 to len(policyNames) - 1, with any
+        randomness drawn from rng."""
+    return {
+        name: POLICIES[policyName](random.Random(rng.getrandbits(64)))
+        for name, policyName in enumerate(policyNames)
+    }
+
+
+async def simulateGames(seeds: list[int], policyNames: list[str]) -> SimulationStats:
+    """Plays one game for each seed, where player i uses the policy
+    policyNames[i]. Each seed determines the shuffles of its game and the
+    choices of any random policies."""
+    playerNames = list(range(len(policyNames)))
+    stats = SimulationStats()
+    start = time.perf_counter()
+    for seed in seeds:
+        gameRng = random.Random(seed)
+        ioManager = ScriptedIO(makePolicies(policyNames, gameRng))
+        stats.addGame(*await playGame(playerNames, ioManager, gameRng.getrandbits(64)))
+    stats.elapsed = time.perf_counter() - start
+    return stats
+
+
+def gameSeeds(numGames: int, masterSeed: int = None) -> list[int]:
+    """
+    :returns: Seeds for numGames games, all derived from masterSeed."""
+    rng = random.Random(masterSeed)
+    return [rng.getrandbits(64) for _ in range(numGames)]
+
+
+def simulateSeeds(seeds: list[int], policyNames: list[str]) -> SimulationStats:
+    """Runs one headless game of Uno for each seed with no lock/turn logging.
+    Also used as the entry point of worker processes."""
+    rootLogger = logging.getLogger()
+    oldLevel = rootLogger.level
+    rootLogger.setLevel(logging.WARNING)
+    try:
+        return run(simulateGames(seeds, policyNames))
+    finally:
+        rootLogger.setLevel(oldLevel)
+
+
+def simulate(numGames: int, policyNames: list[str], masterSeed: int = None) -> SimulationStats:
+    """Runs numGames headless games of Uno in this process."""
+    return simulateSeeds(gameSeeds(numGames, masterSeed), policyNames)
+
+
+def simulateParallel(numGames: int, policyNames: list[str], masterSeed: int = None,
+                     numWorkers: int = None) -> SimulationStats:
+    """Runs numGames headless games of Uno split across worker processes and
+    merges their results. Every game's seed is derived from masterSeed, so the
+    results only depend on masterSeed and not on how the games are split.
+
+    :param numWorkers: Number of worker processes. Defaults to the number of
+        CPUs."""
+    numWorkers = numWorkers or os.cpu_count()
+    seeds = gameSeeds(numGames, masterSeed)
+    # Several chunks per worker so that slow chunks do not leave workers idle.
+    chunkSize = max(1, -(-numGames // (numWorkers * 4)))
+    chunks = [seeds[i:i + chunkSize] for i in range(0, numGames, chunkSize)]
+    stats = SimulationStats()
+    start = time.perf_counter()
+    with ProcessPoolExecutor(numWorkers) as executor:
+        for chunkStats in executor.map(simulateSeeds, chunks, [policyNames] * len(chunks)):
+            stats.merge(chunkStats)
+    stats.elapsed = time.perf_counter() - start
+    return stats
+
+
+def parseArgs():
+    parser = argparse.ArgumentParser(description = "Runs headless games of Uno between scripted players.")
+    parser.add_argument("--games", type = int, default = 1000, help = "Number of games to play.")
+    parser.add_argument("--players", type = int, default = 4, help = "Number of players in each game.")
+    parser.add_argument("--policy", choices = sorted(POLICIES), default = "first",
+                        help = "Policy used by every player.")
+    parser.add_argument("--policies", help = "Comma separated policy for each player. Overrides --players and --policy.")
+    parser.add_argument("--seed", type = int, help = "Master seed that all game seeds are derived from.")
+    parser.add_argument("--workers", type = int, default = 1,
+                        help = "Number of worker processes. 0 uses one per CPU.")
+    args = parser.parse_args()
+    policyNames = args.policies.split(",") if args.policies else [args.policy] * args.players
+    if not MIN_PLAYERS <= len(policyNames) <= MAX_PLAYERS:
+        parser.error(f"A game must have between {MIN_PLAYERS} and {MAX_PLAYERS} players.")
+    for policyName in policyNames:
+        if policyName not in POLICIES:
+            parser.error(f"Unknown policy: {policyName}")
+    return args, policyNames
+
+
+if __name__ == "__main__":
+    args, policyNames = parseArgs()
+    if args.workers == 1:
+        print(simulate(args.games, policyNames, args.seed).report())
+    else:
+        print(simulateParallel(args.games, policyNames, args.seed, args.workers or None).report())
@@ -0,0 +1,297 @@
+import random
+
+from game import UnoGame, UnoError, Card, Color, Value, PlayerMove, UNO_PENALTY
+
+COLORS: list[Color] = [color for color in Color if color is not Color.black]
+"""Colors that can be chosen for a black card."""
+PLAY_CARD: int = PlayerMove.playCard.value
+DRAW_CARD: int = PlayerMove.drawCard.value
+
+
+def copyRng(rng: random.Random) -> random.Random:
+    """
+    :returns: New generator that produces the same numbers as rng."""
+    copy = random.Random()
+    copy.setstate(rng.getstate())
+    return copy
+
+
+class UnoState:
+    """The rules of Uno on plain lists and ints, without IO, locks or logging,
+    so that search can copy a game with clone and play it forward with
+    legalMoves and apply.
+
+    Moves are the same tuples as the entries of UnoGame.moveLog, so a game's
+    log can be applied to its state directly. The state always waits on a
+    decision of the player at nextPlayer: their move, or the color for the
+    black card that they have just played or drawn. Skips are carried out as
+    soon as the turn reaches the skipped player."""
+
+    __slots__ = ("deck", "discardTop", "discardColor", "discardBottom", "playerNames", "hands", "unoSafe",
+                 "nextPlayer", "turnOrder", "numDraw", "skipNextPlayer", "unoSafeguard", "pendingCard",
+                 "winner", "rng")
+
+    def __init__(self, deck: list[Card], discardTop: Card, discardColor: Color, discardBottom: list[Card],
+                 playerNames: list[int], hands: list[list[Card]], rng: random.Random = None):
+        """
+        :param deck: Cards in the deck, with the top of the deck at the end.
+        :param hands: Hand of each player, in the same order as playerNames.
+        :param rng: Random number generator used to reshuffle the discard pile
+            into the deck. Defaults to a new unseeded generator."""
+        self.deck: list[Card] = deck
+        self.discardTop: Card = discardTop
+        self.discardColor: Color = discardColor
+        """Color of the top card, or the chosen color if it is a black card."""
+        self.discardBottom: list[Card] = discardBottom
+        self.playerNames: list[int] = playerNames
+        self.hands: list[list[Card]] = hands
+        self.unoSafe: list[bool] = [True] * len(playerNames)
+        self.nextPlayer: int = 0
+        self.turnOrder: int = 1
+        self.numDraw: int = 0
+        self.skipNextPlayer: bool = False
+        self.unoSafeguard: bool = False
+        self.pendingCard: Card = None
+        """Black card that the player at nextPlayer has played or drawn, and
+        which goes on the discard pile once they choose its color."""
+        self.winner: int = None
+        """Name of the player who has won, once the game is over."""
+        self.rng: random.Random = rng or random.Random()
+
+    @classmethod
+    def fromGame(cls, game: UnoGame):
+        """Copies the current state of game. Like toState, this should only be
+        called between turns.
+
+        Locks: does not check playerLock
+
+        :returns: The copied UnoState, with a copy of the game's random number
+            generator so that it plays out exactly like the game."""
+        state = cls(
+            list(game.deck.cards), game.discard.topCard, game.discard.topColor, list(game.discard.bottomCards),
+            [player.name for player in game.players], [list(player.hand) for player in game.players],
+            copyRng(game.rng)
+        )
+        state.unoSafe = [player.unoSafe for player in game.players]
+        state.nextPlayer = game.nextPlayer
+        state.turnOrder = game.turnOrder
+        state.numDraw = game.numDraw
+        state.skipNextPlayer = game.skipNextPlayer
+        state.unoSafeguard = game.unoSafeguard
+        state.carryOutSkip()
+        return state
+
+    def clone(self, rng: random.Random = None):
+        """
+        :param rng: Random number generator for the clone. Defaults to a copy
+            of rng, so that the clone plays out exactly like self. Rollouts that
+            do not need this can pass a shared generator, which is much cheaper
+            to clone with.
+        :returns: Copy of self that can be changed without changing self."""
+        state = UnoState.__new__(UnoState)
+        state.deck = self.deck[:]
+        state.discardTop = self.discardTop
+        state.discardColor = self.discardColor
+        state.discardBottom = self.discardBottom[:]
+        state.playerNames = self.playerNames[:]
+        state.hands = [hand[:] for hand in self.hands]
+        state.unoSafe = self.unoSafe[:]
+        state.nextPlayer = self.nextPlayer
+        state.turnOrder = self.turnOrder
+        state.numDraw = self.numDraw
+        state.skipNextPlayer = self.skipNextPlayer
+        state.unoSafeguard = self.unoSafeguard
+        state.pendingCard = self.pendingCard
+        state.winner = self.winner
+        state.rng = rng or copyRng(self.rng)
+        return state
+
+    def currentPlayer(self) -> int:
+        """
+        :returns: Name of the player whose decision the state is waiting on."""
+        return self.playerNames[self.nextPlayer]
+
+    def isOver(self) -> bool:
+        return self.winner is not None
+
+    def legalMoves(self) -> list[tuple]:
+        """Quitting and calling 'Uno!' are left out, since search never needs
+        them, but apply accepts them.
+
+        :returns: Every move that the current player can make, with one move
+            for each distinct playable card rather than for each copy."""
+        if self.winner is not None:
+            return []
+        playerName: int = self.playerNames[self.nextPlayer]
+        if self.pendingCard:
+            return [("c", playerName, color.value) for color in COLORS]
+        moves: list[tuple] = []
+        topDrawAndActive: bool = self.skipNextPlayer and self.numDraw
+        topValue: Value = self.discardTop.value
+        topColor: Color = self.discardColor
+        seen: set[Card] = set()
+        # Same check as Card.matches, inlined since this is the hottest loop
+        # in a rollout
+        for i, card in enumerate(self.hands[self.nextPlayer]):
+            if ((card.value is topValue or (not topDrawAndActive and (card.isBlack or card.color is topColor)))
+                    and card not in seen):
+                seen.add(card)
+                moves.append(("m", playerName, PLAY_CARD, i))
+        moves.append(("m", playerName, DRAW_CARD, 0))
+        return moves
+
+    def apply(self, move: tuple):
+        """Makes a move, following the same rules as UnoGame.executeTurn and
+        UnoGame.playerCallUno.
+
+        :param move: Entry in the format of UnoGame.moveLog.
+        :raises UnoError: If move is not allowed in the current state."""
+        if self.winner is not None:
+            raise UnoError("The game is over.")
+        if move[0] == "u":
+            self.callUno(move[1])
+            return
+        if move[1] != self.playerNames[self.nextPlayer]:
+            raise UnoError(f"It is not player {move[1]}'s turn.")
+        if move[0] == "c":
+            if not self.pendingCard:
+                raise UnoError("There is no color to choose.")
+            self.placeCard(self.pendingCard, Color(move[2]))
+            self.pendingCard = None
+            return
+        if self.pendingCard:
+            raise UnoError("A color has to be chosen first.")
+
+        hand: list[Card] = self.hands[self.nextPlayer]
+        pm = PlayerMove(move[2])
+        topDrawAndActive: bool = self.skipNextPlayer and self.numDraw
+        if pm is PlayerMove.playCard:
+            try:
+                card: Card = hand[move[3]]
+            except IndexError:
+                raise UnoError("Invalid card selected from hand.")
+            if not self.discardTop.matches(card, topDrawAndActive, self.discardColor):
+                raise UnoError("Card cannot be played here.")
+            del hand[move[3]]
+            if len(hand) == 1:
+                self.unoSafe[self.nextPlayer] = False
+                self.unoSafeguard = True
+            else:
+                self.unoSafe[self.nextPlayer] = True
+                self.unoSafeguard = False
+            if card.isBlack:
+                self.pendingCard = card
+            else:
+                self.placeCard(card, None)
+        elif pm is PlayerMove.drawCard:
+            self.unoSafe[self.nextPlayer] = True
+            self.unoSafeguard = False
+            if topDrawAndActive:
+                for _ in range(self.numDraw):
+                    card = self.drawCard()
+                    if not card:
+                        break
+                    hand.append(card)
+                self.numDraw = 0
+                self.skipNextPlayer = False
+                self.endTurn()
+            else:
+                card = self.drawCard()
+                while card and not self.discardTop.matches(card, False, self.discardColor):
+                    hand.append(card)
+                    card = self.drawCard()
+                if not card:
+                    self.endTurn()
+                elif card.isBlack:
+                    self.pendingCard = card
+                else:
+                    self.placeCard(card, None)
+        else:
+            self.unoSafeguard = False
+            self.discardBottom += hand
+            del self.playerNames[self.nextPlayer]
+            del self.hands[self.nextPlayer]
+            del self.unoSafe[self.nextPlayer]
+            if len(self.playerNames) == 1:
+                self.nextPlayer = 0
+                self.winner = self.playerNames[0]
+            else:
+                self.endTurn(True)
+
+    def drawCard(self) -> Card:
+        """
+        :returns: Top card from the deck, reshuffling the discard pile into the
+            deck if it is empty, or None if there are no cards left to draw."""
+        if not self.deck:
+            self.deck, self.discardBottom = self.discardBottom, []
+            if not self.deck:
+                return None
+            self.rng.shuffle(self.deck)
+        return self.deck.pop()
+
+    def placeCard(self, card: Card, color: Color):
+        """Puts card on the discard pile and carries out its action, then ends
+        the turn unless the current player has won."""
+        self.discardBottom.append(self.discardTop)
+        self.discardTop = card
+        self.discardColor = color or card.color
+        if card.value is Value.reverse:
+            self.turnOrder *= -1
+        elif card.value is Value.drawFour:
+            self.skipNextPlayer = True
+            self.numDraw += 4
+        elif card.value is Value.drawTwo:
+            self.skipNextPlayer = True
+            self.numDraw += 2
+        elif card.value is Value.skip:
+            self.skipNextPlayer = True
+        if not self.hands[self.nextPlayer]:
+            self.winner = self.playerNames[self.nextPlayer]
+        else:
+            self.endTurn()
+
+    def endTurn(self, playerQuit: bool = False):
+        """Moves to the next player in the turn order, like
+        UnoGame.updateNextPlayer, then carries out any skip."""
+        if not (playerQuit and self.turnOrder == 1):
+            self.nextPlayer += self.turnOrder
+        if self.nextPlayer < 0:
+            self.nextPlayer = len(self.playerNames) - 1
+        elif self.nextPlayer >= len(self.playerNames):
+            self.nextPlayer = 0
+        self.carryOutSkip()
+
+    def carryOutSkip(self):
+        """Skips the player at nextPlayer if the top card is a skip that has
+        not been carried out yet."""
+        if not self.numDraw and self.skipNextPlayer:
+            self.skipNextPlayer = False
+            self.endTurn()
+
+    def callUno(self, playerName: int):
+        """Calls 'Uno!' for the given player. See UnoGame.playerCallUno."""
+        if playerName not in self.playerNames:
+            return
+        caller: int = self.playerNames.index(playerName)
+        if len(self.hands[caller]) == 1:
+            self.unoSafe[caller] = True
+            return
+        unsafePlayers: list[int] = [
+            i for i, hand in enumerate(self.hands) if i != caller and len(hand) == 1 and not self.unoSafe[i]
+        ]
+        if not unsafePlayers:
+            if not self.unoSafeguard:
+                for _ in range(UNO_PENALTY):
+                    card = self.drawCard()
+                    if not card:
+                        break
+                    self.hands[caller].append(card)
+            return
+        # Like playerCallUno, each unsafe player draws one card at a time
+        for _ in range(UNO_PENALTY):
+            for i in unsafePlayers:
+                self.unoSafe[i] = True
+                card = self.drawCard()
+                if not card:
+                    return
+                self.hands[i].append(card)